@@ -0,0 +1,39 @@
+"""Configurazione comune dei benchmark.
+
+Uso:
+    pip install -r benchmarks/requirements.txt
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare
+
+Oltre al tempo, ogni benchmark riporta in extra_info le allocazioni
+(tracemalloc) e il picco di memoria residente (vedere misure.py).
+I test dei download usano il server locale di fake_server.py e
+riportano le misure come proprietà del test (ad esempio con --junitxml).
+"""
+
+from collections.abc import AsyncGenerator
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_server import ServerFinto  # noqa: E402
+
+
+@pytest.fixture
+async def server_finto(
+    socket_enabled: None, monkeypatch: pytest.MonkeyPatch
+) -> AsyncGenerator[ServerFinto]:
+    """Avvia il server locale e vi indirizza i download dell'integrazione.
+
+    pytest-homeassistant-custom-component disabilita i socket in ogni test:
+    socket_enabled li riattiva per il server e per i client.
+    """
+    server = ServerFinto()
+    await server.avvia()
+    for nome, url in server.get_base_urls().items():
+        monkeypatch.setattr(f"custom_components.bolletta.{nome}", url)
+    yield server
+    await server.ferma()
@@ -0,0 +1,282 @@
+"""Server HTTP locale che simula i siti del GME, di ARERA e del PortaleOfferte.
+
+Un solo server aiohttp risponde agli stessi percorsi dei siti reali:
+- GME: API downloadzipfile (archivio ZIP sintetico, vedere gme_archive.py)
+- ARERA: file Excel E{anno}_stg_domesticiNonVulnerabili.xlsx
+- PortaleOfferte: albero dei CSV {anno}_{mese}/PO_Parametri_E_{aaaammgg}.csv
+
+Per ogni sito (Servizio) si possono impostare latenza, giorni non
+pubblicati (404 o assenti dall'archivio), contenuto troncato e una raffica
+di errori 5xx; le richieste ricevute e i byte inviati sono registrati.
+
+Uso da riga di comando (ad esempio per i test di carico su un'istanza di
+Home Assistant, sostituendo gli indirizzi dei siti):
+    python benchmarks/fake_server.py --porta 8080 --latenza 0.5
+"""
+
+import argparse
+import asyncio
+from datetime import date, datetime
+import io
+from pathlib import Path
+import re
+import sys
+
+from aiohttp import web
+import openpyxl
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.bolletta.const import HOUSE_TYPE_LABELS  # noqa: E402
+from gme_archive import build_archive  # noqa: E402
+
+# Percorsi dei siti reali (relativi all'indirizzo del server)
+PERCORSO_GME = "/DesktopModules/GmeDownload/API/ExcelDownload/downloadzipfile"
+PERCORSO_ARERA = "/fileadmin/area_operatori/prezzi_e_tariffe"
+PERCORSO_PORTALE = "/portaleOfferte/resources/opendata/csv/parametri"
+
+# Nomi dei fogli del file ARERA
+MESI = (
+    "Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno",
+    "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre",
+)
+
+# Parametri dei CSV del PortaleOfferte (nome_parametro, valore)
+PARAMETRI_PORTALE: tuple[tuple[str, float], ...] = (
+    ("asos_dr", 0.029),
+    ("arim_dr", 0.0016),
+    ("asos_dnr_v", 0.031),
+    ("arim_dnr_v", 0.0018),
+    ("acc_c_r_l", 0.0227),
+    ("acc_c_r_h", 0.0227),
+    ("acc_c_nr", 0.0227),
+    ("iva_c", 0.1),
+    ("lambda", 0.1),
+)
+
+
+class Servizio:
+    """Comportamento e statistiche di uno dei siti simulati."""
+
+    def __init__(self) -> None:
+        """Inizializza un servizio senza guasti."""
+        # Attesa prima di ogni risposta (secondi)
+        self.latenza: float = 0.0
+        # Numero delle prossime richieste a cui rispondere con errore 503
+        self.errori_5xx: int = 0
+        # Giorni non ancora pubblicati
+        self.giorni_mancanti: set[date] = set()
+        # Se True restituisce solo la prima metà del contenuto
+        self.troncato: bool = False
+        # Percorsi (con la query) delle richieste ricevute
+        self.richieste: list[str] = []
+        # Byte inviati nelle risposte con successo
+        self.byte_inviati: int = 0
+
+    def azzera_statistiche(self) -> None:
+        """Azzera le richieste ricevute e i byte inviati."""
+        self.richieste.clear()
+        self.byte_inviati = 0
+
+
+def build_arera_xlsx(anno: int) -> bytes:
+    """Restituisce il file Excel ARERA dell'anno indicato.
+
+    Contiene un foglio per ogni mese dell'anno (più dicembre dell'anno
+    precedente), con il blocco dei parametri di ogni tipologia di
+    abitazione nella stessa disposizione del file reale.
+    """
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    fogli = [(anno - 1, 12)] + [(anno, mese) for mese in range(1, 13)]
+    for anno_foglio, mese in fogli:
+        sheet = workbook.create_sheet(f"{MESI[mese - 1]} {anno_foglio}")
+        sheet.append(["", "Tariffe per i clienti domestici non vulnerabili"])
+        for indice, etichetta in enumerate(HOUSE_TYPE_LABELS.values()):
+            variazione = mese / 1000 + indice / 100
+            sheet.append([])
+            sheet.append(["", etichetta])
+            sheet.append(["", "Voce", "Servizi di vendita", "Servizi di\nrete", "ASOS", "ARIM"])
+            sheet.append(["", "", "", "", "", ""])
+            sheet.append(["", "", "", "", "", ""])
+            sheet.append(["", "€/kWh", 0.0, 0.0098 + variazione, 0.025 + variazione, 0.0016])
+            sheet.append(["", "€/anno", 0.0, 22.15, "", ""])
+            sheet.append(["", "€/kW/anno", 0.0, 21.48, "", ""])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def build_portale_csv(giorno: date) -> bytes:
+    """Restituisce il CSV dei parametri del PortaleOfferte di un giorno."""
+    righe = ["nome_parametro,valore"]
+    righe.extend(
+        f"{nome},{valore + giorno.day / 100000:.6f}" for nome, valore in PARAMETRI_PORTALE
+    )
+    return ("\ufeff" + "\n".join(righe) + "\n").encode()
+
+
+class ServerFinto:
+    """Server aiohttp locale con i tre siti simulati."""
+
+    def __init__(self, prezzi_15min_da: date | None = None) -> None:
+        """Prepara il server (prezzi_15min_da come in gme_archive.build_archive)."""
+        self.gme: Servizio = Servizio()
+        self.arera: Servizio = Servizio()
+        self.portale: Servizio = Servizio()
+        self.prezzi_15min_da: date | None = prezzi_15min_da
+        self.url: str = ""
+        self._xlsx: dict[int, bytes] = {}
+        self._runner: web.AppRunner | None = None
+
+        self.app = web.Application()
+        self.app.router.add_get(PERCORSO_GME, self._handle_gme)
+        self.app.router.add_get(PERCORSO_ARERA + "/{nome}", self._handle_arera)
+        self.app.router.add_get(
+            PERCORSO_PORTALE + "/{cartella}/{nome}", self._handle_portale
+        )
+
+    async def avvia(self, host: str = "127.0.0.1", porta: int = 0) -> str:
+        """Avvia il server e restituisce il suo indirizzo (porta libera se 0)."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, porta).start()
+        host, porta = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{porta}"
+        return self.url
+
+    async def ferma(self) -> None:
+        """Ferma il server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def get_base_urls(self) -> dict[str, str]:
+        """Restituisce gli indirizzi da sostituire nei moduli dell'integrazione."""
+        return {
+            "coordinator.GME_BASE_URL": self.url,
+            "arera_client.ARERA_BASE_URL": f"{self.url}{PERCORSO_ARERA}/",
+            "portale_offerte_client.BASE_URL": f"{self.url}{PERCORSO_PORTALE}",
+        }
+
+    async def _rispondi(
+        self,
+        servizio: Servizio,
+        request: web.Request,
+        corpo: bytes | None,
+        content_type: str,
+        headers: dict[str, str] | None = None,
+    ) -> web.Response:
+        """Applica latenza e guasti del servizio e invia la risposta."""
+        servizio.richieste.append(request.path_qs)
+        if servizio.latenza > 0:
+            await asyncio.sleep(servizio.latenza)
+        if servizio.errori_5xx > 0:
+            servizio.errori_5xx -= 1
+            return web.Response(status=503, text="Service Unavailable")
+        if corpo is None:
+            return web.Response(status=404, text="Not Found")
+        if servizio.troncato:
+            corpo = corpo[: len(corpo) // 2]
+        servizio.byte_inviati += len(corpo)
+        return web.Response(body=corpo, content_type=content_type, headers=headers)
+
+    async def _handle_gme(self, request: web.Request) -> web.Response:
+        """Archivio ZIP con i prezzi dell'intervallo richiesto."""
+        try:
+            inizio = datetime.strptime(request.query["DataInizio"], "%Y%m%d").date()
+            fine = datetime.strptime(request.query["DataFine"], "%Y%m%d").date()
+        except (KeyError, ValueError):
+            return web.Response(status=400, text="Bad Request")
+
+        # Giorni futuri non ancora pubblicati (domani è disponibile in anticipo)
+        giorni_mancanti = set(self.gme.giorni_mancanti)
+        giorni_mancanti.update(
+            date.fromordinal(giorno)
+            for giorno in range(date.today().toordinal() + 2, fine.toordinal() + 1)
+        )
+        corpo = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: build_archive(
+                inizio, fine, self.prezzi_15min_da, giorni_mancanti=giorni_mancanti
+            ),
+        )
+        return await self._rispondi(self.gme, request, corpo, "application/zip")
+
+    async def _handle_arera(self, request: web.Request) -> web.Response:
+        """File Excel ARERA (con ETag per le richieste condizionali)."""
+        corrispondenza = re.fullmatch(
+            r"E(\d{4})_stg_domesticiNonVulnerabili\.xlsx", request.match_info["nome"]
+        )
+        if corrispondenza is None:
+            return await self._rispondi(self.arera, request, None, "text/plain")
+
+        anno = int(corrispondenza.group(1))
+        etag = f'"arera-{anno}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.arera.richieste.append(request.path_qs)
+            return web.Response(status=304, headers={"ETag": etag})
+        if anno not in self._xlsx:
+            self._xlsx[anno] = build_arera_xlsx(anno)
+        return await self._rispondi(
+            self.arera,
+            request,
+            self._xlsx[anno],
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            {"ETag": etag},
+        )
+
+    async def _handle_portale(self, request: web.Request) -> web.Response:
+        """CSV dei parametri di un giorno (404 se non pubblicato)."""
+        corrispondenza = re.fullmatch(
+            r"PO_Parametri_E_(\d{8})\.csv", request.match_info["nome"]
+        )
+        giorno: date | None = None
+        if corrispondenza is not None:
+            try:
+                giorno = datetime.strptime(corrispondenza.group(1), "%Y%m%d").date()
+            except ValueError:
+                giorno = None
+        if (
+            giorno is None
+            or request.match_info["cartella"] != f"{giorno.year}_{giorno.month}"
+            or giorno > date.today()
+            or giorno in self.portale.giorni_mancanti
+        ):
+            return await self._rispondi(self.portale, request, None, "text/plain")
+        return await self._rispondi(
+            self.portale, request, build_portale_csv(giorno), "text/csv"
+        )
+
+
+async def _esegui(args: argparse.Namespace) -> None:
+    """Avvia il server finché non viene interrotto."""
+    server = ServerFinto(args.prezzi_15min_da)
+    for servizio in (server.gme, server.arera, server.portale):
+        servizio.latenza = args.latenza
+    url = await server.avvia(args.host, args.porta)
+    print(f"Server avviato su {url}")
+    for nome, valore in server.get_base_urls().items():
+        print(f"  {nome} = {valore!r}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.ferma()
+
+
+def main() -> None:
+    """Avvia da riga di comando un server con i tre siti simulati."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--latenza", type=float, default=0.0)
+    parser.add_argument("--15min-da", dest="prezzi_15min_da", type=date.fromisoformat)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_esegui(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Generatore di archivi ZIP sintetici nel formato del GME.
+
+Ogni giorno produce un file XML con i prezzi orari (elementi Prezzi, 23, 24
+o 25 ore nei cambi d'ora) e, se richiesto, un file con i prezzi ogni 15
+minuti (elementi Prezzi15, 92, 96 o 100 periodi). Ogni elemento contiene il
+PUN e il prezzo di tutte le zone di Zona, nel formato numerico italiano
+usato dal GME (es. "1.234,567890" in €/MWh).
+
+Uso da riga di comando:
+    python benchmarks/gme_archive.py 2025-09-01 2025-10-31 archivio.zip --15min-da 2025-10-01
+"""
+
+import argparse
+from collections.abc import Collection
+from datetime import date, datetime, timedelta, timezone
+import io
+from pathlib import Path
+import random
+import sys
+import zipfile
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.bolletta.interfaces import Zona  # noqa: E402
+
+# Fuso orario dei dati del GME
+TZ_GME = ZoneInfo("Europe/Rome")
+
+# Colonne delle zone presenti in ogni elemento
+ZONE: tuple[str, ...] = tuple(zona.name for zona in Zona)
+
+
+def get_ore_giorno(giorno: date) -> int:
+    """Restituisce le ore del giorno (23 o 25 nei cambi d'ora)."""
+    inizio = datetime(giorno.year, giorno.month, giorno.day, tzinfo=TZ_GME)
+    domani = giorno + timedelta(days=1)
+    fine = datetime(domani.year, domani.month, domani.day, tzinfo=TZ_GME)
+    return int(
+        (fine.astimezone(timezone.utc) - inizio.astimezone(timezone.utc)).total_seconds()
+        // 3600
+    )
+
+
+def _formatta_prezzo(valore: float) -> str:
+    """Formatta un prezzo come il GME (migliaia con il punto, decimali con la virgola)."""
+    return f"{valore:,.6f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def build_day_xml(
+    giorno: date,
+    prezzi_15min: bool = False,
+    zone_mancanti: float = 0.0,
+    seed: int | None = None,
+) -> bytes:
+    """Restituisce il file XML dei prezzi di un giorno.
+
+    Args:
+    giorno (date): giorno dei prezzi.
+    prezzi_15min (bool): True per i prezzi ogni 15 minuti (Prezzi15).
+    zone_mancanti (float): probabilità che manchi il prezzo di una zona.
+    seed (int | None): seme dei valori casuali (di default dipende dal giorno).
+
+    """
+    rnd = random.Random(giorno.toordinal() if seed is None else seed)
+    periodi: int = get_ore_giorno(giorno) * (4 if prezzi_15min else 1)
+    tag: str = "Prezzi15" if prezzi_15min else "Prezzi"
+
+    righe: list[str] = ['<?xml version="1.0" encoding="utf-8"?>', "<NewDataSet>"]
+    for periodo in range(1, periodi + 1):
+        campi: list[str] = [
+            f"<{tag}>",
+            f"<Data>{giorno:%Y%m%d}</Data>",
+            "<Mercato>MGP</Mercato>",
+        ]
+        if prezzi_15min:
+            campi.append(f"<Periodo>{periodo}</Periodo><Granularity>PT15</Granularity>")
+        else:
+            campi.append(f"<Ora>{periodo}</Ora>")
+        campi.append(f"<PUN>{_formatta_prezzo(rnd.uniform(50, 250))}</PUN>")
+        for zona in ZONE:
+            if rnd.random() >= zone_mancanti:
+                campi.append(f"<{zona}>{_formatta_prezzo(rnd.uniform(50, 250))}</{zona}>")
+        campi.append(f"</{tag}>")
+        righe.append("".join(campi))
+    righe.append("</NewDataSet>")
+    return "\n".join(righe).encode()
+
+
+def build_archive(
+    date_start: date,
+    date_end: date,
+    prezzi_15min_da: date | None = None,
+    zone_mancanti: float = 0.0,
+    giorni_mancanti: Collection[date] = (),
+) -> bytes:
+    """Restituisce un archivio ZIP con i prezzi dei giorni indicati (estremi inclusi).
+
+    Args:
+    date_start (date): primo giorno.
+    date_end (date): ultimo giorno.
+    prezzi_15min_da (date | None): primo giorno con i prezzi ogni 15 minuti
+        (None per nessuno).
+    zone_mancanti (float): probabilità che manchi il prezzo di una zona.
+    giorni_mancanti (Collection[date]): giorni non ancora pubblicati
+        (esclusi dall'archivio).
+
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archivio:
+        giorno = date_start
+        while giorno <= date_end:
+            if giorno in giorni_mancanti:
+                giorno += timedelta(days=1)
+                continue
+            archivio.writestr(
+                f"{giorno:%Y%m%d}MGPPrezzi.xml",
+                build_day_xml(giorno, zone_mancanti=zone_mancanti),
+            )
+            if prezzi_15min_da is not None and giorno >= prezzi_15min_da:
+                archivio.writestr(
+                    f"{giorno:%Y%m%d}MGPPrezzi15.xml",
+                    build_day_xml(giorno, True, zone_mancanti=zone_mancanti),
+                )
+            giorno += timedelta(days=1)
+    return buffer.getvalue()
+
+
+def main() -> None:
+    """Scrive su disco un archivio sintetico."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inizio", type=date.fromisoformat)
+    parser.add_argument("fine", type=date.fromisoformat)
+    parser.add_argument("destinazione", type=Path)
+    parser.add_argument("--15min-da", dest="prezzi_15min_da", type=date.fromisoformat)
+    parser.add_argument("--zone-mancanti", type=float, default=0.0)
+    args = parser.parse_args()
+
+    args.destinazione.write_bytes(
+        build_archive(args.inizio, args.fine, args.prezzi_15min_da, args.zone_mancanti)
+    )
+
+
+if __name__ == "__main__":
+    main()
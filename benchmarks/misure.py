@@ -0,0 +1,60 @@
+"""Misure di memoria per i benchmark."""
+
+from collections.abc import Callable
+import multiprocessing
+import resource
+import sys
+import tracemalloc
+from typing import Any
+
+
+def _get_picco_rss_kib() -> int:
+    """Restituisce il picco di memoria residente del processo (KiB)."""
+    picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Su macOS il valore è in byte, su Linux in KiB
+    return picco // 1024 if sys.platform == "darwin" else picco
+
+
+def _misura_rss_figlio(funzione: Callable[[], Any], coda: Any) -> None:
+    """Esegue la funzione nel processo figlio e restituisce il picco di memoria."""
+    prima = _get_picco_rss_kib()
+    funzione()
+    coda.put((prima, _get_picco_rss_kib()))
+
+
+def misura_memoria(funzione: Callable[[], Any]) -> dict[str, int]:
+    """Misura allocazioni e picco di memoria di una singola esecuzione.
+
+    Le allocazioni sono misurate con tracemalloc: il picco durante
+    l'esecuzione e i blocchi ancora in memoria al termine (di norma quelli
+    del risultato restituito). Il picco di memoria residente è misurato in
+    un processo figlio (se fork è disponibile), così da non dipendere dai
+    benchmark eseguiti in precedenza.
+    """
+    tracemalloc.start()
+    try:
+        risultato = funzione()
+        _, picco = tracemalloc.get_traced_memory()
+        blocchi = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    del risultato
+
+    misure: dict[str, int] = {
+        "tracemalloc_picco_kib": picco // 1024,
+        "blocchi_residui": blocchi,
+    }
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        contesto = multiprocessing.get_context("fork")
+        coda = contesto.Queue()
+        processo = contesto.Process(target=_misura_rss_figlio, args=(funzione, coda))
+        processo.start()
+        prima, dopo = coda.get(timeout=300)
+        processo.join()
+        misure["rss_picco_kib"] = dopo
+        misure["rss_incremento_kib"] = dopo - prima
+    else:
+        misure["rss_picco_kib"] = _get_picco_rss_kib()
+
+    return misure
@@ -0,0 +1,177 @@
+"""Latenza, tentativi e numero di richieste dei download (con il server locale)."""
+
+from datetime import date, timedelta
+import time
+
+from aiohttp import ServerConnectionError
+from fake_server import ServerFinto
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import UpdateFailed
+import homeassistant.util.dt as dt_util
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.bolletta.arera_client import AreraClient
+from custom_components.bolletta.const import (
+    CONF_DISCOUNT,
+    CONF_FIX_QUOTA_AGGR_MEASURE,
+    CONF_MONTHLY_FEE,
+    CONF_MONTHY_ENTITY_SENSOR,
+    CONF_OTHER_FEE,
+    CONF_POWER_IN_USE,
+    CONF_SCAN_MINUTE,
+    CONF_TV_TAX,
+    CONF_ZONA,
+    DOMAIN,
+    NOT_RESIDENTIAL,
+    RESIDENTIAL,
+    WEB_RETRIES_MINUTES,
+)
+from custom_components.bolletta.coordinator import PUNDataUpdateCoordinator
+from custom_components.bolletta.interfaces import Fascia, Zona
+from custom_components.bolletta.portale_offerte_client import PortaleOfferteClient
+
+# Latenze simulate dei siti (secondi)
+LATENZE: tuple[float, ...] = (0.0, 0.25)
+
+
+def _crea_coordinator(hass: HomeAssistant) -> PUNDataUpdateCoordinator:
+    """Crea il coordinator con una configurazione minima."""
+    config = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_FIX_QUOTA_AGGR_MEASURE: 0.0,
+            CONF_MONTHLY_FEE: 0.0,
+            CONF_OTHER_FEE: 0.0,
+            CONF_MONTHY_ENTITY_SENSOR: "sensor.consumo_mensile",
+            CONF_POWER_IN_USE: 3.0,
+            CONF_DISCOUNT: 0.0,
+            CONF_TV_TAX: 0.0,
+            CONF_SCAN_MINUTE: 0,
+            CONF_ZONA: Zona.NAT.name,
+        },
+    )
+    config.add_to_hass(hass)
+    return PUNDataUpdateCoordinator(hass, config)
+
+
+@pytest.mark.parametrize("latenza", LATENZE)
+async def test_gme_refresh(
+    hass: HomeAssistant, server_finto: ServerFinto, record_property, latenza: float
+) -> None:
+    """Durata di un aggiornamento completo e di quello successivo."""
+    server_finto.gme.latenza = latenza
+    coordinator = _crea_coordinator(hass)
+
+    inizio = time.monotonic()
+    await coordinator._async_update_data()
+    record_property("durata_s", time.monotonic() - inizio)
+    record_property("byte", server_finto.gme.byte_inviati)
+    assert len(server_finto.gme.richieste) == 1
+    assert coordinator.pun_values.value[Fascia.MONO] > 0
+
+    # Il secondo aggiornamento scarica al massimo i giorni non ancora pubblicati
+    server_finto.gme.azzera_statistiche()
+    inizio = time.monotonic()
+    await coordinator._async_update_data()
+    record_property("durata_successivo_s", time.monotonic() - inizio)
+    record_property("richieste_successivo", len(server_finto.gme.richieste))
+    assert len(server_finto.gme.richieste) <= 1
+
+
+async def test_gme_archivio_troncato(
+    hass: HomeAssistant, server_finto: ServerFinto
+) -> None:
+    """Un archivio ZIP troncato fa fallire l'aggiornamento."""
+    server_finto.gme.troncato = True
+    coordinator = _crea_coordinator(hass)
+
+    with pytest.raises(UpdateFailed):
+        await coordinator._async_update_data()
+    assert not coordinator.gme_store.giorni
+
+
+async def test_gme_errori_5xx(hass: HomeAssistant, server_finto: ServerFinto) -> None:
+    """Un errore 5xx fa fallire l'aggiornamento senza modificare i dati."""
+    server_finto.gme.errori_5xx = 1
+    coordinator = _crea_coordinator(hass)
+
+    with pytest.raises(ServerConnectionError):
+        await coordinator._async_update_data()
+    await coordinator._async_update_data()
+    assert len(server_finto.gme.richieste) == 2
+
+
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+async def test_gme_tentativi(
+    hass: HomeAssistant, server_finto: ServerFinto, record_property
+) -> None:
+    """Dopo una raffica di errori 5xx i nuovi tentativi seguono WEB_RETRIES_MINUTES."""
+    errori = 3
+    server_finto.gme.errori_5xx = errori
+    coordinator = _crea_coordinator(hass)
+    coordinator.web_retries = list(WEB_RETRIES_MINUTES)
+
+    await coordinator.update_pun()
+    adesso = dt_util.utcnow()
+    for minuti in WEB_RETRIES_MINUTES[:errori]:
+        adesso += timedelta(minutes=minuti, seconds=1)
+        async_fire_time_changed(hass, adesso)
+        await hass.async_block_till_done()
+
+    record_property("richieste", len(server_finto.gme.richieste))
+    assert len(server_finto.gme.richieste) == errori + 1
+    assert coordinator.pun_values.value[Fascia.MONO] > 0
+    coordinator.clean_tokens()
+
+
+@pytest.mark.parametrize("latenza", LATENZE)
+async def test_arera(
+    hass: HomeAssistant, server_finto: ServerFinto, record_property, latenza: float
+) -> None:
+    """Download del file ARERA e richiesta condizionale successiva."""
+    server_finto.arera.latenza = latenza
+    client = AreraClient(hass, "benchmark")
+
+    inizio = time.monotonic()
+    tariffe = await client.get_current_tariffs(RESIDENTIAL)
+    record_property("durata_s", time.monotonic() - inizio)
+    record_property("byte", server_finto.arera.byte_inviati)
+    assert tariffe["mp"] and tariffe["mpp"]
+
+    # L'altra tipologia è già nel file letto: nessuna nuova richiesta
+    assert (await client.get_current_tariffs(NOT_RESIDENTIAL))["mp"]
+    assert len(server_finto.arera.richieste) == 1
+
+
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+@pytest.mark.parametrize("giorni_mancanti", [0, 3, 10])
+async def test_portale(
+    hass: HomeAssistant,
+    server_finto: ServerFinto,
+    record_property,
+    giorni_mancanti: int,
+) -> None:
+    """Ricerca degli ultimi file pubblicati, con giorni mancanti ed errori 5xx."""
+    oggi = date.today()
+    server_finto.portale.latenza = 0.05
+    server_finto.portale.errori_5xx = 2
+    server_finto.portale.giorni_mancanti = {
+        oggi - timedelta(days=giorno) for giorno in range(giorni_mancanti)
+    }
+    client = PortaleOfferteClient(hass, "benchmark")
+
+    inizio = time.monotonic()
+    tariffe = await client.get_current_tariffs(RESIDENTIAL, 3.0)
+    record_property("durata_s", time.monotonic() - inizio)
+    record_property("richieste", len(server_finto.portale.richieste))
+    assert tariffe["mp"] and tariffe["mpp"]
+
+    # I giorni mancanti non vengono richiesti di nuovo
+    server_finto.portale.azzera_statistiche()
+    await client.get_current_tariffs(RESIDENTIAL, 3.0)
+    record_property("richieste_successivo", len(server_finto.portale.richieste))
+    assert len(server_finto.portale.richieste) <= 2
@@ -0,0 +1,119 @@
+"""Benchmark dell'estrazione dei prezzi dagli archivi del GME."""
+
+from datetime import date, timedelta
+import io
+import zipfile
+
+from gme_archive import build_archive
+from misure import misura_memoria
+import pytest
+
+from custom_components.bolletta.interfaces import GmeDay, PunData, PunDataMP, Zona
+from custom_components.bolletta.utils import extract_pun_data, parse_gme_archive
+
+# Archivi di prova: (inizio, fine, primo giorno con i prezzi a 15 minuti)
+ARCHIVI: dict[str, tuple[date, date, date | None]] = {
+    # Giorno normale: 24 ore e 96 periodi
+    "giorno": (date(2025, 10, 15), date(2025, 10, 15), date(2025, 10, 15)),
+    # Passaggio all'ora legale: 23 ore e 92 periodi
+    "giorno_23h": (date(2025, 3, 30), date(2025, 3, 30), date(2025, 3, 30)),
+    # Ritorno all'ora solare: 25 ore e 100 periodi
+    "giorno_25h": (date(2025, 10, 26), date(2025, 10, 26), date(2025, 10, 26)),
+    # Mese intero con i soli prezzi orari
+    "mese_orario": (date(2025, 3, 1), date(2025, 3, 31), None),
+    # Mese intero con prezzi orari e a 15 minuti
+    "mese_15min": (date(2025, 10, 1), date(2025, 10, 31), date(2025, 10, 1)),
+    # Download tipico del coordinator: mese precedente, mese corrente e domani
+    "due_mesi": (date(2025, 9, 1), date(2025, 11, 1), date(2025, 10, 1)),
+}
+
+
+@pytest.fixture(scope="module", params=list(ARCHIVI))
+def archivio(request: pytest.FixtureRequest) -> tuple[str, bytes]:
+    """Restituisce il nome e il contenuto di un archivio sintetico."""
+    return request.param, build_archive(*ARCHIVI[request.param])
+
+
+@pytest.fixture(scope="module")
+def giorni(archivio: tuple[str, bytes]) -> dict[date, GmeDay]:
+    """Restituisce i giorni estratti dall'archivio."""
+    return _parse(archivio[1])
+
+
+def _parse(dati: bytes) -> dict[date, GmeDay]:
+    """Scompatta ed estrae i prezzi di un archivio."""
+    with zipfile.ZipFile(io.BytesIO(dati), "r") as archive:
+        return parse_gme_archive(archive)
+
+
+def _reset_aggregati(giorni: dict[date, GmeDay]) -> None:
+    """Elimina le statistiche già calcolate dei giorni."""
+    for giorno in giorni.values():
+        giorno.aggregati = None
+
+
+def test_parse_gme_archive(benchmark, archivio: tuple[str, bytes]) -> None:
+    """Scompattamento ed estrazione XML dell'archivio."""
+    nome, dati = archivio
+    benchmark.extra_info["archivio"] = nome
+    benchmark.extra_info["dimensione_kib"] = len(dati) // 1024
+    benchmark.extra_info.update(misura_memoria(lambda: _parse(dati)))
+
+    giorni = benchmark(_parse, dati)
+
+    inizio, fine, prezzi_15min_da = ARCHIVI[nome]
+    assert len(giorni) == (fine - inizio).days + 1
+    benchmark.extra_info["giorni"] = len(giorni)
+    for giorno in giorni.values():
+        assert len(giorno.prezzi_zonali) == len(Zona)
+        if prezzi_15min_da is not None and giorno.data >= prezzi_15min_da:
+            assert len(giorno.pun_15min) == 4 * len(giorno.pun_orari)
+
+
+def test_extract_pun_data(benchmark, giorni: dict[date, GmeDay]) -> None:
+    """Aggregazione per fasce del mese corrente e precedente, come nel coordinator."""
+    date_end = max(giorni)
+    date_start = date(date_end.year, date_end.month, 1)
+    date_end_mp = date_start - timedelta(days=1)
+    date_start_mp = date(date_end_mp.year, date_end_mp.month, 1)
+    pun_data = PunData()
+    pun_data_mp = PunDataMP()
+    pun_data.zona = pun_data_mp.zona = Zona.NORD
+
+    def _extract() -> None:
+        extract_pun_data(
+            giorni.values(),
+            date_end,
+            [
+                (pun_data, date_start, date_end),
+                (pun_data_mp, date_start_mp, date_end_mp),
+            ],
+        )
+
+    benchmark.extra_info.update(misura_memoria(_extract))
+    benchmark.pedantic(
+        _extract, setup=lambda: _reset_aggregati(giorni), rounds=20, warmup_rounds=1
+    )
+
+
+@pytest.mark.parametrize("mese_precedente", [False, True], ids=["mc", "mp"])
+def test_extract_xml(
+    benchmark, giorni: dict[date, GmeDay], mese_precedente: bool
+) -> None:
+    """Estrazione di un solo mese (con le statistiche dei giorni già calcolate)."""
+    oggi = max(giorni)
+    date_start = date(oggi.year, oggi.month, 1)
+    date_end = oggi
+    pun_data: PunData | PunDataMP = PunData()
+    if mese_precedente:
+        date_end = date_start - timedelta(days=1)
+        date_start = date(date_end.year, date_end.month, 1)
+        pun_data = PunDataMP()
+    pun_data.zona = Zona.NORD
+    destinazioni = [(pun_data, date_start, date_end)]
+
+    _reset_aggregati(giorni)
+    benchmark.extra_info.update(
+        misura_memoria(lambda: extract_pun_data(giorni.values(), oggi, destinazioni))
+    )
+    benchmark(extract_pun_data, giorni.values(), oggi, destinazioni)
@@ -1,5 +1,4 @@
 from datetime import date, timedelta, datetime
-import holidays
 from statistics import mean
 import zipfile, io
 from bs4 import BeautifulSoup
@@ -16,9 +15,16 @@ from homeassistant.helpers.update_coordinator import (
     UpdateFailed,
 )
 from homeassistant.helpers.event import async_track_point_in_time, async_call_later
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 import homeassistant.util.dt as dt_util
 from zoneinfo import ZoneInfo
 from .coordinator import PUNDataUpdateCoordinator
+from .arera_client import async_remove_arera_cache
+from .gme_store import async_remove_gme_store
+from .portale_offerte_client import async_remove_portale_index
+from .services import async_setup_services
+from .utils import carica_festivita
 from awesomeversion.awesomeversion import AwesomeVersion
 from homeassistant.const import __version__ as HA_VERSION
 if (AwesomeVersion(HA_VERSION) >= AwesomeVersion("2024.5.0")):
@@ -39,7 +45,10 @@ from .const import (
     CONF_MONTHY_ENTITY_SENSOR,
     CONF_PUN_MODE,
     CONF_FIXED_PUN_VALUE,
-    CONF_HOUSE_TYPE
+    CONF_HOUSE_TYPE,
+    CONF_BILL_DEBOUNCE,
+    CONF_BILL_MIN_DELTA,
+    EVENT_UPDATE_BILL_CONFIG,
 )
 
 import logging
@@ -51,18 +60,33 @@ tz_pun = ZoneInfo('Europe/Rome')
 # Definisce i tipi di entità
 PLATFORMS: list[str] = ["sensor", "switch"]
 
+# Configurabile solo da interfaccia (nessuna configurazione YAML)
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Impostazione dell'integrazione (servizi comuni a tutte le configurazioni)"""
+    async_setup_services(hass)
+    return True
+
 async def async_setup_entry(hass: HomeAssistant, config: ConfigEntry) -> bool:
     """Impostazione dell'integrazione da configurazione Home Assistant"""
 
-    # Carica le dipendenze di holidays in background per evitare errori nel log
+    # Carica le festività (e le dipendenze di holidays) in background per evitare errori nel log
+    anno_corrente = dt_util.now(time_zone=tz_pun).year
+    anni_festivita = (anno_corrente - 1, anno_corrente, anno_corrente + 1)
     if (AwesomeVersion(HA_VERSION) >= AwesomeVersion("2024.5.0")):
         with async_pause_setup(hass, SetupPhases.WAIT_IMPORT_PACKAGES):
-            await hass.async_add_import_executor_job(holidays.IT)
+            await hass.async_add_import_executor_job(carica_festivita, anni_festivita)
+    else:
+        await hass.async_add_executor_job(carica_festivita, anni_festivita)
 
     # Salva il coordinator nella configurazione
     coordinator = PUNDataUpdateCoordinator(hass, config)
     hass.data.setdefault(DOMAIN, {})[config.entry_id] = coordinator
 
+    # Carica i prezzi già scaricati dal GME
+    await coordinator.gme_store.async_load()
+
     # Aggiorna immediatamente la fascia oraria corrente
     await coordinator.update_fascia()
 
@@ -72,6 +96,10 @@ async def async_setup_entry(hass: HomeAssistant, config: ConfigEntry) -> bool:
     # Crea i sensori con la configurazione specificata
     await hass.config_entries.async_forward_entry_setups(config, PLATFORMS)
 
+    # Ricalcola la bolletta alla variazione dei consumi, dei prezzi e degli switch
+    coordinator.track_bill_entities()
+    config.async_on_unload(coordinator.clean_bill_tracking)
+
     # Schedula l'aggiornamento via web 10 secondi dopo l'avvio
     coordinator.schedule_token = async_call_later(
         hass, timedelta(seconds=10), coordinator.update_pun
@@ -94,6 +122,18 @@ async def async_unload_entry(hass: HomeAssistant, config: ConfigEntry) -> bool:
 
     return unload_ok
 
+async def async_remove_entry(hass: HomeAssistant, config: ConfigEntry) -> None:
+    """Eliminazione dell'integrazione da Home Assistant"""
+
+    # Elimina i prezzi del GME salvati su disco
+    await async_remove_gme_store(hass, config.entry_id)
+
+    # Elimina la copia locale del file ARERA e le tariffe salvate
+    await async_remove_arera_cache(hass, config.entry_id)
+
+    # Elimina l'indice dei file del Portale Offerte
+    await async_remove_portale_index(hass, config.entry_id)
+
 async def update_listener(hass: HomeAssistant, config: ConfigEntry) -> None:
     """Modificate le opzioni da Home Assistant"""
 
@@ -117,6 +157,8 @@ async def update_listener(hass: HomeAssistant, config: ConfigEntry) -> None:
     new_monthly_entity = config.options.get(CONF_MONTHY_ENTITY_SENSOR, coordinator.monthly_entity_sensor)
     if new_monthly_entity != coordinator.monthly_entity_sensor:
         coordinator.monthly_entity_sensor = new_monthly_entity
+        # Segue il nuovo sensore dei consumi
+        coordinator.track_bill_entities()
         
     new_pun_mode = config.options.get(CONF_PUN_MODE, coordinator.pun_mode)
     if new_pun_mode != coordinator.pun_mode:
@@ -129,6 +171,8 @@ async def update_listener(hass: HomeAssistant, config: ConfigEntry) -> None:
     new_power_in_use = config.options.get(CONF_POWER_IN_USE, coordinator.power_in_use)
     if new_power_in_use != coordinator.power_in_use:
         coordinator.power_in_use = new_power_in_use
+        # Ricalcola i parametri PortaleOfferte senza scaricarli di nuovo
+        coordinator.recompute_portale_offerte()
 
     new_discount = config.options.get(CONF_DISCOUNT, coordinator.discount)
     if new_discount != coordinator.discount:
@@ -144,6 +188,18 @@ async def update_listener(hass: HomeAssistant, config: ConfigEntry) -> None:
         coordinator.house_type = new_house_type
         # Schedule an immediate ARERA tariff update
         hass.async_create_task(coordinator.update_arera_tariffs())
-        hass.async_create_task(coordinator.update_portale_offerte())
+        coordinator.recompute_portale_offerte()
+
+    # Aggiorna la pubblicazione dei sensori bolletta
+    new_bill_debounce = config.options.get(CONF_BILL_DEBOUNCE, coordinator.bill_debouncer.cooldown)
+    if new_bill_debounce != coordinator.bill_debouncer.cooldown:
+        coordinator.bill_debouncer.cooldown = new_bill_debounce
+
+    new_bill_min_delta = config.options.get(CONF_BILL_MIN_DELTA, coordinator.bill_min_delta * 100) / 100
+    if new_bill_min_delta != coordinator.bill_min_delta:
+        coordinator.bill_min_delta = new_bill_min_delta
+
+    # Forza i sensori bolletta a ricalcolare con le nuove opzioni
+    coordinator.async_set_updated_data({COORD_EVENT: EVENT_UPDATE_BILL_CONFIG})
 
 
@@ -12,8 +12,13 @@ import openpyxl
 from aiohttp import ClientSession
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
+
+from .http_cache import HttpCache, async_remove_http_cache
+from .refresh_stats import STAGE_DOWNLOAD, STAGE_PARSE, STAGE_STORE, RefreshStats
 
 from .const import (
+    DOMAIN,
     RESIDENTIAL,
     NOT_RESIDENTIAL,
     HOUSE_TYPE_LABELS,
@@ -30,16 +35,73 @@ _LOGGER = logging.getLogger(__name__)
 ARERA_BASE_URL = "https://www.arera.it/fileadmin/area_operatori/prezzi_e_tariffe/"
 ARERA_FILENAME_TEMPLATE = "E{year}_stg_domesticiNonVulnerabili.xlsx"
 
+# Name of the persistent HTTP cache holding the Excel files
+ARERA_HTTP_CACHE = "arera"
+
+# Version of the persistent cache of the parsed tariffs
+ARERA_STORAGE_VERSION = 1
+
+
+# Rows read after the house type label: header row plus the 5 rows below it
+ARERA_LABEL_BLOCK_ROWS = 6
+
+
+def _get_value(row: tuple, column: int):
+    """Return the value of a 1-based column of a streamed row (None if missing)."""
+    if column > len(row):
+        return None
+    return row[column - 1]
+
+
+def _get_cache_key(year: int, month: int, house_type) -> str:
+    """Return the key of the parsed data for a month and house type."""
+    return f"{year}_{month:02d}_{house_type}"
+
+
+def _get_storage_key(entry_id: str) -> str:
+    """Return the storage key of the parsed tariffs cache."""
+    return f"{DOMAIN}.{entry_id}.arera_tariffs"
+
 
 class AreraClient:
     """Client for downloading and parsing ARERA tariff data."""
 
-    def __init__(self, hass: HomeAssistant):
+    def __init__(self, hass: HomeAssistant, entry_id: str):
         """Initialize the ARERA client."""
         self.hass = hass
         self.session: ClientSession = async_get_clientsession(hass)
+        self._http_cache = HttpCache(hass, entry_id, ARERA_HTTP_CACHE)
+        self._store: Store[Dict[str, Any]] = Store(
+            hass, ARERA_STORAGE_VERSION, _get_storage_key(entry_id)
+        )
         self._cached_data: Dict[str, Any] = {}
+        self._cache_loaded: bool = False
         self._cache_date: Optional[date] = None
+        # Timings, bytes and records of the last lookup
+        self.stats = RefreshStats()
+
+    async def _async_load_cache(self) -> None:
+        """Load the parsed tariffs saved on disk (only once)."""
+        if self._cache_loaded:
+            return
+        if (data := await self._store.async_load()) is not None:
+            self._cached_data.update(data.get("tariffs", {}))
+        self._cache_loaded = True
+
+    async def _async_save_cache(self, oldest_key: str) -> None:
+        """Save the parsed tariffs, dropping months older than oldest_key.
+
+        Months not found in the file (empty parameters) are kept in memory
+        only, so they are looked up again after a restart.
+        """
+        self._cached_data = {
+            key: params
+            for key, params in self._cached_data.items()
+            if key[:7] >= oldest_key[:7]
+        }
+        await self._store.async_save(
+            {"tariffs": {key: params for key, params in self._cached_data.items() if params}}
+        )
 
 
     async def get_current_tariffs(self, house_type) -> Dict[str, Dict[str, float]]:
@@ -47,6 +109,11 @@ class AreraClient:
         Get tariff parameters for current month and previous month from a single ARERA file.
         Returns a dict with up to two keys: { "mp": {...}, "mpp": {...} }
         """
+        with self.stats.misura():
+            return await self._get_current_tariffs(house_type)
+
+    async def _get_current_tariffs(self, house_type) -> Dict[str, Dict[str, float]]:
+        """Look up the tariffs (measured by get_current_tariffs)."""
         current_date = datetime.now().date()
         current_year = current_date.year
         current_month = current_date.month - 1
@@ -65,6 +132,15 @@ class AreraClient:
         # Target months e anni da parsare
         target_months = {(prev_year, prev_month), (current_year, current_month)}
 
+        mp_key = _get_cache_key(current_year, current_month, house_type)
+        mpp_key = _get_cache_key(prev_year, prev_month, house_type)
+
+        # Both months are already published, so once found they never change
+        await self._async_load_cache()
+        if self._cached_data.get(mp_key) and self._cached_data.get(mpp_key):
+            _LOGGER.debug("ARERA: uso i dati salvati per %s e %s", mp_key, mpp_key)
+            return {"mp": self._cached_data[mp_key], "mpp": self._cached_data[mpp_key]}
+
         _LOGGER.info("ARERA: scarico il file excel, ricerco i mesi: %s", target_months)
 
         # Scarico e parso il file **una sola volta**
@@ -72,20 +148,26 @@ class AreraClient:
         url = f"{ARERA_BASE_URL}{filename}"
         _LOGGER.info("Scarico i dati ARERA da: %s", url)
 
-        async with self.session.get(url) as response:
-            if response.status != 200:
-                raise RuntimeError(f"HTTP {response.status} nello scarico dei dati ARERA")
-            content = await response.read()
+        # Richiesta condizionale: se il file non è cambiato usa la copia locale
+        with self.stats.fase(STAGE_DOWNLOAD) as stage:
+            content, modified = await self._http_cache.async_get(self.session, url)
+            stage.record += 1
+            if modified:
+                stage.byte += len(content)
 
-        # Parsing sincronamente nel thread executor
-        await self.hass.async_add_executor_job(
-            self._parse_excel_data, content, target_months, house_type
-        )
+        if not modified and mp_key in self._cached_data and mpp_key in self._cached_data:
+            _LOGGER.debug("File ARERA non modificato, uso i dati già letti")
+        else:
+            # Parsing sincronamente nel thread executor
+            with self.stats.fase(STAGE_PARSE) as stage:
+                stage.byte += len(content)
+                stage.record += await self.hass.async_add_executor_job(
+                    self._parse_excel_data, content, target_months
+                )
+            with self.stats.fase(STAGE_STORE):
+                await self._async_save_cache(mpp_key)
 
         # Costruisco il risultato con le chiavi 'mp' (mese-1) e 'mpp' (mese-2)
-        mp_key = f"{current_year}_{current_month:02d}"
-        mpp_key = f"{prev_year}_{prev_month:02d}"
-
         mp = self._cached_data.get(mp_key, {})
         mpp = self._cached_data.get(mpp_key, {})
 
@@ -97,9 +179,27 @@ class AreraClient:
         # Ritorno finale con esattamente le chiavi richieste
         return {"mp": mp, "mpp": mpp}
 
-    def _parse_excel_data(self, content: bytes, target_months: set[tuple[int,int]], house_type) -> None:
-        """Parse only the sheets corresponding to target_months (year, month tuples)."""
-        workbook = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
+    def _parse_excel_data(self, content: bytes, target_months: set[tuple[int,int]]) -> int:
+        """Parse only the sheets corresponding to target_months (year, month tuples).
+
+        The workbook is opened in read-only mode, so only the selected sheets
+        are streamed (and only up to the requested label block).
+        Returns the number of (month, house type) entries found.
+        """
+        workbook = openpyxl.load_workbook(
+            io.BytesIO(content), read_only=True, data_only=True
+        )
+        try:
+            return self._parse_workbook(workbook, target_months)
+        finally:
+            workbook.close()
+
+    def _parse_workbook(self, workbook, target_months: set[tuple[int,int]]) -> int:
+        """Select the target sheets by name and extract the parameters of every house type.
+
+        Returns the number of (month, house type) entries found.
+        """
+        found = 0
 
         month_map = {
             "gen": 1, "gennaio": 1,
@@ -142,15 +242,63 @@ class AreraClient:
             # estrazione parametri
             sheet = workbook[sheet_name]
             _LOGGER.debug("Accedo al foglio '%s'", sheet_name)
-            month_data = self._extract_tariff_parameters(sheet, house_type)
-            key = f"{year_in_name}_{found_month:02d}"
-            self._cached_data[key] = month_data
-            _LOGGER.debug("Ho trovato nel foglio '%s' -> %s = %s", sheet_name, key, month_data)
+            for house_type, month_data in self._extract_tariff_parameters(sheet).items():
+                key = _get_cache_key(year_in_name, found_month, house_type)
+                self._cached_data[key] = month_data
+                found += 1
+                _LOGGER.debug("Ho trovato nel foglio '%s' -> %s = %s", sheet_name, key, month_data)
+
+        return found
+
+
+    def _extract_tariff_parameters(self, sheet) -> Dict[str, Dict[str, float]]:
+        """Extract the parameters of every house type from a sheet in one row scan."""
+        labels = {
+            house_type: label.strip().lower()
+            for house_type, label in HOUSE_TYPE_LABELS.items()
+            if label and label.strip()
+        }
 
+        # Stream the rows until every label block (label row, header row and
+        # the 5 rows below it) has been read, without loading the whole sheet
+        blocks: Dict[str, list] = {}
+        found_label_rows: Dict[str, int] = {}
+        sheet.reset_dimensions()
+        for r, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            for house_type, block in blocks.items():
+                if len(block) < ARERA_LABEL_BLOCK_ROWS:
+                    block.append(row)
+
+            cell_val = _get_value(row, 2)
+            if cell_val is not None:
+                cell_text = str(cell_val).strip().lower()
+                for house_type, target_label in labels.items():
+                    if house_type not in blocks and target_label in cell_text:
+                        found_label_rows[house_type] = r
+                        blocks[house_type] = []
+                        _LOGGER.debug("Trovato label '%s' in colonna 2 alla riga %d (valore cella: %s)",
+                                      target_label, r, repr(cell_val))
+
+            if len(blocks) == len(labels) and all(
+                len(block) == ARERA_LABEL_BLOCK_ROWS for block in blocks.values()
+            ):
+                break
 
-    def _extract_tariff_parameters(self, sheet, house_type) -> Dict[str, float]:
+        results: Dict[str, Dict[str, float]] = {}
+        for house_type, target_label in labels.items():
+            if house_type not in blocks:
+                _LOGGER.warning("Label '%s' non trovata nella colonna 2 del foglio.", target_label)
+                results[house_type] = {}
+                continue
+            _LOGGER.debug("Utilizzo i dati per: '%s'", HOUSE_TYPE_LABELS.get(house_type))
+            results[house_type] = self._extract_block_parameters(
+                blocks[house_type], found_label_rows[house_type]
+            )
+        return results
+
+    def _extract_block_parameters(self, block: list, found_label_row: int) -> Dict[str, float]:
+        """Extract the parameters from the rows following a house type label."""
         parameters: Dict[str, float] = {}
-        _LOGGER.debug("Utilizzo i dati per: '%s'", HOUSE_TYPE_LABELS.get(house_type))
 
         def _parse_numeric(val):
             import re
@@ -173,44 +321,32 @@ class AreraClient:
             except Exception:
                 return None
 
-        target_label = (HOUSE_TYPE_LABELS.get(house_type) or '').strip().lower()
-        if not target_label:
-            _LOGGER.warning("HOUSE_TYPE_LABELS.get(house_type) è vuoto o non definito.")
-            return parameters
-
-        found_label_row = None
-        for r in range(1, sheet.max_row + 1):
-            cell_val = sheet.cell(row=r, column=2).value
-            if cell_val is None:
-                continue
-            if target_label in str(cell_val).strip().lower():
-                found_label_row = r
-                _LOGGER.debug("Trovato label '%s' in colonna 2 alla riga %d (valore cella: %s)",
-                              target_label, r, repr(cell_val))
-                break
-
-        if not found_label_row:
-            _LOGGER.warning("Label '%s' non trovata nella colonna 2 del foglio.", target_label)
-            return parameters
+        def _block_value(row_number: int, column: int):
+            """Return a cell value of the label block (None if missing)."""
+            index = row_number - found_label_row - 1
+            if index >= len(block):
+                return None
+            return _get_value(block[index], column)
 
         header_row = found_label_row + 1
         asos_arim_value_row = header_row + 3
         servizi_col = None
+        header = block[0] if block else ()
 
-        for c in range(1, sheet.max_column + 1):
-            header_cell = sheet.cell(row=header_row, column=c).value
+        for c in range(1, len(header) + 1):
+            header_cell = header[c - 1]
             if header_cell is None:
                 continue
             header_text = ' '.join(str(header_cell).split()).lower()
 
             # ASOS / ARIM (two rows below header_row)
             if 'asos' in header_text and CONF_ASOS_SC1 not in parameters:
-                v = _parse_numeric(sheet.cell(row=asos_arim_value_row, column=c).value)
+                v = _parse_numeric(_block_value(asos_arim_value_row, c))
                 if v is not None:
                     parameters[CONF_ASOS_SC1] = v
                     _LOGGER.debug("ASOS trovato in r%d c%d -> %s", asos_arim_value_row, c, v)
             if 'arim' in header_text and CONF_ARIM_SC1 not in parameters:
-                v = _parse_numeric(sheet.cell(row=asos_arim_value_row, column=c).value)
+                v = _parse_numeric(_block_value(asos_arim_value_row, c))
                 if v is not None:
                     parameters[CONF_ARIM_SC1] = v
                     _LOGGER.debug("ARIM trovato in r%d c%d -> %s", asos_arim_value_row, c, v)
@@ -225,9 +361,9 @@ class AreraClient:
             fixq_row = header_row + 4
             quota_row = header_row + 5
 
-            raw_energy = sheet.cell(row=energy_row, column=servizi_col).value
-            raw_fixq = sheet.cell(row=fixq_row, column=servizi_col).value
-            raw_quota = sheet.cell(row=quota_row, column=servizi_col).value
+            raw_energy = _block_value(energy_row, servizi_col)
+            raw_fixq = _block_value(fixq_row, servizi_col)
+            raw_quota = _block_value(quota_row, servizi_col)
 
             v_energy = _parse_numeric(raw_energy)
             v_fixq = _parse_numeric(raw_fixq)
@@ -267,4 +403,10 @@ class AreraClient:
             
         except Exception as e:
             _LOGGER.error("Non riesco ad ottenere i valori ARERA, uso quelli di default: %s", e)
-            return None
\ No newline at end of file
+            return None
+
+
+async def async_remove_arera_cache(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the ARERA caches saved for the given config entry."""
+    await Store(hass, ARERA_STORAGE_VERSION, _get_storage_key(entry_id)).async_remove()
+    await async_remove_http_cache(hass, entry_id, ARERA_HTTP_CACHE)
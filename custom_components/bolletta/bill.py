@@ -0,0 +1,380 @@
+"""Calcolo incrementale delle voci della bolletta."""
+
+from collections import ChainMap
+from collections.abc import Callable, Hashable, Mapping
+import logging
+from types import MappingProxyType
+from typing import Any
+
+from .const import (
+    BILL_ACCISA_TAX,
+    BILL_ASOS_ARIM_QUOTE,
+    BILL_ENERGY_ENERGY_QUOTE,
+    BILL_ENERGY_FIX_QUOTE,
+    BILL_IVA,
+    BILL_KWH_PRICE,
+    BILL_TOTAL,
+    BILL_TRANSPORT_ENERGY_QUOTE,
+    BILL_TRANSPORT_FIX_QUOTE,
+    BILL_TRANSPORT_POWER_QUOTE,
+    EVENT_UPDATE_ARERA,
+    EVENT_UPDATE_BILL_CONFIG,
+    EVENT_UPDATE_PORTALE,
+    EVENT_UPDATE_PUN,
+    PUN_MODE_FIXED,
+)
+
+# Ottiene il logger
+_LOGGER = logging.getLogger(__name__)
+
+# Ingressi del calcolo (valori del coordinator, degli switch e dei sensori)
+INPUT_PUN_MODE = "pun_mode"
+INPUT_FIXED_PUN_VALUE = "fixed_pun_value"
+INPUT_PUN_MONO = "pun_mono"
+INPUT_PUN_MONO_MP = "pun_mono_mp"
+INPUT_CONSUMO = "consumo"
+INPUT_CONSUMO_PRECEDENTE = "consumo_precedente"
+INPUT_INVOICE_SHIFT = "invoice_shift"
+INPUT_INVOICE_MONTHLY = "invoice_monthly"
+INPUT_MESE = "mese"
+INPUT_NW_LOSS_PERCENTAGE = "nw_loss_percentage"
+INPUT_OTHER_FEE = "other_fee"
+INPUT_ENERGY_SC1 = "energy_sc1"
+INPUT_ENERGY_SC1_MP = "energy_sc1_mp"
+INPUT_ASOS_SC1 = "asos_sc1"
+INPUT_ASOS_SC1_MP = "asos_sc1_mp"
+INPUT_ARIM_SC1 = "arim_sc1"
+INPUT_ARIM_SC1_MP = "arim_sc1_mp"
+INPUT_ACCISA_TAX = "accisa_tax"
+INPUT_FIX_QUOTA_AGGR_MEASURE = "fix_quota_aggr_measure"
+INPUT_MONTHLY_FEE = "monthly_fee"
+INPUT_FIX_QUOTA_TRANSPORT = "fix_quota_transport"
+INPUT_FIX_QUOTA_TRANSPORT_MP = "fix_quota_transport_mp"
+INPUT_QUOTA_POWER = "quota_power"
+INPUT_QUOTA_POWER_MP = "quota_power_mp"
+INPUT_POWER_IN_USE = "power_in_use"
+INPUT_DISCOUNT = "discount"
+INPUT_IVA = "iva"
+INPUT_TV_TAX = "tv_tax"
+
+# Nodo interno: indica se la fattura comprende anche il periodo precedente
+NODE_INCLUDE_LAST_PERIOD = "include_last_period"
+
+# Voci che compongono l'imponibile della bolletta
+BILL_COMPONENTS = (
+    BILL_ENERGY_FIX_QUOTE,
+    BILL_ENERGY_ENERGY_QUOTE,
+    BILL_TRANSPORT_FIX_QUOTE,
+    BILL_TRANSPORT_POWER_QUOTE,
+    BILL_TRANSPORT_ENERGY_QUOTE,
+    BILL_ASOS_ARIM_QUOTE,
+    BILL_ACCISA_TAX,
+)
+
+
+def _include_last_period(v: Mapping) -> bool:
+    """Verifica se sommare anche il periodo precedente (fattura bimestrale)."""
+    if v[INPUT_INVOICE_MONTHLY]:
+        # fatturazione mese singolo → non sommare mai last_period
+        return False
+    # bimestrale
+    if v[INPUT_INVOICE_SHIFT]:
+        return (v[INPUT_MESE] % 2) == 1  # Feb/Mar, Apr/Mag…
+    return (v[INPUT_MESE] % 2) == 0  # Gen/Feb, Mar/Apr…
+
+
+def _kwh_price(v: Mapping) -> float:
+    """Prezzo del kWh."""
+    if v[INPUT_PUN_MODE] == PUN_MODE_FIXED:
+        pun_value = v[INPUT_FIXED_PUN_VALUE]
+    else:
+        pun_value = v[INPUT_PUN_MONO]
+    total = round(float(pun_value), 2)
+    total += round((float(v[INPUT_NW_LOSS_PERCENTAGE]) / 100) * float(pun_value), 2)
+    total += round(float(v[INPUT_OTHER_FEE]), 2)
+
+    total += round(v[INPUT_ENERGY_SC1], 2)
+    total += round(v[INPUT_ASOS_SC1], 2)
+    total += round(v[INPUT_ARIM_SC1], 2)
+    total += round(v[INPUT_ACCISA_TAX], 2)
+    return total
+
+
+def _energy_fix_quote(v: Mapping) -> float:
+    """Spesa per l'energia - quota fissa."""
+    total = round(v[INPUT_FIX_QUOTA_AGGR_MEASURE], 2) + round(v[INPUT_MONTHLY_FEE], 2)
+    if v[NODE_INCLUDE_LAST_PERIOD]:
+        total += round(v[INPUT_FIX_QUOTA_AGGR_MEASURE], 2) + round(v[INPUT_MONTHLY_FEE], 2)
+    return total
+
+
+def _energy_energy_quote(v: Mapping) -> float:
+    """Spesa per l'energia - quota energia."""
+    if v[INPUT_PUN_MODE] == PUN_MODE_FIXED:
+        pun_value = pun_value_mp = v[INPUT_FIXED_PUN_VALUE]
+    else:
+        pun_value = v[INPUT_PUN_MONO]
+        pun_value_mp = v[INPUT_PUN_MONO_MP]
+
+    consumo = float(v[INPUT_CONSUMO])
+    total = round(consumo * float(pun_value), 2)
+    total = float(f"{total:.2f}")
+    total += round(consumo * ((float(v[INPUT_NW_LOSS_PERCENTAGE])) * float(pun_value)), 2)
+    total = float(f"{total:.2f}")
+    total += round(consumo * ((float(v[INPUT_OTHER_FEE]))), 2)
+    total = float(f"{total:.2f}")
+    if v[NODE_INCLUDE_LAST_PERIOD]:
+        consumo_precedente = float(v[INPUT_CONSUMO_PRECEDENTE])
+        total += round(consumo_precedente * float(pun_value_mp), 2)
+        total = float(f"{total:.2f}")
+        total += round((consumo_precedente * ((float(v[INPUT_NW_LOSS_PERCENTAGE])) * float(pun_value_mp))), 2)
+        total = float(f"{total:.2f}")
+        total += round(consumo_precedente * ((float(v[INPUT_OTHER_FEE]))), 2)
+        total = float(f"{total:.2f}")
+    return total
+
+
+def _transport_fix_quote(v: Mapping) -> float:
+    """Spesa per il trasporto e contatore - quota fissa."""
+    total = round(v[INPUT_FIX_QUOTA_TRANSPORT], 2)
+    if v[NODE_INCLUDE_LAST_PERIOD]:
+        total += round(v[INPUT_FIX_QUOTA_TRANSPORT_MP], 2)
+    return total
+
+
+def _transport_power_quote(v: Mapping) -> float:
+    """Spesa per il trasporto e contatore - quota potenza."""
+    total = round((v[INPUT_QUOTA_POWER]) * v[INPUT_POWER_IN_USE], 2)
+    if v[NODE_INCLUDE_LAST_PERIOD]:
+        total += round((v[INPUT_QUOTA_POWER_MP]) * v[INPUT_POWER_IN_USE], 2)
+    return total
+
+
+def _transport_energy_quote(v: Mapping) -> float:
+    """Spesa per il trasporto e contatore - quota energia."""
+    total = round(float(v[INPUT_CONSUMO]) * v[INPUT_ENERGY_SC1], 2)
+    if v[NODE_INCLUDE_LAST_PERIOD]:
+        total += round(float(v[INPUT_CONSUMO_PRECEDENTE]) * v[INPUT_ENERGY_SC1_MP], 2)
+    return total
+
+
+def _asos_arim_quote(v: Mapping) -> float:
+    """Spesa per gli oneri di sistema."""
+    total = round(float(v[INPUT_CONSUMO]) * v[INPUT_ASOS_SC1], 2)
+    total += round(float(v[INPUT_CONSUMO]) * v[INPUT_ARIM_SC1], 2)
+    if v[NODE_INCLUDE_LAST_PERIOD]:
+        total += round(float(v[INPUT_CONSUMO_PRECEDENTE]) * v[INPUT_ASOS_SC1_MP], 2)
+        total += round(float(v[INPUT_CONSUMO_PRECEDENTE]) * v[INPUT_ARIM_SC1_MP], 2)
+    return total
+
+
+def _accisa_tax(v: Mapping) -> float:
+    """Imposta erariale di consumo - accisa."""
+    total = round(float(v[INPUT_CONSUMO]) * v[INPUT_ACCISA_TAX], 2)
+    if v[NODE_INCLUDE_LAST_PERIOD]:
+        total += round(float(v[INPUT_CONSUMO_PRECEDENTE]) * v[INPUT_ACCISA_TAX], 2)
+    return total
+
+
+def _iva(v: Mapping) -> float:
+    """Totale IVA."""
+    total = 0.0
+    for componente in BILL_COMPONENTS:
+        total += round(float(v[componente]), 2)
+    total -= round(float(v[INPUT_DISCOUNT]), 2) * 2
+
+    return total * float(v[INPUT_IVA])
+
+
+def _total(v: Mapping) -> float:
+    """Totale fattura."""
+    total = 0.0
+    for componente in BILL_COMPONENTS:
+        total += round(float(v[componente]), 2)
+    total += round(float(v[BILL_IVA]), 2)
+    total -= round(float(v[INPUT_DISCOUNT]), 2) * 2
+    if v[INPUT_MESE] != 11 and v[INPUT_MESE] != 12:
+        total += round(float(v[INPUT_TV_TAX]), 2) * 2
+    return total
+
+
+# Grafo delle dipendenze: per ogni nodo gli ingressi/nodi da cui dipende
+# e la funzione di calcolo (in ordine topologico)
+BILL_NODES: dict[Hashable, tuple[frozenset, Callable[[Mapping], Any]]] = {
+    NODE_INCLUDE_LAST_PERIOD: (
+        frozenset({INPUT_INVOICE_MONTHLY, INPUT_INVOICE_SHIFT, INPUT_MESE}),
+        _include_last_period,
+    ),
+    BILL_KWH_PRICE: (
+        frozenset(
+            {
+                INPUT_PUN_MODE,
+                INPUT_FIXED_PUN_VALUE,
+                INPUT_PUN_MONO,
+                INPUT_NW_LOSS_PERCENTAGE,
+                INPUT_OTHER_FEE,
+                INPUT_ENERGY_SC1,
+                INPUT_ASOS_SC1,
+                INPUT_ARIM_SC1,
+                INPUT_ACCISA_TAX,
+            }
+        ),
+        _kwh_price,
+    ),
+    BILL_ENERGY_FIX_QUOTE: (
+        frozenset(
+            {INPUT_FIX_QUOTA_AGGR_MEASURE, INPUT_MONTHLY_FEE, NODE_INCLUDE_LAST_PERIOD}
+        ),
+        _energy_fix_quote,
+    ),
+    BILL_ENERGY_ENERGY_QUOTE: (
+        frozenset(
+            {
+                INPUT_PUN_MODE,
+                INPUT_FIXED_PUN_VALUE,
+                INPUT_PUN_MONO,
+                INPUT_PUN_MONO_MP,
+                INPUT_CONSUMO,
+                INPUT_CONSUMO_PRECEDENTE,
+                INPUT_NW_LOSS_PERCENTAGE,
+                INPUT_OTHER_FEE,
+                NODE_INCLUDE_LAST_PERIOD,
+            }
+        ),
+        _energy_energy_quote,
+    ),
+    BILL_TRANSPORT_FIX_QUOTE: (
+        frozenset(
+            {
+                INPUT_FIX_QUOTA_TRANSPORT,
+                INPUT_FIX_QUOTA_TRANSPORT_MP,
+                NODE_INCLUDE_LAST_PERIOD,
+            }
+        ),
+        _transport_fix_quote,
+    ),
+    BILL_TRANSPORT_POWER_QUOTE: (
+        frozenset(
+            {
+                INPUT_QUOTA_POWER,
+                INPUT_QUOTA_POWER_MP,
+                INPUT_POWER_IN_USE,
+                NODE_INCLUDE_LAST_PERIOD,
+            }
+        ),
+        _transport_power_quote,
+    ),
+    BILL_TRANSPORT_ENERGY_QUOTE: (
+        frozenset(
+            {
+                INPUT_CONSUMO,
+                INPUT_CONSUMO_PRECEDENTE,
+                INPUT_ENERGY_SC1,
+                INPUT_ENERGY_SC1_MP,
+                NODE_INCLUDE_LAST_PERIOD,
+            }
+        ),
+        _transport_energy_quote,
+    ),
+    BILL_ASOS_ARIM_QUOTE: (
+        frozenset(
+            {
+                INPUT_CONSUMO,
+                INPUT_CONSUMO_PRECEDENTE,
+                INPUT_ASOS_SC1,
+                INPUT_ASOS_SC1_MP,
+                INPUT_ARIM_SC1,
+                INPUT_ARIM_SC1_MP,
+                NODE_INCLUDE_LAST_PERIOD,
+            }
+        ),
+        _asos_arim_quote,
+    ),
+    BILL_ACCISA_TAX: (
+        frozenset(
+            {
+                INPUT_CONSUMO,
+                INPUT_CONSUMO_PRECEDENTE,
+                INPUT_ACCISA_TAX,
+                NODE_INCLUDE_LAST_PERIOD,
+            }
+        ),
+        _accisa_tax,
+    ),
+    BILL_IVA: (
+        frozenset({*BILL_COMPONENTS, INPUT_DISCOUNT, INPUT_IVA}),
+        _iva,
+    ),
+    BILL_TOTAL: (
+        frozenset({*BILL_COMPONENTS, BILL_IVA, INPUT_DISCOUNT, INPUT_TV_TAX, INPUT_MESE}),
+        _total,
+    ),
+}
+
+# Eventi del coordinator che cambiano gli ingressi del calcolo (gli ingressi
+# sono riletti tutti: BillEngine ricalcola solo i nodi di quelli cambiati)
+BILL_EVENTS: frozenset[str] = frozenset(
+    {
+        EVENT_UPDATE_PUN,
+        EVENT_UPDATE_ARERA,
+        EVENT_UPDATE_PORTALE,
+        EVENT_UPDATE_BILL_CONFIG,
+    }
+)
+
+
+class BillEngine:
+    """Calcola le voci della bolletta ricalcolando solo i nodi con ingressi cambiati.
+
+    Dopo ogni aggiornamento pubblica una fotografia immutabile dei valori
+    (None se la voce non è calcolabile) e la versione di ciascun nodo, che
+    aumenta solo quando il suo valore cambia.
+    """
+
+    def __init__(self) -> None:
+        """Inizializza il motore di calcolo (nessun valore calcolato)."""
+        self._inputs: dict[str, Any] = {}
+        self._values: dict[Hashable, Any] = {}
+        self._versions: dict[Hashable, int] = {nodo: 0 for nodo in BILL_NODES}
+        self.snapshot: Mapping[Hashable, Any] = MappingProxyType({})
+        self.versions: Mapping[Hashable, int] = MappingProxyType(dict(self._versions))
+
+    def update(self, inputs: Mapping[str, Any]) -> set[Hashable]:
+        """Aggiorna gli ingressi e ricalcola i nodi che ne dipendono.
+
+        Returns:
+        set[Hashable]: i nodi il cui valore è cambiato.
+
+        """
+        cambiati: set[Hashable] = {
+            nome
+            for nome, valore in inputs.items()
+            if nome not in self._inputs or self._inputs[nome] != valore
+        }
+        self._inputs.update(inputs)
+
+        nodi_cambiati: set[Hashable] = set()
+        valori = ChainMap(self._values, self._inputs)
+        for nodo, (dipendenze, calcolo) in BILL_NODES.items():
+            # Salta i nodi già calcolati i cui ingressi non sono cambiati
+            if nodo in self._values and cambiati.isdisjoint(dipendenze):
+                continue
+
+            try:
+                valore = calcolo(valori)
+            except (ArithmeticError, LookupError, TypeError, ValueError) as e:
+                _LOGGER.debug("Voce della bolletta %s non calcolabile: %s", nodo, e)
+                valore = None
+
+            if nodo not in self._values or self._values[nodo] != valore:
+                self._values[nodo] = valore
+                self._versions[nodo] += 1
+                cambiati.add(nodo)
+                nodi_cambiati.add(nodo)
+
+        # Pubblica i nuovi valori
+        if nodi_cambiati:
+            self.snapshot = MappingProxyType(dict(self._values))
+            self.versions = MappingProxyType(dict(self._versions))
+
+        return nodi_cambiati
@@ -25,7 +25,11 @@ from .const import (
     PUN_MODE_FIXED,
     CONF_HOUSE_TYPE,
     RESIDENTIAL,
-    NOT_RESIDENTIAL
+    NOT_RESIDENTIAL,
+    CONF_BILL_DEBOUNCE,
+    CONF_BILL_MIN_DELTA,
+    DEFAULT_BILL_DEBOUNCE,
+    DEFAULT_BILL_MIN_DELTA,
 )
 from .interfaces import DEFAULT_ZONA, Zona
 
@@ -149,6 +153,9 @@ class PUNOptionsFlow(config_entries.OptionsFlow):
         data_schema = {
             vol.Required(CONF_DISCOUNT, default=self._entry.options.get(CONF_DISCOUNT, self._entry.data[CONF_DISCOUNT])) : cv.positive_float,
             vol.Required(CONF_TV_TAX, default=self._entry.options.get(CONF_TV_TAX, self._entry.data[CONF_TV_TAX])) : cv.positive_float,
+            vol.Required(CONF_BILL_DEBOUNCE, default=self._entry.options.get(CONF_BILL_DEBOUNCE, self._entry.data.get(CONF_BILL_DEBOUNCE, DEFAULT_BILL_DEBOUNCE))) :
+                vol.All(vol.Coerce(float), vol.Range(min=0, max=3600)),
+            vol.Required(CONF_BILL_MIN_DELTA, default=self._entry.options.get(CONF_BILL_MIN_DELTA, self._entry.data.get(CONF_BILL_MIN_DELTA, DEFAULT_BILL_MIN_DELTA))) : cv.positive_float,
         }
         # Mostra la schermata di configurazione, con gli eventuali errori
         return self.async_show_form(
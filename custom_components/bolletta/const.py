@@ -57,6 +57,8 @@ EVENT_UPDATE_FASCIA = "event_update_fascia"
 EVENT_UPDATE_PUN = "event_update_pun"
 EVENT_UPDATE_PREZZO_ZONALE = "event_update_prezzo_zonale"
 EVENT_UPDATE_ARERA = "event_update_arera"
+EVENT_UPDATE_PORTALE = "event_update_portale"
+EVENT_UPDATE_BILL_CONFIG = "event_update_bill_config"
 
 # Parametri configurabili da configuration.yaml
 CONF_SCAN_HOUR = "scan_hour"
@@ -78,4 +80,10 @@ NOT_RESIDENTIAL = "not_residential"
 HOUSE_TYPE_LABELS = {
     RESIDENTIAL: "Abitazioni di residenza anagrafica",
     NOT_RESIDENTIAL: "Abitazioni diverse dalla residenza anagrafica",
-}
\ No newline at end of file
+}
+
+# Pubblicazione dei sensori della bolletta
+CONF_BILL_DEBOUNCE = "bill_debounce"
+CONF_BILL_MIN_DELTA = "bill_min_delta"
+DEFAULT_BILL_DEBOUNCE = 5  # secondi
+DEFAULT_BILL_MIN_DELTA = 0  # centesimi di euro
@@ -4,16 +4,23 @@ from datetime import date, datetime, timedelta
 import io
 import logging
 import random
-from statistics import mean
+import time
+from typing import Any
 import zipfile
 
 from aiohttp import ClientSession, ServerConnectionError
 from zoneinfo import ZoneInfo
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.event import async_call_later, async_track_point_in_time
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_point_in_time,
+    async_track_state_change_event,
+)
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 import homeassistant.util.dt as dt_util
 
@@ -41,6 +48,7 @@ from .const import (
     PUN_MODE_CALCULATED,
     CONF_FIXED_PUN_VALUE,
     EVENT_UPDATE_ARERA,
+    EVENT_UPDATE_PORTALE,
     CONF_HOUSE_TYPE,
     RESIDENTIAL,
     NOT_RESIDENTIAL,
@@ -54,11 +62,65 @@ from .const import (
     CONF_ASOS_SC1_MP,
     CONF_ARIM_SC1,
     CONF_ARIM_SC1_MP,
+    CONF_BILL_DEBOUNCE,
+    CONF_BILL_MIN_DELTA,
+    DEFAULT_BILL_DEBOUNCE,
+    DEFAULT_BILL_MIN_DELTA,
+)
+from .interfaces import DEFAULT_ZONA, Fascia, GmeDay, PunData, PunValues, PunDataMP, PunValuesMP, Zona
+from .utils import (
+    extract_pun_data,
+    get_fascia,
+    get_gme_download_range,
+    get_hour_datetime,
+    get_next_date,
+    parse_gme_archive,
 )
-from .interfaces import DEFAULT_ZONA, Fascia, PunData, PunValues, PunDataMP, PunValuesMP, Zona
-from .utils import extract_xml, extract_xml2, get_fascia, get_hour_datetime, get_next_date
 from .arera_client import AreraClient
+from .bill import (
+    INPUT_ACCISA_TAX,
+    INPUT_ARIM_SC1,
+    INPUT_ARIM_SC1_MP,
+    INPUT_ASOS_SC1,
+    INPUT_ASOS_SC1_MP,
+    INPUT_CONSUMO,
+    INPUT_CONSUMO_PRECEDENTE,
+    INPUT_DISCOUNT,
+    INPUT_ENERGY_SC1,
+    INPUT_ENERGY_SC1_MP,
+    INPUT_FIX_QUOTA_AGGR_MEASURE,
+    INPUT_FIX_QUOTA_TRANSPORT,
+    INPUT_FIX_QUOTA_TRANSPORT_MP,
+    INPUT_FIXED_PUN_VALUE,
+    INPUT_INVOICE_MONTHLY,
+    INPUT_INVOICE_SHIFT,
+    INPUT_IVA,
+    INPUT_MESE,
+    INPUT_MONTHLY_FEE,
+    INPUT_NW_LOSS_PERCENTAGE,
+    INPUT_OTHER_FEE,
+    INPUT_POWER_IN_USE,
+    INPUT_PUN_MODE,
+    INPUT_PUN_MONO,
+    INPUT_PUN_MONO_MP,
+    INPUT_QUOTA_POWER,
+    INPUT_QUOTA_POWER_MP,
+    INPUT_TV_TAX,
+    BILL_EVENTS,
+    BillEngine,
+)
+from .gme_store import GmeStore
 from .portale_offerte_client import PortaleOfferteClient
+from .refresh_stats import (
+    REFRESH_ARERA,
+    REFRESH_GME,
+    REFRESH_PORTALE,
+    STAGE_AGGREGATE,
+    STAGE_DOWNLOAD,
+    STAGE_PUBLISH,
+    STAGE_STORE,
+    RefreshStats,
+)
 
 # Ottiene il logger
 _LOGGER = logging.getLogger(__name__)
@@ -66,6 +128,23 @@ _LOGGER = logging.getLogger(__name__)
 # Usa sempre il fuso orario italiano (i dati del sito sono per il mercato italiano)
 tz_pun = ZoneInfo("Europe/Rome")
 
+# Indirizzo del sito Mercato elettrico (sostituibile nei test)
+GME_BASE_URL = "https://gme.mercatoelettrico.org"
+
+# Entità lette dal calcolo della bolletta (oltre al sensore dei consumi)
+BILL_PUN_MONO_ENTITY = "sensor.pun_mono_orario"
+BILL_PUN_MONO_MP_ENTITY = "sensor.pun_mono_orario_mp"
+BILL_INVOICE_SHIFT_ENTITY = "switch.invoice_shift"
+BILL_INVOICE_MONTHLY_ENTITY = "switch.invoice_monthly"
+
+
+def _parse_float(valore: Any) -> float | None:
+    """Converte lo stato di un'entità in numero (None se non è numerico)."""
+    try:
+        return float(valore)
+    except (TypeError, ValueError):
+        return None
+
 
 class PUNDataUpdateCoordinator(DataUpdateCoordinator):
     """Classe coordinator di aggiornamento dati."""
@@ -155,22 +234,61 @@ class PUNDataUpdateCoordinator(DataUpdateCoordinator):
         )
 
         # Initialize ARERA client
-        self.arera_client = AreraClient(hass)
+        self.arera_client = AreraClient(hass, config.entry_id)
         # variables to handle scheduling/retries for ARERA client
         self.web_retries_arera = 0
         self.arera_schedule_token = None
 
         # Initialize PortaleOfferte client
-        self.portale_client = PortaleOfferteClient(hass)
+        self.portale_client = PortaleOfferteClient(hass, config.entry_id)
         # variables to handle scheduling/retries for portale_offerte
         self.web_retries_portale = 0
         self.portale_schedule_token = None
 
+        # Statistiche dell'ultimo aggiornamento di ciascuna sorgente
+        self.refresh_stats: dict[str, RefreshStats] = {
+            REFRESH_GME: RefreshStats(),
+            REFRESH_ARERA: self.arera_client.stats,
+            REFRESH_PORTALE: self.portale_client.stats,
+        }
+        # Segnale inviato ai sensori diagnostici al termine di un aggiornamento
+        self.stats_signal: str = f"{DOMAIN}_{config.entry_id}_stats"
+
         
         # Inizializza i dati PUN e la zona geografica
         self.pun_data: PunData = PunData()
         # Inizializza i dati PUN e la zona geografica
         self.pun_data_mp: PunDataMP = PunDataMP()
+        # Prezzi del GME già scaricati, per giorno (salvati su disco)
+        self.gme_store: GmeStore = GmeStore(hass, config.entry_id)
+        # Calcolo delle voci della bolletta (condiviso da tutti i sensori)
+        self.bill_engine: BillEngine = BillEngine()
+        # Segnale inviato ai sensori quando cambiano le voci della bolletta
+        self.bill_signal: str = f"{DOMAIN}_{config.entry_id}_bill"
+        # Ingressi della bolletta letti dalle entità (già convertiti)
+        self.bill_states: dict[str, Any] = {}
+        self._bill_unsub: list[CALLBACK_TYPE] = []
+        # Ricalcolo della bolletta all'inizio del mese successivo
+        self._bill_month_unsub: CALLBACK_TYPE | None = None
+        # Raggruppa le variazioni ravvicinate delle entità in un solo ricalcolo
+        self.bill_debouncer: Debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=config.options.get(
+                CONF_BILL_DEBOUNCE,
+                config.data.get(CONF_BILL_DEBOUNCE, DEFAULT_BILL_DEBOUNCE),
+            ),
+            immediate=True,
+            function=self.update_bill,
+        )
+        # Variazione minima (in euro) per aggiornare lo stato dei sensori
+        self.bill_min_delta: float = (
+            config.options.get(
+                CONF_BILL_MIN_DELTA,
+                config.data.get(CONF_BILL_MIN_DELTA, DEFAULT_BILL_MIN_DELTA),
+            )
+            / 100
+        )
         try:
             # Estrae il valore dalla configurazione come stringa
             zona_string = config.options.get(
@@ -293,61 +411,234 @@ class PUNDataUpdateCoordinator(DataUpdateCoordinator):
             # Carica i minuti dalla configurazione
             self.scan_minute = config.data.get(CONF_SCAN_MINUTE, 0)
 
+    @callback
+    def track_bill_entities(self) -> None:
+        """Segue le entità usate nel calcolo della bolletta e gli eventi del coordinator."""
+        self.clean_bill_tracking()
+
+        # Legge lo stato attuale delle entità
+        entita = (
+            self.monthly_entity_sensor,
+            BILL_PUN_MONO_ENTITY,
+            BILL_PUN_MONO_MP_ENTITY,
+            BILL_INVOICE_SHIFT_ENTITY,
+            BILL_INVOICE_MONTHLY_ENTITY,
+        )
+        for entity_id in entita:
+            self._read_bill_state(entity_id, self.hass.states.get(entity_id))
+
+        # Ricalcola la bolletta ad ogni variazione delle entità
+        self._bill_unsub = [
+            async_track_state_change_event(
+                self.hass, list(entita), self._handle_bill_state_change
+            ),
+            self.async_add_listener(self._handle_bill_event),
+        ]
+        self._schedule_bill_month()
+        self.update_bill()
+
+    @callback
+    def clean_bill_tracking(self) -> None:
+        """Annulla il monitoraggio delle entità usate nel calcolo della bolletta."""
+        for unsub in self._bill_unsub:
+            unsub()
+        self._bill_unsub = []
+        if self._bill_month_unsub is not None:
+            self._bill_month_unsub()
+            self._bill_month_unsub = None
+        self.bill_debouncer.async_cancel()
+
+    @callback
+    def _schedule_bill_month(self) -> None:
+        """Schedula il ricalcolo della bolletta all'inizio del mese successivo.
+
+        Le voci che dipendono dal mese (INPUT_MESE) non cambiano con le
+        entità né con gli eventi del coordinator.
+        """
+        oggi = dt_util.now().date()
+        inizio_mese = (oggi.replace(day=28) + timedelta(days=4)).replace(day=1)
+        self._bill_month_unsub = async_track_point_in_time(
+            self.hass,
+            self._handle_bill_month,
+            dt_util.start_of_local_day(inizio_mese),
+        )
+
+    @callback
+    def _handle_bill_month(self, now: datetime) -> None:
+        """Ricalcola la bolletta al cambio del mese."""
+        self._schedule_bill_month()
+        self.update_bill()
+
+    def _read_bill_state(self, entity_id: str, stato: State | None) -> bool:
+        """Converte lo stato dell'entità negli ingressi della bolletta.
+
+        Returns:
+        bool: True se almeno un ingresso è cambiato.
+
+        """
+        if entity_id == self.monthly_entity_sensor:
+            valori = {
+                INPUT_CONSUMO: _parse_float(stato.state if stato else None),
+                INPUT_CONSUMO_PRECEDENTE: _parse_float(
+                    stato.attributes.get("last_period") if stato else None
+                ),
+            }
+        elif entity_id == BILL_PUN_MONO_ENTITY:
+            valori = {INPUT_PUN_MONO: _parse_float(stato.state if stato else None)}
+        elif entity_id == BILL_PUN_MONO_MP_ENTITY:
+            valori = {INPUT_PUN_MONO_MP: _parse_float(stato.state if stato else None)}
+        elif entity_id == BILL_INVOICE_SHIFT_ENTITY:
+            valori = {INPUT_INVOICE_SHIFT: bool(stato and stato.state == "on")}
+        elif entity_id == BILL_INVOICE_MONTHLY_ENTITY:
+            valori = {INPUT_INVOICE_MONTHLY: bool(stato and stato.state == "on")}
+        else:
+            return False
+
+        cambiati = False
+        for nome, valore in valori.items():
+            if nome not in self.bill_states or self.bill_states[nome] != valore:
+                self.bill_states[nome] = valore
+                cambiati = True
+        return cambiati
+
+    @callback
+    def _handle_bill_state_change(self, event: Event) -> None:
+        """Ricalcola la bolletta quando cambia un'entità che ne fa parte."""
+        if self._read_bill_state(event.data["entity_id"], event.data["new_state"]):
+            self.hass.async_create_task(self.bill_debouncer.async_call())
+
+    @callback
+    def _handle_bill_event(self) -> None:
+        """Ricalcola la bolletta per gli eventi del coordinator che la riguardano."""
+        if self.data is None:
+            return
+        if self.data.get(COORD_EVENT) in BILL_EVENTS:
+            self.update_bill()
+
+    @callback
+    def update_bill(self) -> None:
+        """Aggiorna gli ingressi del calcolo della bolletta e ricalcola le voci cambiate."""
+
+        # Usa i prezzi appena calcolati (i sensori PUN potrebbero non essere
+        # ancora aggiornati), altrimenti lo stato ripristinato dei sensori
+        if len(self.pun_data.pun[Fascia.MONO]) > 0:
+            pun_mono = self.pun_values.value[Fascia.MONO]
+        else:
+            pun_mono = self.bill_states.get(INPUT_PUN_MONO)
+        if len(self.pun_data_mp.pun[Fascia.MONO_MP]) > 0:
+            pun_mono_mp = self.pun_values_mp.value[Fascia.MONO_MP]
+        else:
+            pun_mono_mp = self.bill_states.get(INPUT_PUN_MONO_MP)
+
+        nodi = self.bill_engine.update(
+            {
+                INPUT_PUN_MODE: self.pun_mode,
+                INPUT_FIXED_PUN_VALUE: self.fixed_pun_value,
+                INPUT_PUN_MONO: pun_mono,
+                INPUT_PUN_MONO_MP: pun_mono_mp,
+                INPUT_CONSUMO: self.bill_states.get(INPUT_CONSUMO),
+                INPUT_CONSUMO_PRECEDENTE: self.bill_states.get(INPUT_CONSUMO_PRECEDENTE),
+                INPUT_INVOICE_SHIFT: self.bill_states.get(INPUT_INVOICE_SHIFT, False),
+                INPUT_INVOICE_MONTHLY: self.bill_states.get(INPUT_INVOICE_MONTHLY, False),
+                INPUT_MESE: dt_util.now().date().month,
+                INPUT_NW_LOSS_PERCENTAGE: self.nw_loss_percentage,
+                INPUT_OTHER_FEE: self.other_fee,
+                INPUT_ENERGY_SC1: self.energy_sc1,
+                INPUT_ENERGY_SC1_MP: self.energy_sc1_mp,
+                INPUT_ASOS_SC1: self.asos_sc1,
+                INPUT_ASOS_SC1_MP: self.asos_sc1_mp,
+                INPUT_ARIM_SC1: self.arim_sc1,
+                INPUT_ARIM_SC1_MP: self.arim_sc1_mp,
+                INPUT_ACCISA_TAX: self.accisa_tax,
+                INPUT_FIX_QUOTA_AGGR_MEASURE: self.fix_quota_aggr_measure,
+                INPUT_MONTHLY_FEE: self.monthly_fee,
+                INPUT_FIX_QUOTA_TRANSPORT: self.fix_quota_transport,
+                INPUT_FIX_QUOTA_TRANSPORT_MP: self.fix_quota_transport_mp,
+                INPUT_QUOTA_POWER: self.quota_power,
+                INPUT_QUOTA_POWER_MP: self.quota_power_mp,
+                INPUT_POWER_IN_USE: self.power_in_use,
+                INPUT_DISCOUNT: self.discount,
+                INPUT_IVA: self.iva,
+                INPUT_TV_TAX: self.tv_tax,
+            }
+        )
+
+        # Notifica ai sensori le voci cambiate
+        if nodi:
+            async_dispatcher_send(self.hass, self.bill_signal, nodi)
+
+    def _apply_portale_tariffs(self, tariffs):
+        """Imposta i parametri PortaleOfferte (mese precedente e quello prima)."""
+        mp = tariffs.get("mp", {})
+        mpp = tariffs.get("mpp", {})
+
+        # mp -> set runtime attributes
+        if mp:
+            val = mp.get(CONF_ACCISA_TAX)
+            if val is not None:
+                self.accisa_tax = float(val)
+            val = mp.get(CONF_IVA)
+            if val is not None:
+                self.iva = float(val)
+            val = mp.get(CONF_NW_LOSS_PERCENTAGE)
+            if val is not None:
+                self.nw_loss_percentage = float(val)
+
+            val = mp.get(CONF_ASOS_SC1)
+            if val is not None:
+                self.port_asos_sc1 = float(val)
+            val = mp.get(CONF_ARIM_SC1)
+            if val is not None:
+                self.port_arim_sc1 = float(val)
+
+        # mpp -> previous month
+        if mpp:
+            val = mpp.get(CONF_ACCISA_TAX)
+            if val is not None:
+                self.accisa_tax_mp = float(val)
+            val = mpp.get(CONF_IVA)
+            if val is not None:
+                self.iva_mp = float(val)
+            val = mpp.get(CONF_NW_LOSS_PERCENTAGE)
+            if val is not None:
+                self.nw_loss_percentage_mp = float(val)                    
+
+            val = mpp.get(CONF_ASOS_SC1)
+            if val is not None:
+                self.port_asos_sc1_mp = float(val)
+            val = mpp.get(CONF_ARIM_SC1)
+            if val is not None:
+                self.port_arim_sc1_mp = float(val)
+
+    @callback
+    def recompute_portale_offerte(self) -> None:
+        """Ricalcola i parametri PortaleOfferte dai file già scaricati (es. cambio potenza)."""
+        tariffs = self.portale_client.get_cached_tariffs(self.house_type, float(self.power_in_use))
+        if not any(tariffs.values()):
+            # Nessun file in memoria, serve un aggiornamento completo
+            self.hass.async_create_task(self.update_portale_offerte())
+            return
+
+        _LOGGER.debug("PortaleOfferte tariffe ricalcolate: %s", tariffs)
+        self._apply_portale_tariffs(tariffs)
+        self.async_set_updated_data({COORD_EVENT: EVENT_UPDATE_PORTALE})
+
     async def update_portale_offerte(self, now=None):
         """Update parameters from ilportaleofferte (monthly/daily depending)."""
         _LOGGER.info("Aggiornamento dei parametri da ilportaleofferte")
         try:
             tariffs = await self.portale_client.get_tariff_with_fallback(self.house_type, float(self.power_in_use))
+            async_dispatcher_send(self.hass, self.stats_signal, REFRESH_PORTALE)
             if not tariffs:
                 _LOGGER.warning("Parametri PortaleOfferte non disponibili, niente da aggiornare")
                 raise RuntimeError("No data from PortaleOfferte")
 
             _LOGGER.debug("PortaleOfferte tariffe: %s", tariffs)
 
-            mp = tariffs.get("mp", {})
-            mpp = tariffs.get("mpp", {})
-
-            # mp -> set runtime attributes
-            if mp:
-                val = mp.get(CONF_ACCISA_TAX)
-                if val is not None:
-                    self.accisa_tax = float(val)
-                val = mp.get(CONF_IVA)
-                if val is not None:
-                    self.iva = float(val)
-                val = mp.get(CONF_NW_LOSS_PERCENTAGE)
-                if val is not None:
-                    self.nw_loss_percentage = float(val)
-
-                val = mp.get(CONF_ASOS_SC1)
-                if val is not None:
-                    self.port_asos_sc1 = float(val)
-                val = mp.get(CONF_ARIM_SC1)
-                if val is not None:
-                    self.port_arim_sc1 = float(val)
-
-            # mpp -> previous month
-            if mpp:
-                val = mpp.get(CONF_ACCISA_TAX)
-                if val is not None:
-                    self.accisa_tax_mp = float(val)
-                val = mpp.get(CONF_IVA)
-                if val is not None:
-                    self.iva_mp = float(val)
-                val = mpp.get(CONF_NW_LOSS_PERCENTAGE)
-                if val is not None:
-                    self.nw_loss_percentage_mp = float(val)                    
-
-                val = mpp.get(CONF_ASOS_SC1)
-                if val is not None:
-                    self.port_asos_sc1_mp = float(val)
-                val = mpp.get(CONF_ARIM_SC1)
-                if val is not None:
-                    self.port_arim_sc1_mp = float(val)
-
+            self._apply_portale_tariffs(tariffs)
 
             # Notify update listeners
-            self.async_set_updated_data({COORD_EVENT: EVENT_UPDATE_ARERA})
+            self.async_set_updated_data({COORD_EVENT: EVENT_UPDATE_PORTALE})
             _LOGGER.info("Parametri PortaleOfferte aggiornati con successo...")
             # reset retry schedule
             self.web_retries_portale = WEB_RETRIES_MINUTES
@@ -384,7 +675,8 @@ class PUNDataUpdateCoordinator(DataUpdateCoordinator):
         """Update ARERA tariff parameters (monthly)."""
         _LOGGER.info("Aggiornamento dei parametri ARERA")
         tariffs = await self.arera_client.get_tariff_with_fallback(self.house_type)
-        
+        async_dispatcher_send(self.hass, self.stats_signal, REFRESH_ARERA)
+
         if tariffs:
             _LOGGER.debug("Tariffe '%s'", tariffs)
 
@@ -513,34 +805,19 @@ class PUNDataUpdateCoordinator(DataUpdateCoordinator):
 
 
         
-    async def _async_update_data(self, mp):
-        """Aggiornamento dati a intervalli prestabiliti."""
-
-        # Calcola l'intervallo di date per il mese corrente
-        if mp=="N":
-            # Calcola l'intervallo di date per il mese corrente
-            date_end = dt_util.now().date() + timedelta(
-                days=1
-            )  # Necessario per prezzo zonale (domani)
-            date_start = date(date_end.year, date_end.month, 1)
-        else:
-            date_end = dt_util.now().date().replace(day=1) - timedelta(days=1)
-            date_start = date(date_end.year, date_end.month, 1)
-
-        # All'inizio del mese, aggiunge i valori del mese precedente
-        if (date_end.day < 5) and mp=="N":
-            date_start = date_start - timedelta(days=3)
+    async def _async_download_gme(self, date_start: date, date_end: date) -> zipfile.ZipFile:
+        """Scarica dal GME l'archivio ZIP con i file XML dell'intervallo indicato."""
 
         start_date_param = date_start.strftime("%Y%m%d")
         end_date_param = date_end.strftime("%Y%m%d")
 
         # URL del sito Mercato elettrico
-        download_url = f"https://gme.mercatoelettrico.org/DesktopModules/GmeDownload/API/ExcelDownload/downloadzipfile?DataInizio={start_date_param}&DataFine={end_date_param}&Date={end_date_param}&Mercato=MGP&Settore=Prezzi&FiltroDate=InizioFine"
+        download_url = f"{GME_BASE_URL}/DesktopModules/GmeDownload/API/ExcelDownload/downloadzipfile?DataInizio={start_date_param}&DataFine={end_date_param}&Date={end_date_param}&Mercato=MGP&Settore=Prezzi&FiltroDate=InizioFine"
 
         # Imposta gli header della richiesta
         heads = {
             "moduleid": "12103",
-            "referer": "https://gme.mercatoelettrico.org/en-us/Home/Results/Electricity/MGP/Download?valore=Prezzi",
+            "referer": f"{GME_BASE_URL}/en-us/Home/Results/Electricity/MGP/Download?valore=Prezzi",
             "sec-ch-ua-mobile": "?0",
             "sec-ch-ua-platform": "Windows",
             "sec-fetch-dest": "empty",
@@ -552,10 +829,13 @@ class PUNDataUpdateCoordinator(DataUpdateCoordinator):
         }
 
         # Effettua il download dello ZIP con i file XML
-        _LOGGER.debug("Inizio download file ZIP con XML.")
+        _LOGGER.debug("Inizio download file ZIP con XML (%s - %s).", start_date_param, end_date_param)
         async with self.session.get(download_url, headers=heads) as response:
             # Aspetta la request
             bytes_response = await response.read()
+            self.refresh_stats[REFRESH_GME].aggiungi(
+                STAGE_DOWNLOAD, byte=len(bytes_response), record=1
+            )
 
             # Se la richiesta NON e' andata a buon fine ritorna l'errore subito
             if response.status != 200:
@@ -584,102 +864,158 @@ class PUNDataUpdateCoordinator(DataUpdateCoordinator):
             len(archive.namelist()),
             ", ".join(str(fn) for fn in archive.namelist()),
         )
+        return archive
 
-        if mp == "N":
-            # Estrae i dati dall'archivio
-            self.pun_data = extract_xml(
-                archive, self.pun_data, dt_util.now(time_zone=tz_pun).date()
-            )
+    async def _async_update_data(self):
+        """Aggiornamento dati a intervalli prestabiliti (con le statistiche delle fasi)."""
+        try:
+            with self.refresh_stats[REFRESH_GME].misura():
+                await self._async_update_pun_data()
+        finally:
+            async_dispatcher_send(self.hass, self.stats_signal, REFRESH_GME)
+
+    async def _async_update_pun_data(self):
+        """Scarica i prezzi mancanti dal GME e calcola i valori del PUN."""
+        stats = self.refresh_stats[REFRESH_GME]
+
+        # Calcola l'intervallo di date per il mese corrente
+        date_end = dt_util.now().date() + timedelta(
+            days=1
+        )  # Necessario per prezzo zonale (domani)
+        date_start = date(date_end.year, date_end.month, 1)
+
+        # All'inizio del mese, aggiunge i valori del mese precedente
+        if date_end.day < 5:
+            date_start = date_start - timedelta(days=3)
+
+        # Calcola l'intervallo di date per il mese precedente
+        date_end_mp = dt_util.now().date().replace(day=1) - timedelta(days=1)
+        date_start_mp = date(date_end_mp.year, date_end_mp.month, 1)
+
+        # Scarica in una sola richiesta solo i giorni non ancora disponibili
+        # (i prezzi di un giorno già pubblicato non cambiano più)
+        oggi = dt_util.now(time_zone=tz_pun).date()
+        intervallo = get_gme_download_range(
+            self.gme_store.giorni.keys(), date_start_mp, date_end, oggi
+        )
+        giorni_scaricati: dict[date, GmeDay] = {}
+        if intervallo is not None:
+            with stats.fase(STAGE_DOWNLOAD):
+                archive = await self._async_download_gme(*intervallo)
+            giorni_scaricati = parse_gme_archive(archive, stats)
             archive.close()
+        else:
+            _LOGGER.debug("Tutti i prezzi sono già disponibili, nessun download.")
+        modificato = self.gme_store.update(giorni_scaricati, oggi)
+
+        # Rimuove i giorni non più necessari e salva l'archivio (solo se cambiato)
+        if self.gme_store.prune(date_start_mp, date_end) or modificato:
+            with stats.fase(STAGE_STORE) as fase:
+                await self.gme_store.async_save()
+                fase.record = len(self.gme_store.giorni)
+
+        # Estrae in un solo passaggio i dati del mese corrente e del mese precedente
+        inizio_aggregazione = time.monotonic()
+        giorni = self.gme_store.get_giorni(date_start_mp, date_end)
+        extract_pun_data(
+            giorni,
+            oggi,
+            [
+                (self.pun_data, date_start, date_end),
+                (self.pun_data_mp, date_start_mp, date_end_mp),
+            ],
+        )
 
-            # Per ogni fascia, calcola il valore del pun
-            for fascia, value_list in self.pun_data.pun.items():
-                # Se abbiamo valori nella fascia
-                if len(value_list) > 0:
-                    # Calcola la media dei pun e aggiorna il valore del pun attuale
-                    # per la fascia corrispondente
-                    self.pun_values.value[fascia] = mean(self.pun_data.pun[fascia])
-                else:
-                    # Skippiamo i dict se vuoti
-                    pass
-
-            # Calcola la fascia F23 (a partire da F2 ed F3)
-            # NOTA: la motivazione del calcolo è oscura ma sembra corretta; vedere:
-            # https://github.com/virtualdj/pun_sensor/issues/24#issuecomment-1829846806
-            if (
-                len(self.pun_data.pun[Fascia.F2]) and len(self.pun_data.pun[Fascia.F3])
-            ) > 0:
-                self.pun_values.value[Fascia.F23] = (
-                    0.46 * self.pun_values.value[Fascia.F2]
-                    + 0.54 * self.pun_values.value[Fascia.F3]
-                )
+        # Per ogni fascia, calcola il valore del pun
+        for fascia, aggregato in self.pun_data.pun.items():
+            # Se abbiamo valori nella fascia
+            if len(aggregato) > 0:
+                # Aggiorna il valore del pun attuale con la media
+                # della fascia corrispondente
+                self.pun_values.value[fascia] = aggregato.mean
             else:
-                self.pun_values.value[Fascia.F23] = 0
-
-            # Logga i dati
-            _LOGGER.debug(
-                "Numero di dati: %s",
-                ", ".join(
-                    str(f"{len(dati)} ({fascia.value})")
-                    for fascia, dati in self.pun_data.pun.items()
-                    if fascia != Fascia.F23
-                ),
-            )
-            _LOGGER.debug(
-                "Valori PUN: %s",
-                ", ".join(
-                    f"{prezzo} ({fascia.value})"
-                    for fascia, prezzo in self.pun_values.value.items()
-                ),
-            )
+                # Skippiamo i dict se vuoti
+                pass
 
-            # Notifica che i dati PUN (prezzi) sono stati aggiornati
-            self.async_set_updated_data({COORD_EVENT: EVENT_UPDATE_PUN})
+        # Calcola la fascia F23 (a partire da F2 ed F3)
+        # NOTA: la motivazione del calcolo è oscura ma sembra corretta; vedere:
+        # https://github.com/virtualdj/pun_sensor/issues/24#issuecomment-1829846806
+        if (
+            len(self.pun_data.pun[Fascia.F2]) and len(self.pun_data.pun[Fascia.F3])
+        ) > 0:
+            self.pun_values.value[Fascia.F23] = (
+                0.46 * self.pun_values.value[Fascia.F2]
+                + 0.54 * self.pun_values.value[Fascia.F3]
+            )
         else:
-            # Estrae i dati dall'archivio
-            self.pun_data_mp = extract_xml2(archive, self.pun_data_mp, dt_util.now(time_zone=tz_pun).date())
-
-            # Per ogni fascia, calcola il valore del pun
-            for fascia, value_list in self.pun_data_mp.pun.items():
-                # Se abbiamo valori nella fascia
-                if len(value_list) > 0:
-                    # Calcola la media dei pun e aggiorna il valore del pun attuale
-                    # per la fascia corrispondente
-                    self.pun_values_mp.value[fascia] = mean(self.pun_data_mp.pun[fascia])
-                else:
-                    # Skippiamo i dict se vuoti
-                    pass
-
-            # Calcola la fascia F23 (a partire da F2 ed F3)
-            # NOTA: la motivazione del calcolo è oscura ma sembra corretta; vedere:
-            # https://github.com/virtualdj/pun_sensor/issues/24#issuecomment-1829846806
-            if (
-                len(self.pun_data_mp.pun[Fascia.F2_MP]) and len(self.pun_data_mp.pun[Fascia.F3_MP])
-            ) > 0:
-                self.pun_values_mp.value[Fascia.F23_MP] = (
-                    0.46 * self.pun_values_mp.value[Fascia.F2_MP]
-                    + 0.54 * self.pun_values_mp.value[Fascia.F3_MP]
-                )
+            self.pun_values.value[Fascia.F23] = 0
+
+        # Logga i dati
+        _LOGGER.debug(
+            "Numero di dati: %s",
+            ", ".join(
+                str(f"{len(dati)} ({fascia.value})")
+                for fascia, dati in self.pun_data.pun.items()
+                if fascia != Fascia.F23
+            ),
+        )
+        _LOGGER.debug(
+            "Valori PUN: %s",
+            ", ".join(
+                f"{prezzo} ({fascia.value})"
+                for fascia, prezzo in self.pun_values.value.items()
+            ),
+        )
+
+        # Per ogni fascia, calcola il valore del pun
+        for fascia, aggregato in self.pun_data_mp.pun.items():
+            # Se abbiamo valori nella fascia
+            if len(aggregato) > 0:
+                # Aggiorna il valore del pun attuale con la media
+                # della fascia corrispondente
+                self.pun_values_mp.value[fascia] = aggregato.mean
             else:
-                self.pun_values_mp.value[Fascia.F23_MP] = 0
-
-            # Logga i dati
-            _LOGGER.debug(
-                "Numero di dati: %s",
-                ", ".join(
-                    str(f"{len(dati)} ({fascia.value})")
-                    for fascia, dati in self.pun_data_mp.pun.items()
-                    if fascia != Fascia.F23_MP
-                ),
-            )
-            _LOGGER.debug(
-                "Valori PUN: %s",
-                ", ".join(
-                    f"{prezzo} ({fascia.value})"
-                    for fascia, prezzo in self.pun_values_mp.value.items()
-                ),
+                # Skippiamo i dict se vuoti
+                pass
+
+        # Calcola la fascia F23 (a partire da F2 ed F3)
+        # NOTA: la motivazione del calcolo è oscura ma sembra corretta; vedere:
+        # https://github.com/virtualdj/pun_sensor/issues/24#issuecomment-1829846806
+        if (
+            len(self.pun_data_mp.pun[Fascia.F2_MP]) and len(self.pun_data_mp.pun[Fascia.F3_MP])
+        ) > 0:
+            self.pun_values_mp.value[Fascia.F23_MP] = (
+                0.46 * self.pun_values_mp.value[Fascia.F2_MP]
+                + 0.54 * self.pun_values_mp.value[Fascia.F3_MP]
             )
-            # Notifica che i dati PUN (prezzi) sono stati aggiornati
+        else:
+            self.pun_values_mp.value[Fascia.F23_MP] = 0
+
+        # Logga i dati
+        _LOGGER.debug(
+            "Numero di dati: %s",
+            ", ".join(
+                str(f"{len(dati)} ({fascia.value})")
+                for fascia, dati in self.pun_data_mp.pun.items()
+                if fascia != Fascia.F23_MP
+            ),
+        )
+        _LOGGER.debug(
+            "Valori PUN: %s",
+            ", ".join(
+                f"{prezzo} ({fascia.value})"
+                for fascia, prezzo in self.pun_values_mp.value.items()
+            ),
+        )
+
+        stats.aggiungi(
+            STAGE_AGGREGATE,
+            time.monotonic() - inizio_aggregazione,
+            record=len(giorni),
+        )
+
+        # Notifica che i dati PUN (prezzi) sono stati aggiornati
+        with stats.fase(STAGE_PUBLISH):
             self.async_set_updated_data({COORD_EVENT: EVENT_UPDATE_PUN})
 
     async def update_fascia(self, now=None):
@@ -724,8 +1060,7 @@ class PUNDataUpdateCoordinator(DataUpdateCoordinator):
         # Aggiorna i dati da web
         try:
             # Esegue l'aggiornamento
-            await self._async_update_data("N")
-            await self._async_update_data("Y")
+            await self._async_update_data()
 
             # Se non ci sono eccezioni, ha avuto successo
             # Ricarica i tentativi per la prossima esecuzione
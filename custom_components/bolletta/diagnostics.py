@@ -0,0 +1,34 @@
+"""Diagnostica dell'integrazione (statistiche degli aggiornamenti)."""
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import PUNDataUpdateCoordinator
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config: ConfigEntry
+) -> dict[str, Any]:
+    """Restituisce la diagnostica di una configurazione.
+
+    Per ogni sorgente (GME, ARERA, PortaleOfferte) riporta durata, byte
+    scaricati ed eventuale errore dell'ultimo aggiornamento, con il
+    dettaglio di ogni fase (tempi, byte e record).
+    """
+    coordinator: PUNDataUpdateCoordinator = hass.data[DOMAIN][config.entry_id]
+    giorni = sorted(coordinator.gme_store.giorni)
+    return {
+        "config": {"data": dict(config.data), "options": dict(config.options)},
+        "refresh": {
+            sorgente: stats.as_dict()
+            for sorgente, stats in coordinator.refresh_stats.items()
+        },
+        "gme_store": {
+            "days": len(giorni),
+            "first_day": giorni[0].isoformat() if giorni else None,
+            "last_day": giorni[-1].isoformat() if giorni else None,
+        },
+    }
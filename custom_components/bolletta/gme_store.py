@@ -0,0 +1,116 @@
+"""Archivio persistente dei prezzi giornalieri del GME."""
+
+from datetime import date, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .interfaces import GmeDay
+
+# Ottiene il logger
+_LOGGER = logging.getLogger(__name__)
+
+# Versione del formato di salvataggio
+STORAGE_VERSION = 1
+
+# Giorni passati di cui conservare i prezzi zonali e ogni 15 minuti (per i
+# giorni precedenti le medie per fascia richiedono solo il PUN orario)
+GIORNI_DETTAGLIO = 7
+
+
+def _get_storage_key(entry_id: str) -> str:
+    """Restituisce la chiave di salvataggio per la configurazione indicata."""
+    return f"{DOMAIN}.{entry_id}.gme"
+
+
+class GmeStore:
+    """Prezzi del GME già scaricati, memorizzati per giorno."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Inizializza l'archivio (vuoto finché non viene caricato)."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, _get_storage_key(entry_id)
+        )
+        self.giorni: dict[date, GmeDay] = {}
+
+    async def async_load(self) -> None:
+        """Carica i giorni salvati su disco."""
+        if (dati := await self._store.async_load()) is None:
+            return
+
+        for data_string, valori in dati.get("giorni", {}).items():
+            try:
+                data = date.fromisoformat(data_string)
+            except ValueError:
+                _LOGGER.debug("Ignorato giorno non valido nell'archivio GME: %s", data_string)
+                continue
+            self.giorni[data] = GmeDay.from_dict(data, valori)
+
+        _LOGGER.debug("Caricati %s giorni dall'archivio GME.", len(self.giorni))
+
+    def update(self, giorni: dict[date, GmeDay], oggi: date) -> bool:
+        """Aggiunge i giorni scaricati ed elimina il dettaglio dei giorni meno recenti.
+
+        I prezzi zonali e ogni 15 minuti sono mantenuti solo da GIORNI_DETTAGLIO
+        giorni prima di oggi in avanti; i giorni già memorizzati con gli stessi
+        prezzi non vengono sostituiti (mantenendo le statistiche calcolate).
+
+        Returns:
+        bool: True se i dati da salvare sono cambiati.
+
+        """
+        limite: date = oggi - timedelta(days=GIORNI_DETTAGLIO)
+        modificato = False
+
+        for data, giorno in giorni.items():
+            if data < limite:
+                giorno.drop_details()
+            precedente = self.giorni.get(data)
+            if precedente is None or precedente.as_dict() != giorno.as_dict():
+                self.giorni[data] = giorno
+                modificato = True
+
+        for data, giorno in self.giorni.items():
+            if data < limite and giorno.drop_details():
+                modificato = True
+
+        return modificato
+
+    async def async_save(self) -> None:
+        """Salva su disco i giorni memorizzati."""
+        await self._store.async_save(
+            {
+                "giorni": {
+                    data.isoformat(): giorno.as_dict()
+                    for data, giorno in sorted(self.giorni.items())
+                }
+            }
+        )
+
+    def get_giorni(self, date_start: date, date_end: date) -> list[GmeDay]:
+        """Restituisce i giorni memorizzati compresi nell'intervallo indicato."""
+        return [
+            giorno
+            for data, giorno in sorted(self.giorni.items())
+            if date_start <= data <= date_end
+        ]
+
+    def prune(self, date_start: date, date_end: date) -> bool:
+        """Rimuove i giorni esterni all'intervallo indicato.
+
+        Returns:
+        bool: True se è stato rimosso almeno un giorno.
+
+        """
+        da_rimuovere = [g for g in self.giorni if not date_start <= g <= date_end]
+        for giorno in da_rimuovere:
+            del self.giorni[giorno]
+        return len(da_rimuovere) > 0
+
+
+async def async_remove_gme_store(hass: HomeAssistant, entry_id: str) -> None:
+    """Elimina l'archivio salvato per la configurazione indicata."""
+    await Store(hass, STORAGE_VERSION, _get_storage_key(entry_id)).async_remove()
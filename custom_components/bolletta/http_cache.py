@@ -0,0 +1,135 @@
+"""Cache persistente dei file scaricati via HTTP (richieste condizionali)."""
+
+import hashlib
+import logging
+import os
+import shutil
+from typing import Any
+
+from aiohttp import ClientSession
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+
+from .const import DOMAIN
+
+# Ottiene il logger
+_LOGGER = logging.getLogger(__name__)
+
+# Versione del formato di salvataggio
+STORAGE_VERSION = 1
+
+
+def _get_storage_key(entry_id: str, nome: str) -> str:
+    """Restituisce la chiave di salvataggio della cache indicata."""
+    return f"{DOMAIN}.{entry_id}.{nome}"
+
+
+class HttpCache:
+    """File scaricati via HTTP, memorizzati su disco insieme ai validatori.
+
+    Ad ogni richiesta vengono inviati gli header If-None-Match e
+    If-Modified-Since: se il server risponde 304 il contenuto viene letto
+    dalla copia locale, senza scaricarlo di nuovo.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, nome: str) -> None:
+        """Inizializza la cache (caricata alla prima richiesta)."""
+        self.hass = hass
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, _get_storage_key(entry_id, nome)
+        )
+        self._cartella: str = hass.config.path(
+            STORAGE_DIR, f"{_get_storage_key(entry_id, nome)}_files"
+        )
+        self._voci: dict[str, dict[str, Any]] | None = None
+
+    async def _async_get_voci(self) -> dict[str, dict[str, Any]]:
+        """Restituisce le voci della cache, caricandole se necessario."""
+        if self._voci is None:
+            dati = await self._store.async_load()
+            self._voci = dict(dati.get("voci", {})) if dati is not None else {}
+        return self._voci
+
+    def _get_percorso(self, url: str) -> str:
+        """Restituisce il percorso del file locale per l'URL indicato."""
+        return os.path.join(
+            self._cartella, hashlib.sha1(url.encode()).hexdigest() + ".bin"
+        )
+
+    def _leggi_file(self, percorso: str) -> bytes | None:
+        """Legge il file locale (None se non esiste)."""
+        try:
+            with open(percorso, "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _scrivi_file(self, percorso: str, contenuto: bytes) -> None:
+        """Scrive il file locale in modo atomico."""
+        os.makedirs(self._cartella, exist_ok=True)
+        temporaneo = f"{percorso}.tmp"
+        with open(temporaneo, "wb") as file:
+            file.write(contenuto)
+        os.replace(temporaneo, percorso)
+
+    async def async_get(
+        self, session: ClientSession, url: str
+    ) -> tuple[bytes, bool]:
+        """Scarica il file indicato, usando la copia locale se non è cambiato.
+
+        Returns:
+        tuple[bytes, bool]: contenuto del file e True se è cambiato
+            rispetto alla copia locale (o se non c'era una copia locale).
+
+        """
+        voci = await self._async_get_voci()
+        percorso = self._get_percorso(url)
+
+        # Legge la copia locale (se i validatori sono presenti)
+        locale: bytes | None = None
+        headers: dict[str, str] = {}
+        if (voce := voci.get(url)) is not None:
+            locale = await self.hass.async_add_executor_job(self._leggi_file, percorso)
+            if locale is not None:
+                if etag := voce.get("etag"):
+                    headers["If-None-Match"] = etag
+                if last_modified := voce.get("last_modified"):
+                    headers["If-Modified-Since"] = last_modified
+
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and locale is not None:
+                _LOGGER.debug("File non modificato, uso la copia locale: %s", url)
+                return locale, False
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status} nello scarico di {url}")
+            contenuto = await response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        # Salva la copia locale solo se il server fornisce dei validatori
+        if etag or last_modified:
+            try:
+                await self.hass.async_add_executor_job(
+                    self._scrivi_file, percorso, contenuto
+                )
+            except OSError as e:
+                _LOGGER.warning("Impossibile salvare la copia locale di %s: %s", url, e)
+            else:
+                voci[url] = {"etag": etag, "last_modified": last_modified}
+                await self._store.async_save({"voci": voci})
+        elif voci.pop(url, None) is not None:
+            await self._store.async_save({"voci": voci})
+
+        return contenuto, True
+
+
+async def async_remove_http_cache(
+    hass: HomeAssistant, entry_id: str, nome: str
+) -> None:
+    """Elimina la cache salvata per la configurazione indicata."""
+    await Store(hass, STORAGE_VERSION, _get_storage_key(entry_id, nome)).async_remove()
+    await hass.async_add_executor_job(
+        shutil.rmtree,
+        hass.config.path(STORAGE_DIR, f"{_get_storage_key(entry_id, nome)}_files"),
+        True,
+    )
@@ -1,50 +1,355 @@
 """Interfacce di gestione di pun_sensor."""
 
+from array import array
+import base64
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, timedelta, timezone, tzinfo
 from enum import Enum
+from math import isnan, nan
+import sys
+from typing import Any, NamedTuple
+
+# Passi delle serie di prezzi
+PASSO_ORARIO = timedelta(hours=1)
+PASSO_15MIN = timedelta(minutes=15)
+
+
+class PunAggregate:
+    """Statistiche incrementali (conteggio, somma, minimo, massimo) di una fascia.
+
+    La somma è compensata (Kahan-Neumaier) per limitare gli errori di
+    arrotondamento; la media si ottiene quindi in O(1).
+    """
+
+    __slots__ = ("count", "somma", "compensazione", "minimo", "massimo")
+
+    def __init__(self) -> None:
+        """Inizializza un aggregato vuoto."""
+        self.clear()
+
+    def clear(self) -> None:
+        """Azzera l'aggregato."""
+        self.count: int = 0
+        self.somma: float = 0.0
+        self.compensazione: float = 0.0
+        self.minimo: float | None = None
+        self.massimo: float | None = None
+
+    def _somma(self, valore: float) -> None:
+        """Aggiunge un valore alla somma compensata."""
+        totale = self.somma + valore
+        if abs(self.somma) >= abs(valore):
+            self.compensazione += (self.somma - totale) + valore
+        else:
+            self.compensazione += (valore - totale) + self.somma
+        self.somma = totale
+
+    def add(self, valore: float) -> None:
+        """Aggiunge un singolo prezzo."""
+        self.count += 1
+        self._somma(valore)
+        if self.minimo is None or valore < self.minimo:
+            self.minimo = valore
+        if self.massimo is None or valore > self.massimo:
+            self.massimo = valore
+
+    def merge(self, altro: "PunAggregate") -> None:
+        """Unisce le statistiche di un altro aggregato (es. di un altro giorno)."""
+        if altro.count == 0:
+            return
+        self.count += altro.count
+        self._somma(altro.somma)
+        self._somma(altro.compensazione)
+        if self.minimo is None or (altro.minimo is not None and altro.minimo < self.minimo):
+            self.minimo = altro.minimo
+        if self.massimo is None or (altro.massimo is not None and altro.massimo > self.massimo):
+            self.massimo = altro.massimo
+
+    @property
+    def mean(self) -> float:
+        """Restituisce la media dei prezzi (0 se vuoto)."""
+        if self.count == 0:
+            return 0.0
+        return (self.somma + self.compensazione) / self.count
+
+    def __len__(self) -> int:
+        """Restituisce il numero di prezzi aggregati."""
+        return self.count
+
+
+class PriceSeries:
+    """Serie di prezzi a passo fisso (orario o 15 minuti) indicizzata per data/ora.
+
+    I prezzi sono memorizzati in un array contiguo di float a partire da un
+    istante iniziale (in UTC, per gestire i cambi d'ora); i valori mancanti
+    sono NaN. La ricerca per data/ora è quindi un semplice calcolo d'indice.
+    """
+
+    __slots__ = ("passo", "inizio", "fuso", "valori")
+
+    def __init__(self, passo: timedelta) -> None:
+        """Inizializza una serie vuota con il passo indicato."""
+        self.passo: timedelta = passo
+        self.inizio: datetime | None = None
+        self.fuso: tzinfo | None = None
+        self.valori: array = array("d")
+
+    def clear(self) -> None:
+        """Svuota la serie."""
+        self.inizio = None
+        self.fuso = None
+        self.valori = array("d")
+
+    def __len__(self) -> int:
+        """Restituisce il numero di periodi memorizzati (anche senza prezzo)."""
+        return len(self.valori)
+
+    def _indice(self, dataora: datetime) -> int | None:
+        """Restituisce l'indice del periodo che inizia all'orario indicato."""
+        if self.inizio is None:
+            return None
+        indice, resto = divmod(dataora - self.inizio, self.passo)
+        if resto or not 0 <= indice < len(self.valori):
+            return None
+        return indice
+
+    def get(self, dataora: datetime) -> float | None:
+        """Restituisce il prezzo del periodo che inizia all'orario indicato."""
+        if (indice := self._indice(dataora)) is None:
+            return None
+        valore: float = self.valori[indice]
+        return None if isnan(valore) else valore
+
+    def update(self, inizio: datetime, prezzi: Iterable[float | None]) -> None:
+        """Scrive i prezzi di periodi consecutivi a partire dall'orario indicato."""
+        nuovi = array("d", (nan if prezzo is None else prezzo for prezzo in prezzi))
+        inizio_utc: datetime = inizio.astimezone(timezone.utc)
+        if self.inizio is None:
+            self.inizio = inizio_utc
+            self.fuso = inizio.tzinfo
+
+        offset, resto = divmod(inizio_utc - self.inizio, self.passo)
+        if resto:
+            raise ValueError("L'orario non è allineato al passo della serie")
+
+        # Estende la serie (con valori mancanti) se necessario
+        if offset < 0:
+            self.valori[0:0] = array("d", [nan]) * -offset
+            self.inizio = inizio_utc
+            offset = 0
+        elif offset > len(self.valori):
+            self.valori.extend(array("d", [nan]) * (offset - len(self.valori)))
+
+        self.valori[offset : offset + len(nuovi)] = nuovi
+
+    def items(self) -> Iterator[tuple[datetime, float | None]]:
+        """Restituisce le coppie (orario locale, prezzo) della serie."""
+        if self.inizio is None:
+            return
+        for indice, valore in enumerate(self.valori):
+            yield (
+                (self.inizio + indice * self.passo).astimezone(self.fuso),
+                None if isnan(valore) else valore,
+            )
+
+    def slice(self, inizio: datetime, fine: datetime | None = None) -> "PriceSeries":
+        """Restituisce la parte della serie compresa tra inizio (incluso) e fine (escluso)."""
+        serie = PriceSeries(self.passo)
+        if self.inizio is None:
+            return serie
+
+        primo: int = max(0, -(-(inizio - self.inizio) // self.passo))
+        ultimo: int = len(self.valori)
+        if fine is not None:
+            ultimo = max(primo, min(ultimo, -(-(fine - self.inizio) // self.passo)))
+        if primo < ultimo:
+            serie.inizio = self.inizio + primo * self.passo
+            serie.fuso = self.fuso
+            serie.valori = self.valori[primo:ultimo]
+        return serie
+
+    def copy(self) -> "PriceSeries":
+        """Restituisce una copia della serie."""
+        serie = PriceSeries(self.passo)
+        serie.inizio = self.inizio
+        serie.fuso = self.fuso
+        serie.valori = array("d", self.valori)
+        return serie
+
+    def as_dict(self) -> dict[str, float | None]:
+        """Restituisce i prezzi in un dizionario indicizzato per orario (stringa)."""
+        return {str(dataora): valore for dataora, valore in self.items()}
+
+    @classmethod
+    def from_dict(
+        cls, passo: timedelta, prezzi: dict[str, float | None], fuso: tzinfo
+    ) -> "PriceSeries":
+        """Ricostruisce una serie da un dizionario indicizzato per orario (stringa).
+
+        Il fuso orario indicato viene usato per restituire gli orari locali.
+        """
+        serie = cls(passo)
+        for dataora_string, valore in prezzi.items():
+            try:
+                dataora = datetime.fromisoformat(dataora_string)
+                serie.update(dataora, (valore,))
+            except (TypeError, ValueError):
+                continue
+        if serie.inizio is not None:
+            serie.fuso = fuso
+        return serie
+
+    def as_packed(self) -> dict[str, Any]:
+        """Restituisce la serie in formato compatto.
+
+        Il formato contiene l'istante iniziale (UTC), il passo in secondi e i
+        prezzi come array di double little-endian codificato in base64.
+        """
+        if self.inizio is None:
+            return {"inizio": None, "passo": int(self.passo.total_seconds()), "valori": ""}
+        valori = array("d", self.valori)
+        if sys.byteorder == "big":
+            valori.byteswap()
+        return {
+            "inizio": self.inizio.isoformat(),
+            "passo": int(self.passo.total_seconds()),
+            "valori": base64.b64encode(valori.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_packed(
+        cls, passo: timedelta, dati: dict[str, Any], fuso: tzinfo
+    ) -> "PriceSeries":
+        """Ricostruisce una serie dal formato compatto (vuota se non valido).
+
+        Il fuso orario indicato viene usato per restituire gli orari locali.
+        """
+        serie = cls(passo)
+        try:
+            if dati.get("passo") != int(passo.total_seconds()) or not dati.get("inizio"):
+                return serie
+            valori = array("d")
+            valori.frombytes(base64.b64decode(dati["valori"]))
+            if sys.byteorder == "big":
+                valori.byteswap()
+            serie.inizio = datetime.fromisoformat(dati["inizio"]).astimezone(
+                timezone.utc
+            )
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return PriceSeries(passo)
+        serie.fuso = fuso
+        serie.valori = valori
+        return serie
 
 
 class PunData:
     """Classe che contiene i valori del PUN orario per ciascuna fascia."""
 
     def __init__(self) -> None:
-        """Inizializza le liste di ciascuna fascia e i prezzi zonali."""
-
-        self.pun: dict[Fascia, list[float]] = {
-            Fascia.MONO: [],
-            Fascia.F1: [],
-            Fascia.F2: [],
-            Fascia.F3: [],
-            Fascia.F23: [],
+        """Inizializza le statistiche di ciascuna fascia e i prezzi zonali."""
+
+        self.pun: dict[Fascia, PunAggregate] = {
+            Fascia.MONO: PunAggregate(),
+            Fascia.F1: PunAggregate(),
+            Fascia.F2: PunAggregate(),
+            Fascia.F3: PunAggregate(),
+            Fascia.F23: PunAggregate(),
         }
 
         self.zona: Zona | None = None
-        self.prezzi_zonali: dict[str, float | None] = {}
-        self.pun_orari: dict[str, float | None] = {}
+        self.prezzi_zonali: PriceSeries = PriceSeries(PASSO_ORARIO)
+        self.pun_orari: PriceSeries = PriceSeries(PASSO_ORARIO)
         # Prezzi zonali e PUN a 15 minuti
-        self.prezzi_zonali_15min: dict[str, float | None] = {}
-        self.pun_15min: dict[str, float | None] = {}
+        self.prezzi_zonali_15min: PriceSeries = PriceSeries(PASSO_15MIN)
+        self.pun_15min: PriceSeries = PriceSeries(PASSO_15MIN)
         
 class PunDataMP:
     """Classe che contiene i valori del PUN orario per ciascuna fascia."""
 
     def __init__(self) -> None:
-        """Inizializza le liste di ciascuna fascia."""
-
-        self.pun: dict[Fascia, list[float]] = {
-            Fascia.MONO_MP: [],
-            Fascia.F1_MP: [],
-            Fascia.F2_MP: [],
-            Fascia.F3_MP: [],
-            Fascia.F23_MP: [],
+        """Inizializza le statistiche di ciascuna fascia."""
+
+        self.pun: dict[Fascia, PunAggregate] = {
+            Fascia.MONO_MP: PunAggregate(),
+            Fascia.F1_MP: PunAggregate(),
+            Fascia.F2_MP: PunAggregate(),
+            Fascia.F3_MP: PunAggregate(),
+            Fascia.F23_MP: PunAggregate(),
         }
 
         self.zona: Zona | None = None
-        self.prezzi_zonali: dict[str, float | None] = {}
-        self.pun_orari: dict[str, float | None] = {}
+        self.prezzi_zonali: PriceSeries = PriceSeries(PASSO_ORARIO)
+        self.pun_orari: PriceSeries = PriceSeries(PASSO_ORARIO)
         # Prezzi zonali e PUN a 15 minuti
-        self.prezzi_zonali_15min: dict[str, float | None] = {}
-        self.pun_15min: dict[str, float | None] = {}
+        self.prezzi_zonali_15min: PriceSeries = PriceSeries(PASSO_15MIN)
+        self.pun_15min: PriceSeries = PriceSeries(PASSO_15MIN)
         
+class GmeRecord(NamedTuple):
+    """Prezzi di un singolo periodo letti da un file XML del GME."""
+
+    data: date
+    periodo: int
+    prezzi_15min: bool
+    pun: float | None
+    prezzi_zonali: dict[str, float | None]
+
+
+class GmeDay:
+    """Classe che contiene i prezzi di un giorno pubblicati dal GME."""
+
+    def __init__(self, data: date) -> None:
+        """Inizializza le liste dei prezzi orari e a 15 minuti.
+
+        L'indice delle liste corrisponde all'ora progressiva (o al periodo
+        di 15 minuti) meno uno; i valori mancanti sono None.
+        """
+
+        self.data: date = data
+        self.pun_orari: list[float | None] = []
+        self.prezzi_zonali: dict[str, list[float | None]] = {}
+        self.pun_15min: list[float | None] = []
+        self.prezzi_zonali_15min: dict[str, list[float | None]] = {}
+        # Statistiche del PUN per fascia (calcolate una sola volta, non salvate)
+        self.aggregati: dict[Fascia, PunAggregate] | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Restituisce i prezzi in un formato serializzabile."""
+        return {
+            "pun": self.pun_orari,
+            "zone": self.prezzi_zonali,
+            "pun_15": self.pun_15min,
+            "zone_15": self.prezzi_zonali_15min,
+        }
+
+    def drop_details(self) -> bool:
+        """Elimina i prezzi zonali e ogni 15 minuti, mantenendo il PUN orario.
+
+        Returns:
+        bool: True se è stato eliminato almeno un prezzo.
+
+        """
+        if not (self.prezzi_zonali or self.pun_15min or self.prezzi_zonali_15min):
+            return False
+        self.prezzi_zonali = {}
+        self.pun_15min = []
+        self.prezzi_zonali_15min = {}
+        return True
+
+    @classmethod
+    def from_dict(cls, data: date, valori: dict[str, Any]) -> "GmeDay":
+        """Ricostruisce i prezzi di un giorno dal formato serializzato."""
+        giorno = cls(data)
+        giorno.pun_orari = list(valori.get("pun", []))
+        giorno.prezzi_zonali = {
+            zona: list(prezzi) for zona, prezzi in valori.get("zone", {}).items()
+        }
+        giorno.pun_15min = list(valori.get("pun_15", []))
+        giorno.prezzi_zonali_15min = {
+            zona: list(prezzi) for zona, prezzi in valori.get("zone_15", {}).items()
+        }
+        return giorno
+
+
 class Fascia(Enum):
     """Enumerazione con i tipi di fascia oraria."""
 
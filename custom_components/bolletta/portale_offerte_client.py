@@ -6,13 +6,20 @@ https://www.ilportaleofferte.it/portaleOfferte/resources/opendata/csv/parametri/
 Behavior:
 - mp: latest available file up to today (tries today, then day-1, day-2, ... until found or limit)
 - mpp: last-day-of-previous-month (if not present, steps backwards until it finds a file)
-- caching per yyyymmdd
+- candidate dates are probed concurrently, a window at a time (bounded concurrency)
+- each CSV is parsed once into a record with every mapping variant, cached per
+  yyyymmdd; the house type / power variant is selected on read
+- dates that returned 404 are not probed again for MISSING_TTL_SECONDS
+- a persistent index of published / missing dates lets a lookup stop at the
+  last known published file, probing only the newer days
 - returns {"mp": {...}, "mpp": {...}} similar to AreraClient.get_current_tariffs
 """
 from __future__ import annotations
 
+import asyncio
 import io
 import logging
+import time
 from datetime import date, datetime, timedelta
 from typing import Dict, Optional, Any
 import csv
@@ -20,8 +27,11 @@ import csv
 from aiohttp import ClientSession
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 
+from .refresh_stats import STAGE_DOWNLOAD, STAGE_PARSE, RefreshStats
 from .const import (
+    DOMAIN,
     RESIDENTIAL,
     NOT_RESIDENTIAL,
     CONF_ACCISA_TAX,
@@ -38,16 +48,92 @@ _LOGGER = logging.getLogger(__name__)
 BASE_URL = "https://www.ilportaleofferte.it/portaleOfferte/resources/opendata/csv/parametri"
 FILENAME_TEMPLATE = "PO_Parametri_E_{yyyymmdd}.csv"
 
+# Number of candidate dates requested together, and max concurrent requests
+PROBE_WINDOW_DAYS = 7
+PROBE_MAX_CONCURRENCY = 4
+
+# How long a date that returned 404 is considered missing
+MISSING_TTL_SECONDS = 3600
+
+# A date still missing this many days later is considered never published
+MISSING_FINAL_DAYS = 2
+
+# Version of the persistent index of published / missing dates
+PORTALE_STORAGE_VERSION = 1
+PORTALE_INDEX_SAVE_DELAY = 10
+
+
+# Mapping variants (const key -> CSV parameter), selected by house type and power
+VARIANT_RESIDENTIAL_LOW = "residential_low"
+VARIANT_RESIDENTIAL_HIGH = "residential_high"
+VARIANT_NOT_RESIDENTIAL = "not_residential"
+MAPPING_VARIANTS: Dict[str, Dict[str, str]] = {
+    # residential mapping, power <= 3 kW
+    VARIANT_RESIDENTIAL_LOW: {
+        CONF_ASOS_SC1: "asos_dr",
+        CONF_ARIM_SC1: "arim_dr",
+        CONF_ACCISA_TAX: "acc_c_r_l",
+        CONF_IVA: "iva_c",
+        CONF_NW_LOSS_PERCENTAGE: "lambda",
+    },
+    # residential mapping, power > 3 kW
+    VARIANT_RESIDENTIAL_HIGH: {
+        CONF_ASOS_SC1: "asos_dr",
+        CONF_ARIM_SC1: "arim_dr",
+        CONF_ACCISA_TAX: "acc_c_r_h",
+        CONF_IVA: "iva_c",
+        CONF_NW_LOSS_PERCENTAGE: "lambda",
+    },
+    # non residential mapping
+    VARIANT_NOT_RESIDENTIAL: {
+        CONF_ASOS_SC1: "asos_dnr_v",
+        CONF_ARIM_SC1: "arim_dnr_v",
+        CONF_ACCISA_TAX: "acc_c_nr",
+        CONF_IVA: "iva_c",
+        CONF_NW_LOSS_PERCENTAGE: "lambda",
+    },
+}
+
+
+def _get_variant(house_type: str, power_in_use: float) -> str:
+    """Return the mapping variant for a house type and power in use."""
+    if house_type == RESIDENTIAL:
+        return VARIANT_RESIDENTIAL_LOW if power_in_use <= 3 else VARIANT_RESIDENTIAL_HIGH
+    return VARIANT_NOT_RESIDENTIAL
+
+
+def _get_storage_key(entry_id: str) -> str:
+    """Return the storage key of the index of published dates."""
+    return f"{DOMAIN}.{entry_id}.portale_offerte"
+
 
 class PortaleOfferteClient:
     """Client to download and parse ilportaleofferte CSV parameters."""
 
-    def __init__(self, hass: HomeAssistant) -> None:
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
         self.hass = hass
         self.session: ClientSession = async_get_clientsession(hass)
-        # cached_data keyed by 'YYYYMMDD' -> dict of parsed params
-        self._cached_data: Dict[str, Dict[str, float]] = {}
+        # cached_data keyed by 'YYYYMMDD' -> parsed params of every mapping variant
+        self._cached_data: Dict[str, Dict[str, Dict[str, float]]] = {}
+        # 'YYYYMMDD' keys of the files used for 'mp' and 'mpp' by the last lookup
+        self._current_keys: Dict[str, Optional[str]] = {"mp": None, "mpp": None}
+        # missing_dates keyed by 'YYYYMMDD' -> monotonic time of the 404 response
+        self._missing_dates: Dict[str, float] = {}
+        # persistent index of the 'YYYYMMDD' keys confirmed as published or
+        # as never published (loaded on the first lookup)
+        self._store: Store[Dict[str, Any]] = Store(
+            hass, PORTALE_STORAGE_VERSION, _get_storage_key(entry_id)
+        )
+        self._published_dates: set[str] = set()
+        self._never_published_dates: set[str] = set()
+        self._index_loaded = False
         self._max_lookback_days = 60  # safety stop if many days missing
+        # shared by all the probes, so the portal never sees more than
+        # PROBE_MAX_CONCURRENCY requests at once
+        self._semaphore = asyncio.Semaphore(PROBE_MAX_CONCURRENCY)
+        # Timings, bytes and records of the last lookup (the download stage
+        # adds up the time of every request, even when they run concurrently)
+        self.stats = RefreshStats()
 
     async def get_current_tariffs(self, house_type: str, power_in_use: float) -> Dict[str, Dict[str, float]]:
         """Return {'mp': {...}, 'mpp': {...}}.
@@ -55,18 +141,62 @@ class PortaleOfferteClient:
         mp = latest available file up to today (tries today, day-1, ...).
         mpp = last day of previous month (if missing, step back until found).
         """
+        with self.stats.misura():
+            return await self._get_current_tariffs(house_type, power_in_use)
+
+    async def _get_current_tariffs(self, house_type: str, power_in_use: float) -> Dict[str, Dict[str, float]]:
+        """Look up the latest files (measured by get_current_tariffs)."""
         today = datetime.now().date()
         # mp -> latest up to today (try today, yesterday, ...)
         mp_date = today
-        mp_found = await self._fetch_until_found(mp_date, house_type, power_in_use, forward=False, limit_days=self._max_lookback_days)
 
         # mpp -> last day of previous month
         first_of_this_month = today.replace(day=1)
         last_of_prev_month = first_of_this_month - timedelta(days=1)
         mpp_date = last_of_prev_month
-        mpp_found = await self._fetch_until_found(mpp_date, house_type, power_in_use, forward=False, limit_days=self._max_lookback_days)
 
-        return {"mp": mp_found or {}, "mpp": mpp_found or {}}
+        await self._async_load_index()
+        self._prune_cache(mpp_date - timedelta(days=self._max_lookback_days))
+
+        # both lookups run concurrently
+        mp_key, mpp_key = await asyncio.gather(
+            self._fetch_until_found(mp_date, forward=False, limit_days=self._max_lookback_days),
+            self._fetch_until_found(mpp_date, forward=False, limit_days=self._max_lookback_days),
+        )
+        self._current_keys = {"mp": mp_key, "mpp": mpp_key}
+
+        self._store.async_delay_save(self._index_data, PORTALE_INDEX_SAVE_DELAY)
+
+        return self.get_cached_tariffs(house_type, power_in_use)
+
+    def get_cached_tariffs(self, house_type: str, power_in_use: float) -> Dict[str, Dict[str, float]]:
+        """Return {'mp': {...}, 'mpp': {...}} from the files found by the last lookup.
+
+        No I/O: only the mapping variant for house_type / power_in_use is
+        selected, so it can be called whenever those options change.
+        """
+        variant = _get_variant(house_type, power_in_use)
+        result: Dict[str, Dict[str, float]] = {}
+        for name, key in self._current_keys.items():
+            record = self._cached_data.get(key) if key is not None else None
+            result[name] = dict(record[variant]) if record else {}
+        return result
+
+    async def _async_load_index(self) -> None:
+        """Load the index of published / missing dates (only once)."""
+        if self._index_loaded:
+            return
+        if (data := await self._store.async_load()) is not None:
+            self._published_dates = set(data.get("published", []))
+            self._never_published_dates = set(data.get("missing", []))
+        self._index_loaded = True
+
+    def _index_data(self) -> Dict[str, Any]:
+        """Return the index of published / missing dates to be saved."""
+        return {
+            "published": sorted(self._published_dates),
+            "missing": sorted(self._never_published_dates),
+        }
 
     async def get_tariff_with_fallback(self, house_type: str, power_in_use: float) -> Optional[Dict[str, Dict[str, float]]]:
         """Same pattern as AreraClient - wrapper with error handling."""
@@ -80,38 +210,107 @@ class PortaleOfferteClient:
             _LOGGER.error("PortaleOfferte: failed to fetch/parse data: %s", e, exc_info=True)
             return None
 
-    async def _fetch_until_found(self, start_date: date, house_type: str, power_in_use: float, forward: bool = False, limit_days: int = 60) -> Optional[Dict[str, float]]:
+    async def _fetch_until_found(self, start_date: date, forward: bool = False, limit_days: int = 60) -> Optional[str]:
         """Try date, then step backwards (or forwards) until a file is found or limit reached.
 
+        Returns the 'YYYYMMDD' key of the file found (parsed in the cache).
+
         - forward=False: go back in time (day-1, day-2, ...).
         - limit_days: absolute cap for attempts to avoid infinite loops.
+
+        Dates are probed concurrently, PROBE_WINDOW_DAYS at a time: the
+        result closest to start_date wins and the remaining requests of
+        the window are cancelled.
         """
-        attempts = 0
-        cur_date = start_date
-        while attempts < limit_days:
-            key = cur_date.strftime("%Y%m%d")
-            url = self._build_url_for_date(cur_date)
-            _LOGGER.debug("PortaleOfferte: trying URL %s", url)
+        step = timedelta(days=1) if forward else timedelta(days=-1)
+        offset = 0
+        while offset < limit_days:
+            dates = [
+                start_date + step * i
+                for i in range(offset, min(offset + PROBE_WINDOW_DAYS, limit_days))
+            ]
+
+            # cache first: dates after a cached (or known published) one
+            # never need to be probed, unless that one is no longer available
+            for i, cur_date in enumerate(dates):
+                key = cur_date.strftime("%Y%m%d")
+                if key in self._cached_data or key in self._published_dates:
+                    dates = dates[: i + 1]
+                    break
+            offset += len(dates)
+
+            tasks = {
+                cur_date: asyncio.create_task(self._probe_date(cur_date))
+                for cur_date in dates
+                if not self._is_cached_or_missing(cur_date.strftime("%Y%m%d"))
+            }
             try:
-                async with self.session.get(url) as resp:
-                    if resp.status == 200:
-                        raw = await resp.read()
-                        parsed = self._parse_csv(raw, house_type, power_in_use)
-                        self._cached_data[key] = parsed
+                # wait in date order, so the first file found is the closest one
+                for cur_date in dates:
+                    key = cur_date.strftime("%Y%m%d")
+                    if (task := tasks.get(cur_date)) is not None:
+                        raw = await task
+                        if raw is None:
+                            continue
+                        with self.stats.fase(STAGE_PARSE) as stage:
+                            self._cached_data[key] = self._parse_csv(raw)
+                            stage.byte += len(raw)
+                            stage.record += 1
                         _LOGGER.info("PortaleOfferte: found and parsed file for %s", key)
-                        return parsed
+                    elif key not in self._cached_data:
+                        continue
                     else:
-                        _LOGGER.debug("PortaleOfferte: file %s not found (HTTP %s)", key, resp.status)
-            except Exception as e:
-                _LOGGER.debug("PortaleOfferte: error fetching %s -> %s", url, e)
-
-            # step date
-            attempts += 1
-            cur_date = cur_date + timedelta(days=1) if forward else cur_date - timedelta(days=1)
+                        _LOGGER.debug("PortaleOfferte: using cached file for %s", key)
+                    return key
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
 
         _LOGGER.warning("PortaleOfferte: no file found within %s days from %s", limit_days, start_date)
         return None
 
+    def _is_cached_or_missing(self, key: str) -> bool:
+        """Return True if the file for the date key is cached or recently missing."""
+        if key in self._cached_data or key in self._never_published_dates:
+            return True
+        missing_since = self._missing_dates.get(key)
+        return missing_since is not None and time.monotonic() - missing_since < MISSING_TTL_SECONDS
+
+    def _prune_cache(self, oldest: date) -> None:
+        """Drop cached entries and missing dates older than the given date."""
+        oldest_key = oldest.strftime("%Y%m%d")
+        self._cached_data = {k: v for k, v in self._cached_data.items() if k >= oldest_key}
+        self._missing_dates = {k: v for k, v in self._missing_dates.items() if k >= oldest_key}
+        self._published_dates = {k for k in self._published_dates if k >= oldest_key}
+        self._never_published_dates = {k for k in self._never_published_dates if k >= oldest_key}
+
+    async def _probe_date(self, cur_date: date) -> Optional[bytes]:
+        """Download the file for a date, returning None if it is not available."""
+        key = cur_date.strftime("%Y%m%d")
+        url = self._build_url_for_date(cur_date)
+        async with self._semaphore:
+            _LOGGER.debug("PortaleOfferte: trying URL %s", url)
+            with self.stats.fase(STAGE_DOWNLOAD) as stage:
+                stage.record += 1
+                try:
+                    async with self.session.get(url) as resp:
+                        if resp.status == 200:
+                            self._missing_dates.pop(key, None)
+                            self._published_dates.add(key)
+                            raw = await resp.read()
+                            stage.byte += len(raw)
+                            return raw
+                        _LOGGER.debug("PortaleOfferte: file %s not found (HTTP %s)", key, resp.status)
+                        if resp.status == 404:
+                            self._missing_dates[key] = time.monotonic()
+                            self._published_dates.discard(key)
+                            if cur_date <= datetime.now().date() - timedelta(days=MISSING_FINAL_DAYS):
+                                self._never_published_dates.add(key)
+                except Exception as e:
+                    _LOGGER.debug("PortaleOfferte: error fetching %s -> %s", url, e)
+        return None
+
     def _build_url_for_date(self, dt: date) -> str:
         """Build URL for a given date.
 
@@ -122,11 +321,13 @@ class PortaleOfferteClient:
         filename = FILENAME_TEMPLATE.format(yyyymmdd=dt.strftime("%Y%m%d"))
         return f"{BASE_URL}/{dir_part}/{filename}"
 
-    def _parse_csv(self, raw_bytes: bytes, house_type: str, power_in_use: float) -> Dict[str, float]:
+    def _parse_csv(self, raw_bytes: bytes) -> Dict[str, Dict[str, float]]:
         """Parse CSV content and map CSV parameters to the const keys.
 
-        Best-effort mapping is used (residential vs non-residential).
-        If a CSV parameter is missing, it will be omitted from the returned dict.
+        The parameters are mapped once for every variant of MAPPING_VARIANTS
+        (residential vs non-residential, power), so the variant can be
+        selected later without parsing the file again.
+        If a CSV parameter is missing, it will be omitted from the variant.
         """
         text = raw_bytes.decode("utf-8-sig")
         reader = csv.DictReader(io.StringIO(text))
@@ -148,52 +349,31 @@ class PortaleOfferteClient:
                 except Exception:
                     entries[name.strip()] = None
 
-        params: Dict[str, float] = {}
-
-        # Best-effort mapping tables:
-        if house_type == RESIDENTIAL and power_in_use<=3:
-            # residential mapping (common keys)
-            mapping = {
-                CONF_ASOS_SC1: "asos_dr",  
-                CONF_ARIM_SC1: "arim_dr",  
-                CONF_ACCISA_TAX: "acc_c_r_l",  
-                CONF_IVA: "iva_c",  
-                CONF_NW_LOSS_PERCENTAGE: "lambda",
-            }
-        elif house_type == RESIDENTIAL and power_in_use>3:
-            # residential mapping (common keys)
-            mapping = {
-                CONF_ASOS_SC1: "asos_dr",  
-                CONF_ARIM_SC1: "arim_dr",  
-                CONF_ACCISA_TAX: "acc_c_r_h",  
-                CONF_IVA: "iva_c",  
-                CONF_NW_LOSS_PERCENTAGE: "lambda",
-            }
-        else:
-            # non residential mapping
-            mapping = {
-                CONF_ASOS_SC1: "asos_dnr_v",  
-                CONF_ARIM_SC1: "arim_dnr_v",
-                CONF_ACCISA_TAX: "acc_c_nr",
-                CONF_IVA: "iva_c",
-                CONF_NW_LOSS_PERCENTAGE: "lambda",
-            }
+        record: Dict[str, Dict[str, float]] = {}
+        for variant, mapping in MAPPING_VARIANTS.items():
+            params: Dict[str, float] = {}
+
+            # For each mapping, set if available
+            for const_key, csv_key in mapping.items():
+                raw_v = entries.get(csv_key)
+                if raw_v is None:
+                    # try alternative names - be forgiving
+                    alt = csv_key + "_f"
+                    raw_v = entries.get(alt, entries.get(csv_key.replace("_v", "_f")))
+                if raw_v is not None:
+                    params[const_key] = float(raw_v)
+                    _LOGGER.debug("Mapped %s <- %s = %s (%s)", const_key, csv_key, raw_v, variant)
+                else:
+                    _LOGGER.debug("CSV param '%s' not found for mapping to %s (%s)", csv_key, const_key, variant)
 
-        # For each mapping, set if available
-        for const_key, csv_key in mapping.items():
-            raw_v = entries.get(csv_key)
-            if raw_v is None:
-                # try alternative names - be forgiving
-                alt = csv_key + "_f"
-                raw_v = entries.get(alt, entries.get(csv_key.replace("_v", "_f")))
-            if raw_v is not None:
-                params[const_key] = float(raw_v)
-                _LOGGER.debug("Mapped %s <- %s = %s", const_key, csv_key, raw_v)
-            else:
-                _LOGGER.debug("CSV param '%s' not found for mapping to %s", csv_key, const_key)
+            record[variant] = params
 
         # Also duplicate values to *_MP keys will be handled by coordinator when assigning (they request mp/mpp).
-        # But for convenience, we can also include *_MP variants if parsing a file intended for MP or MPP (coordinator will copy):
         # (we do not know here whether this file is mp or mpp — coordinator will assign appropriately)
 
-        return params
+        return record
+
+
+async def async_remove_portale_index(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the index of published dates saved for the given config entry."""
+    await Store(hass, PORTALE_STORAGE_VERSION, _get_storage_key(entry_id)).async_remove()
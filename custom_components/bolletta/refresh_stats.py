@@ -0,0 +1,139 @@
+"""Tempi e quantità di dati delle fasi degli aggiornamenti via web."""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import io
+import time
+from typing import IO, Any
+
+# Aggiornamenti misurati
+REFRESH_GME = "gme"
+REFRESH_ARERA = "arera"
+REFRESH_PORTALE = "portale_offerte"
+REFRESHES: tuple[str, ...] = (REFRESH_GME, REFRESH_ARERA, REFRESH_PORTALE)
+
+# Fasi di un aggiornamento
+STAGE_DOWNLOAD = "download"
+STAGE_DECOMPRESS = "decompress"
+STAGE_PARSE = "parse"
+STAGE_AGGREGATE = "aggregate"
+STAGE_STORE = "store"
+STAGE_PUBLISH = "publish"
+
+
+class StageStats:
+    """Durata, byte e record di una fase."""
+
+    __slots__ = ("byte", "durata", "record")
+
+    def __init__(self) -> None:
+        """Inizializza la fase vuota."""
+        self.durata: float = 0.0
+        self.byte: int = 0
+        self.record: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Restituisce la fase in formato serializzabile."""
+        return {
+            "duration_ms": round(self.durata * 1000, 3),
+            "bytes": self.byte,
+            "records": self.record,
+        }
+
+
+class RefreshStats:
+    """Statistiche dell'ultimo aggiornamento, suddivise per fase.
+
+    I tempi sono misurati con time.monotonic(); le fasi ripetute nello
+    stesso aggiornamento (es. un file per volta) vengono sommate.
+    """
+
+    def __init__(self) -> None:
+        """Inizializza le statistiche (nessun aggiornamento eseguito)."""
+        self.fasi: dict[str, StageStats] = {}
+        self.ultimo_avvio: datetime | None = None
+        self.durata: float | None = None
+        self.byte: int = 0
+        self.errore: str | None = None
+        self.aggiornamenti: int = 0
+
+    @contextmanager
+    def misura(self) -> Iterator[None]:
+        """Misura un aggiornamento completo (azzera le fasi precedenti)."""
+        self.fasi = {}
+        self.ultimo_avvio = datetime.now(timezone.utc)
+        self.errore = None
+        inizio = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.errore = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.durata = time.monotonic() - inizio
+            self.byte = self.fasi[STAGE_DOWNLOAD].byte if STAGE_DOWNLOAD in self.fasi else 0
+            self.aggiornamenti += 1
+
+    @contextmanager
+    def fase(self, nome: str) -> Iterator[StageStats]:
+        """Misura la durata di una fase (byte e record sono aggiunti dal chiamante)."""
+        fase = self.fasi.setdefault(nome, StageStats())
+        inizio = time.monotonic()
+        try:
+            yield fase
+        finally:
+            fase.durata += time.monotonic() - inizio
+
+    def aggiungi(
+        self, nome: str, durata: float = 0.0, byte: int = 0, record: int = 0
+    ) -> None:
+        """Somma durata, byte e record alla fase indicata."""
+        fase = self.fasi.setdefault(nome, StageStats())
+        fase.durata += durata
+        fase.byte += byte
+        fase.record += record
+
+    def as_dict(self) -> dict[str, Any]:
+        """Restituisce le statistiche in formato serializzabile."""
+        return {
+            "last_start": self.ultimo_avvio.isoformat() if self.ultimo_avvio else None,
+            "duration_ms": round(self.durata * 1000, 3)
+            if self.durata is not None
+            else None,
+            "bytes_fetched": self.byte,
+            "error": self.errore,
+            "refreshes": self.aggiornamenti,
+            "stages": {nome: fase.as_dict() for nome, fase in self.fasi.items()},
+        }
+
+
+class TimedReader(io.RawIOBase):
+    """File in lettura che misura il tempo e i byte letti.
+
+    Usato per separare la decompressione di un file dello ZIP (che avviene
+    durante la lettura) dall'analisi del suo contenuto. Per leggerlo come
+    IO[bytes] va racchiuso in un io.BufferedReader.
+    """
+
+    def __init__(self, sorgente: IO[bytes]) -> None:
+        """Inizializza il lettore sul file indicato."""
+        super().__init__()
+        self._sorgente = sorgente
+        self.durata: float = 0.0
+        self.byte: int = 0
+
+    def readable(self) -> bool:
+        """Il file è sempre leggibile."""
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        """Legge dal file nel buffer indicato, misurando tempo e byte."""
+        destinazione = memoryview(buffer).cast("B")
+        inizio = time.monotonic()
+        dati = self._sorgente.read(len(destinazione))
+        self.durata += time.monotonic() - inizio
+        letti = len(dati)
+        destinazione[:letti] = dati
+        self.byte += letti
+        return letti
@@ -7,19 +7,19 @@ from homeassistant.components.sensor import (
     SensorStateClass,
     SensorDeviceClass
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.typing import DiscoveryInfoType
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-import homeassistant.util.dt as dt_util
 from homeassistant.helpers.restore_state import (
     RestoreEntity,
     ExtraStoredData,
     RestoredExtraData
 )
 from typing import Any, Dict
-from datetime import timedelta
+from datetime import date, datetime, timedelta, tzinfo
 from homeassistant.helpers.event import async_track_time_interval
 
 from . import PUNDataUpdateCoordinator
@@ -40,7 +40,6 @@ from .const import (
     EVENT_UPDATE_FASCIA,
     EVENT_UPDATE_PREZZO_ZONALE,
     EVENT_UPDATE_PUN,
-    PUN_MODE_FIXED,
     CONF_ENERGY_SC1,
     CONF_ENERGY_SC1_MP,
     CONF_FIX_QUOTA_TRANSPORT,
@@ -57,11 +56,15 @@ from awesomeversion.awesomeversion import AwesomeVersion
 from homeassistant.const import (
     CURRENCY_EURO,
     MATCH_ALL,
+    EntityCategory,
     UnitOfEnergy,
+    UnitOfInformation,
+    UnitOfTime,
     __version__ as HA_VERSION,
 )
 from homeassistant.const import CURRENCY_EURO, UnitOfEnergy, __version__ as HA_VERSION
-from .interfaces import Fascia, PunValues, PunValuesMP
+from .interfaces import PASSO_ORARIO, Fascia, PriceSeries, PunValues, PunValuesMP
+from .refresh_stats import REFRESH_ARERA, REFRESH_GME, REFRESH_PORTALE, REFRESHES
 from .utils import (
     add_timedelta_via_utc,
     get_datetime_from_ordinal_hour,
@@ -72,15 +75,37 @@ from .utils import (
 )
 
 ATTR_ROUNDED_DECIMALS = "rounded_decimals"
-bill_total_energy_fix_quote = 0
-bill_total_energy_energy_quote = 0
-bill_total_transport_fix_quote = 0
-bill_total_transport_power_quote = 0
-bill_total_transport_energy_quote = 0
-bill_total_asos_arim_quote = 0
-bill_total_accisa_tax = 0
-bill_total_iva = 0
-bill_kwh_price = 0
+
+# Sensori diagnostici degli aggiornamenti (durata e byte scaricati)
+REFRESH_SENSOR_DURATION = "duration"
+REFRESH_SENSOR_BYTES = "bytes"
+
+# Dispositivo e nome delle sorgenti dei sensori diagnostici
+REFRESH_DEVICES: dict[str, dict[str, Any]] = {
+    REFRESH_GME: {
+        "identifiers": {(DOMAIN, "PUN")},
+        "name": "Prezzo Unico Nazionale (PUN)",
+        "manufacturer": "Gestore Mercati Energetici",
+        "model": "Dati PUN in Tempo Reale",
+    },
+    REFRESH_ARERA: {
+        "identifiers": {(DOMAIN, "arera_parameters")},
+        "name": "Parametri Arera",
+        "manufacturer": "Arera",
+        "model": "Parametri Tariffari Arera",
+    },
+    REFRESH_PORTALE: {
+        "identifiers": {(DOMAIN, "portale_offerte_parameters")},
+        "name": "Parametri IlPortaleOfferte",
+        "manufacturer": "IlPortaleOfferte",
+        "model": "Parametri Opendata",
+    },
+}
+REFRESH_NAMES: dict[str, str] = {
+    REFRESH_GME: "GME",
+    REFRESH_ARERA: "ARERA",
+    REFRESH_PORTALE: "PortaleOfferte",
+}
 ATTR_PREFIX_PREZZO_OGGI = "oggi_h_"
 ATTR_PREFIX_PREZZO_DOMANI = "domani_h_"
 
@@ -153,6 +178,13 @@ async def async_setup_entry(hass: HomeAssistant, config: ConfigEntry,
     entities.append(PrezzoZonaleSensorEntity(coordinator))
     entities.append(PUNOrarioSensorEntity(coordinator))
 
+    # Sensori diagnostici degli aggiornamenti (disattivati di default)
+    entities.extend(
+        RefreshStatsSensorEntity(coordinator, sorgente, tipo)
+        for sorgente in REFRESHES
+        for tipo in (REFRESH_SENSOR_DURATION, REFRESH_SENSOR_BYTES)
+    )
+
     # Aggiunge i sensori ma non aggiorna automaticamente via web
     # per lasciare il tempo ad Home Assistant di avviarsi
     async_add_entities(entities, update_before_add=False)
@@ -538,12 +570,10 @@ class AreraSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
         }
         return state_attr
         
-class BillSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
-    """Sensore relativo alla fattura"""
+class BillSensorEntity(SensorEntity, RestoreEntity):
+    """Sensore relativo alla fattura (aggiornato dal segnale di ricalcolo della bolletta)"""
     
     def __init__(self, coordinator: PUNDataUpdateCoordinator, tipo: int) -> None:
-        super().__init__(coordinator)
-
         # Inizializza coordinator e tipo
         self.coordinator = coordinator
         self.tipo = tipo
@@ -592,227 +622,30 @@ class BillSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
         }
         
     def manage_update(self):
-        global bill_total_energy_fix_quote
-        global bill_total_energy_energy_quote
-        global bill_total_transport_fix_quote
-        global bill_total_transport_power_quote
-        global bill_total_transport_energy_quote
-        global bill_total_asos_arim_quote
-        global bill_total_accisa_tax
-        global bill_total_iva
-        global bill_kwh_price
-        
-        fattura_shift = self.hass.states.get("switch.invoice_shift")
-        fattura_mensile = self.hass.states.get("switch.invoice_monthly")
-
-        shift_on = fattura_shift and fattura_shift.state == "on"
-        monthly = fattura_mensile and fattura_mensile.state == "on"
-        current_month = dt_util.now().date().month
-
-        if monthly:
-            # fatturazione mese singolo → non sommare mai last_period
-            include_last_period = False
+        # Legge il valore dall'ultimo calcolo
+        total = self.coordinator.bill_engine.snapshot.get(self.tipo)
+        if total is not None:
+            self._available = True
+            self._native_value = total
         else:
-            # bimestrale
-            if shift_on:
-                include_last_period = (current_month % 2) == 1   # Feb/Mar, Apr/Mag…
-            else:
-                include_last_period = (current_month % 2) == 0   # Gen/Feb, Mar/Apr…
-
-
-        if self.tipo==BILL_KWH_PRICE:  
-            try:
-                if self.coordinator.pun_mode == PUN_MODE_FIXED:
-                    pun_value = self.coordinator.fixed_pun_value
-                    total = round(float(pun_value) , 2)
-                    total += round((float(self.coordinator.nw_loss_percentage)/100) *  float(pun_value) , 2)
-                    total += round(float(self.coordinator.other_fee) , 2)
-                else:
-                    total = round(float(self.hass.states.get('sensor.pun_mono_orario').state) , 2)
-                    total += round((float(self.coordinator.nw_loss_percentage)/100) *  float(self.hass.states.get('sensor.pun_mono_orario').state) , 2)
-                    total += round(float(self.coordinator.other_fee) , 2)
-                            
-                total += round(self.coordinator.energy_sc1 , 2)
-                total += round(self.coordinator.asos_sc1 , 2)
-                total += round(self.coordinator.arim_sc1 , 2)
-                total += round(self.coordinator.accisa_tax , 2)
-
-                self._available = True
-                self._native_value = total
-                bill_kwh_price = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_ENERGY_FIX_QUOTE:  
-            try:
-                total = round(self.coordinator.fix_quota_aggr_measure ,2) + round(self.coordinator.monthly_fee ,2)
-                if include_last_period:
-                    total += round(self.coordinator.fix_quota_aggr_measure ,2) + round(self.coordinator.monthly_fee ,2)
+            self._available = False
+        self.async_write_ha_state()
 
-                self._available = True
-                self._native_value = total
-                bill_total_energy_fix_quote = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_ENERGY_ENERGY_QUOTE:  
-            try:
-                total = 0
-
-                if self.coordinator.pun_mode == PUN_MODE_FIXED:
-                    pun_value = self.coordinator.fixed_pun_value
-                    total = round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) *  float(pun_value), 2)
-                    total = float(f"{total:.2f}")
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * ((float(self.coordinator.nw_loss_percentage)) *  float(pun_value)), 2)
-                    total = float(f"{total:.2f}")
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * ((float(self.coordinator.other_fee))), 2)
-                    total = float(f"{total:.2f}")
-                    if include_last_period:
-                        total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) *  float(pun_value), 2)
-                        total = float(f"{total:.2f}")
-                        total += round((float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * ((float(self.coordinator.nw_loss_percentage)) *  float(pun_value))), 2)
-                        total = float(f"{total:.2f}")
-                        total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * ((float(self.coordinator.other_fee))), 2)
-                        total = float(f"{total:.2f}")
-                else:
-                    total = round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) *  float(self.hass.states.get('sensor.pun_mono_orario').state), 2)
-                    total = float(f"{total:.2f}")
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * ((float(self.coordinator.nw_loss_percentage)) *  float(self.hass.states.get('sensor.pun_mono_orario').state)), 2)
-                    total = float(f"{total:.2f}")
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * ((float(self.coordinator.other_fee))), 2)
-                    total = float(f"{total:.2f}")
-                    if include_last_period:
-                        total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) *  float(self.hass.states.get('sensor.pun_mono_orario_mp').state) , 2)
-                        total = float(f"{total:.2f}")
-                        total += round((float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * ((float(self.coordinator.nw_loss_percentage)) *  float(self.hass.states.get('sensor.pun_mono_orario_mp').state))), 2)
-                        total = float(f"{total:.2f}")
-                        total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * ((float(self.coordinator.other_fee))), 2)
-                        total = float(f"{total:.2f}")
-                     
-                self._available = True
-                self._native_value = total
-                bill_total_energy_energy_quote = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_TRANSPORT_FIX_QUOTE:  
-            try:
-                total = 0
-                total = round(self.coordinator.fix_quota_transport,2)
-                if include_last_period:
-                    total += round(self.coordinator.fix_quota_transport_mp,2)
-                self._available = True
-                self._native_value = total
-                bill_total_transport_fix_quote = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_TRANSPORT_POWER_QUOTE:  
-            try:
-                total = 0
-                total = round((self.coordinator.quota_power) * self.coordinator.power_in_use,2)
-                if include_last_period:
-                    total += round((self.coordinator.quota_power_mp) * self.coordinator.power_in_use,2)
-                self._available = True
-                self._native_value = total
-                bill_total_transport_power_quote = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_TRANSPORT_ENERGY_QUOTE:  
-            try:
-                total = 0
-                total = round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * self.coordinator.energy_sc1,2)
-                if include_last_period:
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * self.coordinator.energy_sc1_mp,2)
-                self._available = True
-                self._native_value = total
-                bill_total_transport_energy_quote = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_ASOS_ARIM_QUOTE:  
-            try:
-                total = 0
-                total = round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * self.coordinator.asos_sc1,2)
-                total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * self.coordinator.arim_sc1,2)
-                if include_last_period:
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * self.coordinator.asos_sc1_mp,2)
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * self.coordinator.arim_sc1_mp,2)
-                self._available = True
-                self._native_value = total
-                bill_total_asos_arim_quote = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_ACCISA_TAX:  
-            try:
-                total = 0
-                total = round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).state) * self.coordinator.accisa_tax,2)
-                if include_last_period:
-                    total += round(float(self.hass.states.get(self.coordinator.monthly_entity_sensor).attributes['last_period']) * self.coordinator.accisa_tax,2)
-                self._available = True
-                self._native_value = total
-                bill_total_accisa_tax = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_IVA:  
-            try:
-                total = round(float(bill_total_energy_fix_quote),2)
-                total += round(float(bill_total_energy_energy_quote),2)
-                total += round(float(bill_total_transport_fix_quote),2)
-                total += round(float(bill_total_transport_power_quote),2)
-                total += round(float(bill_total_transport_energy_quote),2)
-                total += round(float(bill_total_asos_arim_quote),2)
-                total += round(float(bill_total_accisa_tax),2)
-                total -= round(float(self.coordinator.discount),2)*2
-                
-                total = total * float(self.coordinator.iva)
-                self._available = True
-                self._native_value = total
-                bill_total_iva = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
-        elif self.tipo==BILL_TOTAL:  
-            try:
-                current_month = dt_util.now().date().month
-                
-                total = round(float(bill_total_energy_fix_quote),2)
-                total += round(float(bill_total_energy_energy_quote),2)
-                total += round(float(bill_total_transport_fix_quote),2)
-                total += round(float(bill_total_transport_power_quote),2)
-                total += round(float(bill_total_transport_energy_quote),2)
-                total += round(float(bill_total_asos_arim_quote),2)
-                total += round(float(bill_total_accisa_tax),2)
-                total += round(float(bill_total_iva),2)
-                total -= round(float(self.coordinator.discount),2)*2
-                if current_month!=11 and current_month!=12:
-                    total += round(float(self.coordinator.tv_tax),2)*2
-                self._available = True
-                self._native_value = total
-                self.async_write_ha_state()
-            except:
-                self._available = False
-                self.async_write_ha_state()                
+    @callback
+    def _handle_bill_update(self, nodi: set) -> None:
+        """Gestisce il ricalcolo della bolletta da parte del coordinator"""
+        if self.tipo not in nodi:
+            return
 
-    async def async_update(self):
-        self.manage_update()
-        
-    def _handle_coordinator_update(self) -> None:
-        """Gestisce l'aggiornamento dei dati dal coordinator"""
+        # Ignora le variazioni inferiori alla soglia configurata
+        total = self.coordinator.bill_engine.snapshot.get(self.tipo)
+        if (
+            total is not None
+            and self._available
+            and abs(total - self._native_value) < self.coordinator.bill_min_delta
+        ):
+            return
         self.manage_update()
-        
 
     @property
     def extra_restore_state_data(self) -> ExtraStoredData:
@@ -831,15 +664,21 @@ class BillSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
                 self._available = True
                 self._native_value = old_native_value
 
-        # async def _periodic_update(now):
-            # self.manage_update()
+        # Usa il valore già calcolato, se presente
+        if self.tipo in self.coordinator.bill_engine.snapshot:
+            self.manage_update()
+
+        # Si aggiorna ad ogni ricalcolo della bolletta
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self.coordinator.bill_signal, self._handle_bill_update
+            )
+        )
 
-        # async_track_time_interval(self.hass, _periodic_update, timedelta(seconds=3))
-        
     @property
     def should_poll(self) -> bool:
         """Determina l'aggiornamento automatico"""
-        return True
+        return False
 
     @property
     def available(self) -> bool:
@@ -1274,6 +1113,39 @@ class PrezzoFasciaPUNSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity
 
 
 
+def _ripristina_prezzi(dati: dict[str, Any], fuso: tzinfo) -> PriceSeries:
+    """Ricostruisce i prezzi orari salvati (formato compatto o precedente)."""
+    if "valori" in dati:
+        return PriceSeries.from_packed(PASSO_ORARIO, dati, fuso)
+
+    # Formato precedente: dizionario indicizzato per orario (stringa)
+    return PriceSeries.from_dict(PASSO_ORARIO, dati, fuso)
+
+
+def _get_attributi_prezzi(
+    prezzi: PriceSeries, orario_prezzo: datetime
+) -> dict[str, Any]:
+    """Restituisce i prezzi orari di oggi e domani, indicizzati per orario (stringa)."""
+
+    # Crea il dizionario degli attributi
+    attributes: dict[str, Any] = {}
+
+    # Prezzi di oggi
+    max_ore_oggi: int = get_total_hours(orario_prezzo)
+    for h in range(max_ore_oggi):
+        data_ora_prezzo = get_datetime_from_ordinal_hour(orario_prezzo, (1 + h))
+        attributes[str(data_ora_prezzo)] = prezzi.get(data_ora_prezzo)
+
+    # Prezzi di domani
+    domani = add_timedelta_via_utc(dt=orario_prezzo, full_days=1)
+    max_ore_domani: int = get_total_hours(domani)
+    for h in range(max_ore_domani):
+        data_ora_prezzo = get_datetime_from_ordinal_hour(domani, (1 + h))
+        attributes[str(data_ora_prezzo)] = prezzi.get(data_ora_prezzo)
+
+    return attributes
+
+
 class PrezzoZonaleSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
     """Sensore del prezzo zonale aggiornato ogni ora."""
 
@@ -1298,7 +1170,10 @@ class PrezzoZonaleSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
         self._available: bool = False
         self._native_value: float = 0
         self._friendly_name: str = "Prezzo zonale"
-        self._prezzi_zonali: dict[str, float | None] = {}
+        self._prezzi_zonali: PriceSeries = PriceSeries(PASSO_ORARIO)
+        # Attributi già calcolati (e giorno a cui si riferiscono)
+        self._attributi: dict[str, Any] | None = None
+        self._attributi_giorno: date | None = None
 
     def _handle_coordinator_update(self) -> None:
         """Gestisce l'aggiornamento dei dati dal coordinator."""
@@ -1319,11 +1194,13 @@ class PrezzoZonaleSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
                 # Verifica che il coordinator abbia i prezzi
                 if self.coordinator.pun_data.prezzi_zonali:
                     # Copia i dati dal coordinator in locale (per il backup)
-                    self._prezzi_zonali = dict(self.coordinator.pun_data.prezzi_zonali)
+                    self._prezzi_zonali = self.coordinator.pun_data.prezzi_zonali.copy()
+                    self._attributi = None
             else:
                 # Nessuna zona impostata
                 self._friendly_name = "Prezzo zonale"
-                self._prezzi_zonali = {}
+                self._prezzi_zonali = PriceSeries(PASSO_ORARIO)
+                self._attributi = None
                 self._available = False
                 self.async_write_ha_state()
                 return
@@ -1337,20 +1214,14 @@ class PrezzoZonaleSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
                     self.coordinator.orario_prezzo,
                     get_ordinal_hour(self.coordinator.orario_prezzo),
                 )
-                if str(self.coordinator.orario_prezzo) in self._prezzi_zonali:
+                if (
+                    valore := self._prezzi_zonali.get(self.coordinator.orario_prezzo)
+                ) is not None:
                     # Aggiorna il valore al prezzo orario
-                    if (
-                        valore := self._prezzi_zonali[
-                            str(self.coordinator.orario_prezzo)
-                        ]
-                    ) is not None:
-                        self._native_value = valore
-                        self._available = True
-                    else:
-                        # Prezzo non disponibile
-                        self._available = False
+                    self._native_value = valore
+                    self._available = True
                 else:
-                    # Orario non disponibile
+                    # Prezzo o orario non disponibile
                     self._available = False
             else:
                 # Nessuna zona impostata
@@ -1370,7 +1241,9 @@ class PrezzoZonaleSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
                 "zona": self.coordinator.pun_data.zona.name
                 if self.coordinator.pun_data.zona is not None
                 else None,
-                "prezzi_zonali": self._prezzi_zonali,
+                "prezzi_zonali": self._prezzi_zonali.slice(
+                    get_datetime_from_ordinal_hour(self.coordinator.orario_prezzo, 1)
+                ).as_packed(),
             }
         )
 
@@ -1411,21 +1284,18 @@ class PrezzoZonaleSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
 
             # Valori delle fasce orarie
             if (old_prezzi_zonali := old_data_dict.get("prezzi_zonali")) is not None:
-                self._prezzi_zonali = old_prezzi_zonali
+                self._prezzi_zonali = _ripristina_prezzi(
+                    old_prezzi_zonali, self.coordinator.orario_prezzo.tzinfo
+                )
+                self._attributi = None
 
                 # Controlla se il prezzo orario esiste per l'ora corrente
-                if str(self.coordinator.orario_prezzo) in self._prezzi_zonali:
+                if (
+                    valore := self._prezzi_zonali.get(self.coordinator.orario_prezzo)
+                ) is not None:
                     # Aggiorna il valore al prezzo orario
-                    if (
-                        valore := self._prezzi_zonali[
-                            str(self.coordinator.orario_prezzo)
-                        ]
-                    ) is not None:
-                        self._native_value = valore
-                        self._available = True
-                    else:
-                        # Prezzo non disponibile
-                        self._available = False
+                    self._native_value = valore
+                    self._available = True
                 else:
                     # Imposta come non disponibile
                     self._available = False
@@ -1464,34 +1334,20 @@ class PrezzoZonaleSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
     def extra_state_attributes(self) -> dict[str, Any]:
         """Restituisce gli attributi di stato."""
 
-        # Crea il dizionario degli attributi
-        attributes: dict[str, Any] = {}
-
-        # Aggiunge i prezzi orari negli attributi, ora per ora
-        if self.coordinator.pun_data.zona is not None:
-            # Prezzi di oggi
-            max_ore_oggi: int = get_total_hours(self.coordinator.orario_prezzo)
-            for h in range(max_ore_oggi):
-                data_ora_prezzo = get_datetime_from_ordinal_hour(
-                    self.coordinator.orario_prezzo, (1 + h)
-                )
-                attributes[str(data_ora_prezzo)] = self._prezzi_zonali.get(
-                    str(data_ora_prezzo)
-                )
+        # Nessuna zona impostata
+        if self.coordinator.pun_data.zona is None:
+            return {}
 
-            # Prezzi di domani
-            domani = add_timedelta_via_utc(
-                dt=self.coordinator.orario_prezzo, full_days=1
+        # Ricalcola i prezzi orari solo se cambiati i prezzi o il giorno
+        giorno: date = self.coordinator.orario_prezzo.date()
+        if self._attributi is None or self._attributi_giorno != giorno:
+            self._attributi = _get_attributi_prezzi(
+                self._prezzi_zonali, self.coordinator.orario_prezzo
             )
-            max_ore_domani: int = get_total_hours(domani)
-            for h in range(max_ore_domani):
-                data_ora_prezzo = get_datetime_from_ordinal_hour(domani, (1 + h))
-                attributes[str(data_ora_prezzo)] = self._prezzi_zonali.get(
-                    str(data_ora_prezzo)
-                )
+            self._attributi_giorno = giorno
 
         # Restituisce gli attributi
-        return attributes
+        return self._attributi
 
 class PUNOrarioSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
     """Sensore del prezzo PUN aggiornato ogni ora."""
@@ -1517,7 +1373,10 @@ class PUNOrarioSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
         self._available: bool = False
         self._native_value: float = 0
         self._friendly_name: str = "PUN orario"
-        self._pun_orari: dict[str, float | None] = {}
+        self._pun_orari: PriceSeries = PriceSeries(PASSO_ORARIO)
+        # Attributi già calcolati (e giorno a cui si riferiscono)
+        self._attributi: dict[str, Any] | None = None
+        self._attributi_giorno: date | None = None
 
     def _handle_coordinator_update(self) -> None:
         """Gestisce l'aggiornamento dei dati dal coordinator."""
@@ -1533,7 +1392,8 @@ class PUNOrarioSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
             # Verifica che il coordinator abbia i prezzi
             if self.coordinator.pun_data.pun_orari:
                 # Copia i dati dal coordinator in locale (per il backup)
-                self._pun_orari = dict(self.coordinator.pun_data.pun_orari)
+                self._pun_orari = self.coordinator.pun_data.pun_orari.copy()
+                self._attributi = None
 
         # Cambiato l'orario del prezzo
         if coordinator_event in (EVENT_UPDATE_PUN, EVENT_UPDATE_PREZZO_ZONALE):
@@ -1543,18 +1403,14 @@ class PUNOrarioSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
                 self.coordinator.orario_prezzo,
                 get_ordinal_hour(self.coordinator.orario_prezzo),
             )
-            if str(self.coordinator.orario_prezzo) in self._pun_orari:
+            if (
+                valore := self._pun_orari.get(self.coordinator.orario_prezzo)
+            ) is not None:
                 # Aggiorna il valore al prezzo orario
-                if (
-                    valore := self._pun_orari[str(self.coordinator.orario_prezzo)]
-                ) is not None:
-                    self._native_value = valore
-                    self._available = True
-                else:
-                    # Prezzo non disponibile
-                    self._available = False
+                self._native_value = valore
+                self._available = True
             else:
-                # Orario non disponibile
+                # Prezzo o orario non disponibile
                 self._available = False
 
         # Aggiorna lo stato di Home Assistant
@@ -1567,7 +1423,9 @@ class PUNOrarioSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
         # Salva i dati per la prossima istanza
         return RestoredExtraData(
             {
-                "pun_orari": self._pun_orari,
+                "pun_orari": self._pun_orari.slice(
+                    get_datetime_from_ordinal_hour(self.coordinator.orario_prezzo, 1)
+                ).as_packed(),
             }
         )
 
@@ -1582,19 +1440,18 @@ class PUNOrarioSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
 
             # Valori dei prezzi orari
             if (old_pun_orari := old_data_dict.get("pun_orari")) is not None:
-                self._pun_orari = old_pun_orari
+                self._pun_orari = _ripristina_prezzi(
+                    old_pun_orari, self.coordinator.orario_prezzo.tzinfo
+                )
+                self._attributi = None
 
                 # Controlla se il prezzo orario esiste per l'ora corrente
-                if str(self.coordinator.orario_prezzo) in self._pun_orari:
+                if (
+                    valore := self._pun_orari.get(self.coordinator.orario_prezzo)
+                ) is not None:
                     # Aggiorna il valore al prezzo orario
-                    if (
-                        valore := self._pun_orari[str(self.coordinator.orario_prezzo)]
-                    ) is not None:
-                        self._native_value = valore
-                        self._available = True
-                    else:
-                        # Prezzo non disponibile
-                        self._available = False
+                    self._native_value = valore
+                    self._available = True
                 else:
                     # Imposta come non disponibile
                     self._available = False
@@ -1635,24 +1492,114 @@ class PUNOrarioSensorEntity(CoordinatorEntity, SensorEntity, RestoreEntity):
     def extra_state_attributes(self) -> dict[str, Any]:
         """Restituisce gli attributi di stato."""
 
-        # Crea il dizionario degli attributi
-        attributes: dict[str, Any] = {}
+        # Ricalcola i prezzi orari solo se cambiati i prezzi o il giorno
+        giorno: date = self.coordinator.orario_prezzo.date()
+        if self._attributi is None or self._attributi_giorno != giorno:
+            self._attributi = _get_attributi_prezzi(
+                self._pun_orari, self.coordinator.orario_prezzo
+            )
+            self._attributi_giorno = giorno
+
+        # Restituisce gli attributi
+        return self._attributi
+
+
+class RefreshStatsSensorEntity(SensorEntity):
+    """Sensore diagnostico con la durata o i byte scaricati dell'ultimo aggiornamento."""
+
+    def __init__(
+        self, coordinator: PUNDataUpdateCoordinator, sorgente: str, tipo: str
+    ) -> None:
+        """Inizializza il sensore."""
+        # Inizializza coordinator, sorgente e tipo
+        self.coordinator = coordinator
+        self.sorgente = sorgente
+        self.tipo = tipo
+
+        # ID univoco sensore basato su un nome fisso
+        self.entity_id = ENTITY_ID_FORMAT.format(f"{sorgente}_last_refresh_{tipo}")
+        self._attr_unique_id = self.entity_id
+        self._attr_has_entity_name = False
+
+        # Sensore diagnostico, da attivare manualmente
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_entity_registry_enabled_default = False
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        if tipo == REFRESH_SENSOR_DURATION:
+            self._attr_device_class = SensorDeviceClass.DURATION
+            self._attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+            self._attr_suggested_display_precision = 0
+        else:
+            self._attr_device_class = SensorDeviceClass.DATA_SIZE
+            self._attr_native_unit_of_measurement = UnitOfInformation.BYTES
 
-        # Aggiunge i prezzi orari negli attributi, ora per ora
-        # Prezzi di oggi
-        max_ore_oggi: int = get_total_hours(self.coordinator.orario_prezzo)
-        for h in range(max_ore_oggi):
-            data_ora_prezzo = get_datetime_from_ordinal_hour(
-                self.coordinator.orario_prezzo, (1 + h)
+    @property
+    def device_info(self):
+        """Return device information for the refreshed source."""
+        return REFRESH_DEVICES[self.sorgente]
+
+    async def async_added_to_hass(self) -> None:
+        """Si aggiorna al termine di ogni aggiornamento della sorgente."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self.coordinator.stats_signal, self._handle_stats_update
             )
-            attributes[str(data_ora_prezzo)] = self._pun_orari.get(str(data_ora_prezzo))
+        )
 
-        # Prezzi di domani
-        domani = add_timedelta_via_utc(dt=self.coordinator.orario_prezzo, full_days=1)
-        max_ore_domani: int = get_total_hours(domani)
-        for h in range(max_ore_domani):
-            data_ora_prezzo = get_datetime_from_ordinal_hour(domani, (1 + h))
-            attributes[str(data_ora_prezzo)] = self._pun_orari.get(str(data_ora_prezzo))
+    @callback
+    def _handle_stats_update(self, sorgente: str) -> None:
+        """Gestisce la fine di un aggiornamento."""
+        if sorgente == self.sorgente:
+            self.async_write_ha_state()
 
-        # Restituisce gli attributi
-        return attributes
+    @property
+    def should_poll(self) -> bool:
+        """Determina l'aggiornamento automatico."""
+        return False
+
+    @property
+    def available(self) -> bool:
+        """Disponibile dopo il primo aggiornamento."""
+        return self.coordinator.refresh_stats[self.sorgente].durata is not None
+
+    @property
+    def native_value(self) -> float | int | None:
+        """Durata (ms) o byte scaricati nell'ultimo aggiornamento."""
+        stats = self.coordinator.refresh_stats[self.sorgente]
+        if stats.durata is None:
+            return None
+        if self.tipo == REFRESH_SENSOR_DURATION:
+            return round(stats.durata * 1000, 1)
+        return stats.byte
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Dettaglio delle fasi dell'ultimo aggiornamento."""
+        stats = self.coordinator.refresh_stats[self.sorgente]
+        if self.tipo == REFRESH_SENSOR_DURATION:
+            attributi: dict[str, Any] = {
+                f"{nome}_ms": round(fase.durata * 1000, 1)
+                for nome, fase in stats.fasi.items()
+            }
+            attributi.update(
+                {f"{nome}_record": fase.record for nome, fase in stats.fasi.items()}
+            )
+            attributi["ultimo_avvio"] = stats.ultimo_avvio
+            attributi["errore"] = stats.errore
+            return attributi
+        return {f"{nome}_byte": fase.byte for nome, fase in stats.fasi.items()}
+
+    @property
+    def icon(self) -> str:
+        """Icona da usare nel frontend."""
+        if self.tipo == REFRESH_SENSOR_DURATION:
+            return "mdi:timer-outline"
+        return "mdi:download-network-outline"
+
+    @property
+    def name(self) -> str:
+        """Restituisce il nome del sensore."""
+        if self.tipo == REFRESH_SENSOR_DURATION:
+            return f"Durata ultimo aggiornamento {REFRESH_NAMES[self.sorgente]}"
+        return f"Byte scaricati ultimo aggiornamento {REFRESH_NAMES[self.sorgente]}"
@@ -0,0 +1,143 @@
+"""Servizi dell'integrazione."""
+
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import PUNDataUpdateCoordinator, tz_pun
+from .interfaces import PASSO_15MIN, PASSO_ORARIO, PriceSeries, Zona
+from .utils import get_datetime_from_ordinal_hour, get_datetime_from_periodo_15min
+
+# Ottiene il logger
+_LOGGER = logging.getLogger(__name__)
+
+# Servizio di lettura dei prezzi
+SERVICE_GET_PRICES = "get_prices"
+ATTR_ZONE = "zone"
+ATTR_GRANULARITY = "granularity"
+ATTR_START = "start"
+ATTR_END = "end"
+GRANULARITY_HOURLY = "hourly"
+GRANULARITY_15MIN = "15min"
+
+GET_PRICES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ZONE): vol.In([zona.name for zona in Zona]),
+        vol.Optional(ATTR_GRANULARITY, default=GRANULARITY_HOURLY): vol.In(
+            [GRANULARITY_HOURLY, GRANULARITY_15MIN]
+        ),
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+    }
+)
+
+
+def _get_coordinator(hass: HomeAssistant) -> PUNDataUpdateCoordinator:
+    """Restituisce il coordinator dell'integrazione (se configurata)."""
+    for coordinator in hass.data.get(DOMAIN, {}).values():
+        return coordinator
+    raise HomeAssistantError("Integrazione Bolletta non configurata")
+
+
+def _get_local_datetime(dataora: datetime) -> datetime:
+    """Restituisce l'orario indicato nel fuso italiano (se senza fuso, lo considera tale)."""
+    if dataora.tzinfo is None:
+        return dataora.replace(tzinfo=tz_pun)
+    return dataora.astimezone(tz_pun)
+
+
+def get_prices(
+    coordinator: PUNDataUpdateCoordinator,
+    zona: str | None,
+    granularita: str,
+    inizio: datetime,
+    fine: datetime,
+) -> dict[str, Any]:
+    """Legge i prezzi memorizzati nell'intervallo indicato (PUN se la zona è None).
+
+    I prezzi zonali e ogni 15 minuti sono disponibili solo per i giorni
+    recenti (vedere GIORNI_DETTAGLIO in gme_store.py).
+
+    Returns:
+    dict[str, Any]: orario del primo prezzo, passo in minuti e prezzi
+        consecutivi (None se mancanti).
+
+    """
+    passo: timedelta = PASSO_15MIN if granularita == GRANULARITY_15MIN else PASSO_ORARIO
+    serie = PriceSeries(passo)
+
+    for giorno in coordinator.gme_store.get_giorni(inizio.date(), fine.date()):
+        if granularita == GRANULARITY_15MIN:
+            pun = giorno.pun_15min
+            prezzi = pun if zona is None else giorno.prezzi_zonali_15min.get(zona)
+            inizio_giorno = get_datetime_from_periodo_15min(giorno.data, 1)
+        else:
+            pun = giorno.pun_orari
+            prezzi = pun if zona is None else giorno.prezzi_zonali.get(zona)
+            inizio_giorno = get_datetime_from_ordinal_hour(giorno.data, 1)
+        if prezzi:
+            serie.update(inizio_giorno, prezzi)
+
+    serie = serie.slice(inizio, fine)
+    return {
+        ATTR_ZONE: zona,
+        ATTR_GRANULARITY: granularita,
+        ATTR_START: (
+            serie.inizio.astimezone(tz_pun).isoformat()
+            if serie.inizio is not None
+            else None
+        ),
+        "step_minutes": int(passo.total_seconds() // 60),
+        "prices": [prezzo for _, prezzo in serie.items()],
+    }
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Registra i servizi dell'integrazione."""
+
+    async def async_get_prices(call: ServiceCall) -> ServiceResponse:
+        """Restituisce i prezzi richiesti, letti dall'archivio del GME."""
+        coordinator = _get_coordinator(hass)
+
+        # Di default restituisce i prezzi di oggi e domani
+        if (inizio := call.data.get(ATTR_START)) is not None:
+            inizio = _get_local_datetime(inizio)
+        else:
+            inizio = get_datetime_from_ordinal_hour(dt_util.now(time_zone=tz_pun), 1)
+        if (fine := call.data.get(ATTR_END)) is not None:
+            fine = _get_local_datetime(fine)
+        else:
+            fine = get_datetime_from_ordinal_hour(inizio.date() + timedelta(days=2), 1)
+        if fine <= inizio:
+            raise HomeAssistantError("La fine dell'intervallo deve seguire l'inizio")
+
+        return get_prices(
+            coordinator,
+            call.data.get(ATTR_ZONE),
+            call.data[ATTR_GRANULARITY],
+            inizio,
+            fine,
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_PRICES,
+        async_get_prices,
+        schema=GET_PRICES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
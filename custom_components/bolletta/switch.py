@@ -43,15 +43,13 @@ class BillConfigSwitchEntity(CoordinatorEntity, SwitchEntity, RestoreEntity):
 
     async def async_turn_on(self, **kwargs):
         self._state = True
+        # i sensori bolletta ricalcolano alla variazione di stato
         self.async_write_ha_state()
-        # forza i sensori bolletta a ricalcolare
-        self.coordinator.async_update_listeners()
 
     async def async_turn_off(self, **kwargs):
         self._state = False
+        # i sensori bolletta ricalcolano alla variazione di stato
         self.async_write_ha_state()
-        # forza i sensori bolletta a ricalcolare
-        self.coordinator.async_update_listeners()
 
     async def async_added_to_hass(self) -> None:
         await super().async_added_to_hass()
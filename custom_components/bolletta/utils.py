@@ -1,14 +1,29 @@
 """Metodi di utilità generale."""
 
+from array import array
+from collections.abc import Iterable, Iterator
 from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+import io
 import logging
+import time
+from typing import IO
 from zipfile import ZipFile
 from zoneinfo import ZoneInfo
 
 import defusedxml.ElementTree as et  # type: ignore[import-untyped]
 import holidays
 
-from .interfaces import Fascia, PunData, PunDataMP
+from .interfaces import (
+    Fascia,
+    GmeDay,
+    GmeRecord,
+    PunAggregate,
+    PunData,
+    PunDataMP,
+    Zona,
+)
+from .refresh_stats import STAGE_DECOMPRESS, STAGE_PARSE, RefreshStats, TimedReader
 
 # Ottiene il logger
 _LOGGER = logging.getLogger(__name__)
@@ -38,103 +53,83 @@ def get_fascia_for_xml(data: date, festivo: bool, ora: int) -> Fascia:
     return Fascia.F3
 
 
-def get_fascia_for_xml2(data: date, festivo: bool, ora: int) -> Fascia:
-    """Restituisce la fascia oraria di un determinato giorno/ora."""
-    # F1 = lu-ve 8-19
-    # F2 = lu-ve 7-8, lu-ve 19-23, sa 7-23
-    # F3 = lu-sa 0-7, lu-sa 23-24, do, festivi
+@lru_cache(maxsize=8)
+def get_festivita(anno: int) -> holidays.HolidayBase:
+    """Restituisce il calendario delle festività italiane di un anno."""
+    return holidays.IT(years=anno)  # type: ignore[attr-defined]
 
-    # Festivi e domeniche
-    if festivo or (data.weekday() == 6):
-        return Fascia.F3_MP
 
-    # Sabato
-    if data.weekday() == 5:
-        if 7 <= ora < 23:
-            return Fascia.F2_MP
-        return Fascia.F3_MP
+def is_festivo(data: date) -> bool:
+    """Verifica se il giorno indicato è festivo."""
+    return data in get_festivita(data.year)
+
+
+def carica_festivita(anni: Iterable[int]) -> None:
+    """Precarica festività e tabelle delle fasce degli anni indicati.
+
+    Esegue operazioni bloccanti (import dei dati di holidays), quindi
+    va eseguito nell'executor.
+    """
+    for anno in anni:
+        get_festivita(anno)
+        get_fasce_anno(anno)
+
+
+# Fasce corrispondenti ai codici della tabella annuale
+FASCE_CODICI: tuple[Fascia, ...] = (Fascia.MONO, Fascia.F1, Fascia.F2, Fascia.F3)
+
+
+@lru_cache(maxsize=4)
+def get_fasce_anno(anno: int) -> array:
+    """Restituisce la tabella delle fasce orarie di un anno.
+
+    La tabella contiene un codice (indice di FASCE_CODICI) per ogni ora
+    dell'anno, all'indice (giorno dell'anno - 1) * 24 + ora.
+    """
+    it_holidays = get_festivita(anno)
+    codici: dict[Fascia, int] = {fascia: n for n, fascia in enumerate(FASCE_CODICI)}
+
+    tabella: array = array("B")
+    giorno: date = date(anno, 1, 1)
+    while giorno.year == anno:
+        festivo: bool = giorno in it_holidays
+        tabella.extend(
+            codici[get_fascia_for_xml(giorno, festivo, ora)] for ora in range(24)
+        )
+        giorno += timedelta(days=1)
+
+    return tabella
+
+
+def get_fascia_oraria(data: date, ora: int) -> Fascia:
+    """Restituisce la fascia oraria di un determinato giorno/ora dalla tabella annuale."""
+    indice: int = (data.toordinal() - date(data.year, 1, 1).toordinal()) * 24 + ora
+    return FASCE_CODICI[get_fasce_anno(data.year)[indice]]
 
-    # Altri giorni della settimana
-    if ora == 7 or 19 <= ora < 23:
-        return Fascia.F2_MP
-    if 8 <= ora < 19:
-        return Fascia.F1_MP
-    return Fascia.F3_MP
 
 def get_fascia(dataora: datetime) -> tuple[Fascia, datetime]:
     """Restituisce la fascia della data/ora indicata e la data del prossimo cambiamento."""
 
-    # Verifica se la data corrente è un giorno con festività
-    festivo: bool = dataora in holidays.IT()  # type: ignore[attr-defined]
-
     # Identifica la fascia corrente
     # F1 = lu-ve 8-19
     # F2 = lu-ve 7-8, lu-ve 19-23, sa 7-23
     # F3 = lu-sa 0-7, lu-sa 23-24, do, festivi
-    # Festivi
-    if festivo:
-        fascia: Fascia = Fascia.F3
-
-        # Prossima fascia: alle 7 di un giorno non domenica o festività
-        prossima: datetime = get_next_date(dataora, 7, 1, True)
-
-        return fascia, prossima
-    match dataora.weekday():
-        # Domenica
-        case 6:
-            fascia = Fascia.F3
-            prossima = get_next_date(dataora, 7, 1, True)
-
-        # Sabato
-        case 5:
-            if 7 <= dataora.hour < 23:
-                # Sabato dalle 7 alle 23
-                fascia = Fascia.F2
-                # Prossima fascia: alle 23 dello stesso giorno
-                prossima = get_next_date(dataora, 23)
-            # abbiamo solo due fasce quindi facciamo solo il check per la prossima fascia
-            else:
-                # Sabato dopo le 23 e prima delle 7
-                fascia = Fascia.F3
-
-                if dataora.hour < 7:
-                    # Prossima fascia: alle 7 dello stesso giorno
-                    prossima = get_next_date(dataora, 7)
-                else:
-                    # Prossima fascia: alle 7 di un giorno non domenica o festività
-                    prossima = get_next_date(dataora, 7, 1, True)
-
-        # Altri giorni della settimana
-        case _:
-            if dataora.hour == 7 or 19 <= dataora.hour < 23:
-                # Lunedì-venerdì dalle 7 alle 8 e dalle 19 alle 23
-                fascia = Fascia.F2
-
-                if dataora.hour == 7:
-                    # Prossima fascia: alle 8 dello stesso giorno
-                    prossima = get_next_date(dataora, 8)
-                else:
-                    # Prossima fascia: alle 23 dello stesso giorno
-                    prossima = get_next_date(dataora, 23)
-
-            elif 8 <= dataora.hour < 19:
-                # Lunedì-venerdì dalle 8 alle 19
-                fascia = Fascia.F1
-                # Prossima fascia: alle 19 dello stesso giorno
-                prossima = get_next_date(dataora, 19)
-
-            else:
-                # Lunedì-venerdì dalle 23 alle 7 del giorno dopo
-                fascia = Fascia.F3
-
-                if dataora.hour < 7:
-                    # Siamo dopo la mezzanotte
-                    # Prossima fascia: alle 7 dello stesso giorno
-                    prossima = get_next_date(dataora, 7)
-                else:
-                    # Prossima fascia: alle 7 di un giorno non domenica o festività
-                    prossima = get_next_date(dataora, 7, 1, True)
-
+    giorno: date = dataora.date()
+    fascia: Fascia = get_fascia_oraria(giorno, dataora.hour)
+
+    # Cerca nella tabella la prima ora successiva con una fascia diversa
+    ora: int = dataora.hour
+    while True:
+        ora += 1
+        if ora == 24:
+            giorno += timedelta(days=1)
+            ora = 0
+        if get_fascia_oraria(giorno, ora) != fascia:
+            break
+
+    prossima: datetime = datetime(
+        giorno.year, giorno.month, giorno.day, ora, tzinfo=dataora.tzinfo
+    )
     return fascia, prossima
 
 
@@ -160,7 +155,7 @@ def get_next_date(
     )
 
     if feriale:
-        while (prossima in holidays.IT()) or (prossima.weekday() == 6):  # type: ignore[attr-defined]
+        while is_festivo(prossima.date()) or (prossima.weekday() == 6):
             prossima += timedelta(days=1)
 
     return prossima
@@ -450,428 +445,364 @@ def get_datetime_from_periodo_15min(
     return end_utc.astimezone(ref_tz)
 
 
-def extract_xml(archive: ZipFile, pun_data: PunData, today: date) -> PunData:
-    """Estrae i valori del pun per ogni fascia da un archivio zip contenente un XML.
+def get_gme_download_range(
+    giorni_presenti: Iterable[date], date_start: date, date_end: date, today: date
+) -> tuple[date, date] | None:
+    """Restituisce l'intervallo di date da scaricare dal GME.
 
     Args:
-    archive (ZipFile): archivio ZIP con i file XML all'interno.
-    pun_data (PunData): riferimento alla struttura che verrà modificata con i dati da XML.
-    today (date): data di oggi, utilizzata per memorizzare il prezzo zonale.
+    giorni_presenti (Iterable[date]): giorni già disponibili in locale.
+    date_start (date): primo giorno necessario.
+    date_end (date): ultimo giorno necessario (di solito domani).
+    today (date): data di oggi.
 
     Returns:
-    List[ list[MONO: float], list[F1: float], list[F2: float], list[F3: float] ]
+    tuple[date, date] | None: primo e ultimo giorno da scaricare con una sola
+        richiesta, oppure None se tutti i giorni sono già disponibili.
 
     """
-    # Carica le festività
-    it_holidays = holidays.IT()  # type: ignore[attr-defined]
+    presenti: set[date] = set(giorni_presenti)
 
-    # Azzera i dati precedenti
-    for fascia_da_svuotare in pun_data.pun.values():
-        fascia_da_svuotare.clear()
+    # Cerca il primo giorno mancante nell'intervallo richiesto
+    giorno: date = date_start
+    while giorno <= date_end:
+        if giorno not in presenti:
+            # Scarica sempre almeno da oggi, così l'intervallo contiene
+            # un giorno già pubblicato anche se manca solo domani
+            return min(giorno, today), date_end
+        giorno += timedelta(days=1)
 
-    # Esamina ogni file XML nello ZIP (ordinandoli prima)
-    for fn in sorted(archive.namelist()):
-        # Scompatta il file XML in memoria
-        xml_tree = et.parse(archive.open(fn))
-
-        # Parsing dell'XML (1 file = 1 giorno)
-        xml_root = xml_tree.getroot()
-
-        # Prova a cercare i prezzi orari come primo elemento
-        prezzi_15min: bool = False
-        primo_elemento = xml_root.find("Prezzi")
-        if primo_elemento is None:
-            # Prova a vedere se sono prezzi ogni 15 minuti
-            prezzi_15min = True
-            primo_elemento = xml_root.find("Prezzi15")
-            if primo_elemento is None:
-                _LOGGER.debug("Nessun prezzo supportato trovato nel file XML: %s", fn)
-                continue
+    # Nessun giorno mancante
+    return None
 
-        # Estrae la data dal primo elemento (sarà identica per gli altri)
-        dat_string: str = primo_elemento.find("Data").text  # YYYYMMDD
 
-        # Converte la stringa giorno in data
-        dat_date: date = date(
-            int(dat_string[0:4]),
-            int(dat_string[4:6]),
-            int(dat_string[6:8]),
+def _parse_prezzo_xml(testo: str | None) -> float | None:
+    """Converte un prezzo del GME (es. "1.234,567890" in €/MWh) in €/kWh."""
+    if not testo:
+        return None
+    try:
+        return float(testo.replace(".", "").replace(",", ".")) / 1000
+    except ValueError:
+        return None
+
+
+def _set_prezzo(prezzi: list[float | None], periodo: int, prezzo: float | None) -> None:
+    """Memorizza il prezzo del periodo (1..n) estendendo la lista se necessario."""
+    if len(prezzi) < periodo:
+        prezzi.extend([None] * (periodo - len(prezzi)))
+    prezzi[periodo - 1] = prezzo
+
+
+def iter_xml_records(fn: str, sorgente: IO[bytes]) -> Iterator[GmeRecord]:
+    """Legge in streaming i prezzi di un file XML del GME.
+
+    Gli elementi vengono eliminati appena letti, così la memoria occupata
+    non dipende dalla dimensione del file.
+
+    Args:
+    fn (str): nome del file XML (per i log).
+    sorgente (IO[bytes]): file XML da leggere.
+
+    Yields:
+    GmeRecord: i prezzi di ciascun elemento Prezzi (orario) o Prezzi15 (15 minuti).
+
+    """
+    # Tipi di elemento non più validi per questo file (mercato o granularità errati)
+    tag_ignorati: set[str] = set()
+    date_xml: dict[str, date] = {}
+    xml_root = None
+
+    for evento, elemento in et.iterparse(sorgente, events=("start", "end")):
+        # Memorizza la radice per poterla svuotare man mano
+        if evento == "start":
+            if xml_root is None:
+                xml_root = elemento
+            continue
+
+        tag: str = elemento.tag
+        if tag not in ("Prezzi", "Prezzi15"):
+            continue
+        if tag in tag_ignorati:
+            xml_root.clear()
+            continue
+
+        # Legge i valori dell'elemento in un solo passaggio
+        valori: dict[str, str | None] = {figlio.tag: figlio.text for figlio in elemento}
+        prezzi_15min: bool = tag == "Prezzi15"
+
+        # Verifica che il mercato sia corretto
+        if valori.get("Mercato") != "MGP":
+            _LOGGER.warning(
+                "Mercato non supportato per i prezzi nel file XML: %s.\n%s",
+                fn,
+                et.tostring(elemento, encoding="unicode", method="xml"),
+            )
+            tag_ignorati.add(tag)
+            xml_root.clear()
+            continue
+
+        # Verifica che la granularità sia corretta
+        if prezzi_15min and valori.get("Granularity") != "PT15":
+            _LOGGER.warning(
+                "Granularità non supportata per i prezzi a 15 minuti nel file XML: %s.\n%s",
+                fn,
+                et.tostring(elemento, encoding="unicode", method="xml"),
+            )
+            tag_ignorati.add(tag)
+            xml_root.clear()
+            continue
+
+        # Converte la stringa giorno in data (YYYYMMDD)
+        dat_string: str = valori.get("Data") or ""
+        if (dat_date := date_xml.get(dat_string)) is None:
+            dat_date = date_xml[dat_string] = date(
+                int(dat_string[0:4]),
+                int(dat_string[4:6]),
+                int(dat_string[6:8]),
+            )
+
+        # PUN non valido
+        if "PUN" not in valori:
+            _LOGGER.warning(
+                "PUN non specificato per %s al periodo: %s.",
+                dat_string,
+                valori.get("Periodo" if prezzi_15min else "Ora"),
+            )
+
+        yield GmeRecord(
+            data=dat_date,
+            periodo=int(valori["Periodo" if prezzi_15min else "Ora"]),
+            prezzi_15min=prezzi_15min,
+            pun=_parse_prezzo_xml(valori.get("PUN")),
+            prezzi_zonali={
+                zona: _parse_prezzo_xml(testo)
+                for zona, testo in valori.items()
+                if zona in Zona.__members__
+            },
+        )
+
+        # Libera la memoria degli elementi già letti
+        xml_root.clear()
+
+
+@lru_cache(maxsize=128)
+def _get_ore_giorno(data: date) -> int:
+    """Restituisce il numero di ore del giorno (memorizzato per ogni data)."""
+    return get_total_hours(data)
+
+
+def add_gme_record(giorni: dict[date, GmeDay], record: GmeRecord) -> None:
+    """Aggiunge i prezzi di un periodo al giorno corrispondente.
+
+    Args:
+    giorni (dict[date, GmeDay]): giorni a cui aggiungere i prezzi.
+    record (GmeRecord): prezzi del periodo letti dall'XML.
+
+    """
+    if (giorno := giorni.get(record.data)) is None:
+        giorno = giorni[record.data] = GmeDay(record.data)
+
+    # Sceglie le liste in cui memorizzare i prezzi
+    if record.prezzi_15min:
+        pun: list[float | None] = giorno.pun_15min
+        prezzi_zonali: dict[str, list[float | None]] = giorno.prezzi_zonali_15min
+        # 1 .. 96 normalmente, ma anche 1..92 o 1..100 nei cambi ora
+        max_periodi: int = 4 * _get_ore_giorno(record.data)
+    else:
+        pun = giorno.pun_orari
+        prezzi_zonali = giorno.prezzi_zonali
+        # 1..24 normalmente, ma anche 1..23 o 1..25 nei cambi ora
+        max_periodi = _get_ore_giorno(record.data)
+
+    # Valida il periodo XML
+    if not (1 <= record.periodo <= max_periodi):
+        _LOGGER.warning(
+            "Periodo %s non valido per %s (max: %s).",
+            record.periodo,
+            record.data.strftime("%Y%m%d"),
+            max_periodi,
         )
+        if record.periodo < 1:
+            return
+
+    # Memorizza il PUN e i prezzi zonali di tutte le zone presenti
+    _set_prezzo(pun, record.periodo, record.pun)
+    for zona, prezzo in record.prezzi_zonali.items():
+        if (prezzi := prezzi_zonali.get(zona)) is None:
+            prezzi = prezzi_zonali[zona] = []
+        _set_prezzo(prezzi, record.periodo, prezzo)
+
 
-        # Verifica la festività
-        festivo: bool = dat_date in it_holidays
-
-        # Verifica se si tratta di prezzi ogni 15 minuti
-        if prezzi_15min:
-            # Ottiene il numero massimo di periodi di 15 minuti per la data specificata
-            max_periodi: int = 4 * get_total_hours(dat_date)
-
-            # Considera solo oggi e domani per i prezzi ogni 15 minuti
-            if dat_date >= today:
-                # Estrae le rimanenti informazioni
-                for prezzi in xml_root.iter("Prezzi15"):
-                    # Verifica che il mercato sia corretto
-                    if prezzi.find("Mercato").text != "MGP":
-                        _LOGGER.warning(
-                            "Mercato non supportato per i prezzi a 15 minuti nel file XML: %s.\n%s",
-                            fn,
-                            et.tostring(prezzi, encoding="unicode", method="xml"),
-                        )
-                        break
-
-                    # Verifica che la granularità sia corretta
-                    if prezzi.find("Granularity").text != "PT15":
-                        _LOGGER.warning(
-                            "Granularità non supportata per i prezzi a 15 minuti nel file XML: %s.\n%s",
-                            fn,
-                            et.tostring(prezzi, encoding="unicode", method="xml"),
-                        )
-                        break
-
-                    # Estrae il periodo dall'XML
-                    periodo_xml: int = int(prezzi.find("Periodo").text)
-
-                    # Valida il periodo XML
-                    # 1 .. 96 normalmente, ma anche 1..92 o 1..100 nei cambi ora
-                    if not (1 <= periodo_xml <= max_periodi):
-                        _LOGGER.warning(
-                            "Periodo %s non valido per %s (max: %s).",
-                            periodo_xml,
-                            dat_string,
-                            max_periodi,
-                        )
-
-                    # Converte il periodo in un datetime
-                    orario_prezzo_15min: datetime = get_datetime_from_periodo_15min(
-                        dat_date, periodo_xml
-                    )
-
-                    # Estrae il prezzo PUN dall'XML in un float
-                    if (prezzo_xml := prezzi.find("PUN")) is not None:
-                        prezzo_string_15min: str = prezzo_xml.text.replace(
-                            ".", ""
-                        ).replace(",", ".")
-                        prezzo_15min: float = float(prezzo_string_15min) / 1000
-
-                        # Salva il prezzo per quell'orario
-                        pun_data.pun_15min[str(orario_prezzo_15min)] = prezzo_15min
-                    else:
-                        # PUN non valido
-                        _LOGGER.warning(
-                            "PUN non specificato per %s al periodo: %s.",
-                            dat_string,
-                            periodo_xml,
-                        )
-
-                    # Controlla che la zona del prezzo zonale sia impostata
-                    if pun_data.zona is not None:
-                        # Estrae il prezzo zonale dall'XML in un float
-                        # basandosi sul nome dell'enum
-                        if (
-                            prezzo_zonale_xml := prezzi.find(pun_data.zona.name)
-                        ) is not None:
-                            prezzo_zonale_string_15min: str = (
-                                prezzo_zonale_xml.text.replace(".", "").replace(
-                                    ",", "."
-                                )
-                            )
-                            pun_data.prezzi_zonali_15min[str(orario_prezzo_15min)] = (
-                                float(prezzo_zonale_string_15min) / 1000
-                            )
-                        else:
-                            pun_data.prezzi_zonali_15min[str(orario_prezzo_15min)] = (
-                                None
-                            )
-        else:
-            # Ottiene il numero massimo di ore per la data specificata
-            max_ore: int = get_total_hours(dat_date)
-
-            # Estrae le rimanenti informazioni
-            for prezzi in xml_root.iter("Prezzi"):
-                # Verifica che il mercato sia corretto
-                if prezzi.find("Mercato").text != "MGP":
-                    _LOGGER.warning(
-                        "Mercato non supportato per i prezzi orari nel file XML: %s.\n%s",
-                        fn,
-                        et.tostring(prezzi, encoding="unicode", method="xml"),
-                    )
-                    break
-
-                # Estrae l'ora dall'XML
-                ora_xml: int = int(prezzi.find("Ora").text)
-
-                # Valida l'orario XML
-                # 1..24 normalmente, ma anche 1..23 o 1..25 nei cambi ora
-                if not (1 <= ora_xml <= max_ore):
-                    _LOGGER.warning(
-                        "Orario %s non valido per %s (max: %s).",
-                        ora_xml,
-                        dat_string,
-                        max_ore,
-                    )
-
-                # Converte l'ora in un datetime
-                orario_prezzo: datetime = get_datetime_from_ordinal_hour(
-                    dat_date, ora_xml
-                )
-
-                # Estrae il prezzo PUN dall'XML in un float
-                if (prezzo_xml := prezzi.find("PUN")) is not None:
-                    prezzo_string: str = prezzo_xml.text.replace(".", "").replace(
-                        ",", "."
-                    )
-                    prezzo: float = float(prezzo_string) / 1000
-
-                    # Per le medie mensili, considera solo i dati fino ad oggi
-                    if dat_date <= today:
-                        # Estrae la fascia oraria
-                        fascia: Fascia = get_fascia_for_xml(
-                            dat_date, festivo, orario_prezzo.hour
-                        )
-
-                        # Calcola le statistiche
-                        pun_data.pun[Fascia.MONO].append(prezzo)
-                        pun_data.pun[fascia].append(prezzo)
-
-                    # Per il PUN orario, considera solo oggi e domani
-                    if dat_date >= today:
-                        # Salva il prezzo per quell'orario
-                        pun_data.pun_orari[str(orario_prezzo)] = prezzo
-                else:
-                    # PUN non valido
-                    _LOGGER.warning(
-                        "PUN non specificato per %s ad orario: %s.", dat_string, ora_xml
-                    )
-
-                # Per i prezzi zonali, considera solo oggi e domani
-                if dat_date >= today:
-                    # Controlla che la zona del prezzo zonale sia impostata
-                    if pun_data.zona is not None:
-                        # Estrae il prezzo zonale dall'XML in un float
-                        # basandosi sul nome dell'enum
-                        if (
-                            prezzo_zonale_xml := prezzi.find(pun_data.zona.name)
-                        ) is not None:
-                            prezzo_zonale_string: str = prezzo_zonale_xml.text.replace(
-                                ".", ""
-                            ).replace(",", ".")
-                            pun_data.prezzi_zonali[str(orario_prezzo)] = (
-                                float(prezzo_zonale_string) / 1000
-                            )
-                        else:
-                            pun_data.prezzi_zonali[str(orario_prezzo)] = None
-
-    return pun_data
-    
-def extract_xml2(archive: ZipFile, pun_data: PunDataMP, today: date) -> PunDataMP:
-    """Estrae i valori del pun per ogni fascia da un archivio zip contenente un XML.
+def parse_gme_archive(
+    archive: ZipFile, stats: RefreshStats | None = None
+) -> dict[date, GmeDay]:
+    """Estrae i prezzi di ogni giorno da un archivio ZIP del GME.
 
     Args:
     archive (ZipFile): archivio ZIP con i file XML all'interno.
-    pun_data (PunData): riferimento alla struttura che verrà modificata con i dati da XML.
-    today (date): data di oggi, utilizzata per memorizzare il prezzo zonale.
+    stats (RefreshStats | None): se indicato, riceve tempi e byte della
+        decompressione e tempi e record dell'analisi XML.
 
     Returns:
-    List[ list[MONO: float], list[F1: float], list[F2: float], list[F3: float] ]
+    dict[date, GmeDay]: i prezzi di ciascun giorno presente nell'archivio.
 
     """
-    # Carica le festività
-    it_holidays = holidays.IT()  # type: ignore[attr-defined]
-
-    # Azzera i dati precedenti
-    for fascia_da_svuotare in pun_data.pun.values():
-        fascia_da_svuotare.clear()
+    giorni: dict[date, GmeDay] = {}
 
     # Esamina ogni file XML nello ZIP (ordinandoli prima)
     for fn in sorted(archive.namelist()):
-        # Scompatta il file XML in memoria
-        xml_tree = et.parse(archive.open(fn))
-
-        # Parsing dell'XML (1 file = 1 giorno)
-        xml_root = xml_tree.getroot()
-
-        # Prova a cercare i prezzi orari come primo elemento
-        prezzi_15min: bool = False
-        primo_elemento = xml_root.find("Prezzi")
-        if primo_elemento is None:
-            # Prova a vedere se sono prezzi ogni 15 minuti
-            prezzi_15min = True
-            primo_elemento = xml_root.find("Prezzi15")
-            if primo_elemento is None:
-                _LOGGER.debug("Nessun prezzo supportato trovato nel file XML: %s", fn)
-                continue
+        # Scompatta e legge il file XML in streaming, separando il tempo di
+        # decompressione (letture) da quello dell'analisi
+        with archive.open(fn) as sorgente:
+            lettura = TimedReader(sorgente)
+            inizio = time.monotonic()
+            record_letti = 0
+            for record in iter_xml_records(fn, io.BufferedReader(lettura)):
+                add_gme_record(giorni, record)
+                record_letti += 1
+            durata = time.monotonic() - inizio
+
+        if stats is not None:
+            stats.aggiungi(STAGE_DECOMPRESS, lettura.durata, byte=lettura.byte)
+            stats.aggiungi(STAGE_PARSE, durata - lettura.durata, record=record_letti)
+
+    return giorni
+
+
+def _get_prezzo(prezzi: list[float | None] | None, indice: int) -> float | None:
+    """Restituisce il prezzo all'indice indicato, se presente."""
+    if prezzi is None or indice >= len(prezzi):
+        return None
+    return prezzi[indice]
+
+
+# Fasce corrispondenti per il mese precedente
+FASCE_MESE_PRECEDENTE: dict[Fascia, Fascia] = {
+    Fascia.MONO: Fascia.MONO_MP,
+    Fascia.F1: Fascia.F1_MP,
+    Fascia.F2: Fascia.F2_MP,
+    Fascia.F3: Fascia.F3_MP,
+    Fascia.F23: Fascia.F23_MP,
+}
+
+
+def extract_pun_data(
+    giorni: Iterable[GmeDay],
+    today: date,
+    destinazioni: Iterable[tuple[PunData | PunDataMP, date, date]],
+) -> None:
+    """Estrae i valori del pun per ogni fascia dai prezzi giornalieri del GME.
+
+    Ogni giorno viene esaminato una sola volta e i suoi prezzi vengono
+    assegnati a tutte le destinazioni il cui intervallo di date lo comprende.
 
-        # Estrae la data dal primo elemento (sarà identica per gli altri)
-        dat_string: str = primo_elemento.find("Data").text  # YYYYMMDD
+    Args:
+    giorni (Iterable[GmeDay]): prezzi dei giorni da considerare.
+    today (date): data di oggi, utilizzata per memorizzare il prezzo zonale.
+    destinazioni (Iterable[tuple[PunData | PunDataMP, date, date]]): strutture
+        da aggiornare, ciascuna con il primo e l'ultimo giorno di competenza.
 
-        # Converte la stringa giorno in data
-        dat_date: date = date(
-            int(dat_string[0:4]),
-            int(dat_string[4:6]),
-            int(dat_string[6:8]),
+    """
+    # Prepara le destinazioni, azzerando i dati precedenti
+    destinazioni = list(destinazioni)
+    fasce_destinazioni: list[dict[Fascia, Fascia] | None] = []
+    for pun_data, _, _ in destinazioni:
+        for fascia_da_svuotare in pun_data.pun.values():
+            fascia_da_svuotare.clear()
+        for serie in (
+            pun_data.pun_orari,
+            pun_data.pun_15min,
+            pun_data.prezzi_zonali,
+            pun_data.prezzi_zonali_15min,
+        ):
+            serie.clear()
+        fasce_destinazioni.append(
+            FASCE_MESE_PRECEDENTE if Fascia.MONO_MP in pun_data.pun else None
         )
 
-        # Verifica la festività
-        festivo: bool = dat_date in it_holidays
-
-        # Verifica se si tratta di prezzi ogni 15 minuti
-        if prezzi_15min:
-            # Ottiene il numero massimo di periodi di 15 minuti per la data specificata
-            max_periodi: int = 4 * get_total_hours(dat_date)
-
-            # Considera solo oggi e domani per i prezzi ogni 15 minuti
-            if dat_date >= today:
-                # Estrae le rimanenti informazioni
-                for prezzi in xml_root.iter("Prezzi15"):
-                    # Verifica che il mercato sia corretto
-                    if prezzi.find("Mercato").text != "MGP":
-                        _LOGGER.warning(
-                            "Mercato non supportato per i prezzi a 15 minuti nel file XML: %s.\n%s",
-                            fn,
-                            et.tostring(prezzi, encoding="unicode", method="xml"),
-                        )
-                        break
-
-                    # Verifica che la granularità sia corretta
-                    if prezzi.find("Granularity").text != "PT15":
-                        _LOGGER.warning(
-                            "Granularità non supportata per i prezzi a 15 minuti nel file XML: %s.\n%s",
-                            fn,
-                            et.tostring(prezzi, encoding="unicode", method="xml"),
-                        )
-                        break
-
-                    # Estrae il periodo dall'XML
-                    periodo_xml: int = int(prezzi.find("Periodo").text)
-
-                    # Valida il periodo XML
-                    # 1 .. 96 normalmente, ma anche 1..92 o 1..100 nei cambi ora
-                    if not (1 <= periodo_xml <= max_periodi):
-                        _LOGGER.warning(
-                            "Periodo %s non valido per %s (max: %s).",
-                            periodo_xml,
-                            dat_string,
-                            max_periodi,
-                        )
-
-                    # Converte il periodo in un datetime
-                    orario_prezzo_15min: datetime = get_datetime_from_periodo_15min(
-                        dat_date, periodo_xml
-                    )
-
-                    # Estrae il prezzo PUN dall'XML in un float
-                    if (prezzo_xml := prezzi.find("PUN")) is not None:
-                        prezzo_string_15min: str = prezzo_xml.text.replace(
-                            ".", ""
-                        ).replace(",", ".")
-                        prezzo_15min: float = float(prezzo_string_15min) / 1000
-
-                        # Salva il prezzo per quell'orario
-                        pun_data.pun_15min[str(orario_prezzo_15min)] = prezzo_15min
-                    else:
-                        # PUN non valido
-                        _LOGGER.warning(
-                            "PUN non specificato per %s al periodo: %s.",
-                            dat_string,
-                            periodo_xml,
-                        )
-
-                    # Controlla che la zona del prezzo zonale sia impostata
-                    if pun_data.zona is not None:
-                        # Estrae il prezzo zonale dall'XML in un float
-                        # basandosi sul nome dell'enum
-                        if (
-                            prezzo_zonale_xml := prezzi.find(pun_data.zona.name)
-                        ) is not None:
-                            prezzo_zonale_string_15min: str = (
-                                prezzo_zonale_xml.text.replace(".", "").replace(
-                                    ",", "."
-                                )
-                            )
-                            pun_data.prezzi_zonali_15min[str(orario_prezzo_15min)] = (
-                                float(prezzo_zonale_string_15min) / 1000
-                            )
-                        else:
-                            pun_data.prezzi_zonali_15min[str(orario_prezzo_15min)] = (
-                                None
-                            )
-        else:
-            # Ottiene il numero massimo di ore per la data specificata
-            max_ore: int = get_total_hours(dat_date)
-
-            # Estrae le rimanenti informazioni
-            for prezzi in xml_root.iter("Prezzi"):
-                # Verifica che il mercato sia corretto
-                if prezzi.find("Mercato").text != "MGP":
-                    _LOGGER.warning(
-                        "Mercato non supportato per i prezzi orari nel file XML: %s.\n%s",
-                        fn,
-                        et.tostring(prezzi, encoding="unicode", method="xml"),
-                    )
-                    break
-
-                # Estrae l'ora dall'XML
-                ora_xml: int = int(prezzi.find("Ora").text)
-
-                # Valida l'orario XML
-                # 1..24 normalmente, ma anche 1..23 o 1..25 nei cambi ora
-                if not (1 <= ora_xml <= max_ore):
-                    _LOGGER.warning(
-                        "Orario %s non valido per %s (max: %s).",
-                        ora_xml,
-                        dat_string,
-                        max_ore,
-                    )
-
-                # Converte l'ora in un datetime
-                orario_prezzo: datetime = get_datetime_from_ordinal_hour(
-                    dat_date, ora_xml
-                )
-
-                # Estrae il prezzo PUN dall'XML in un float
-                if (prezzo_xml := prezzi.find("PUN")) is not None:
-                    prezzo_string: str = prezzo_xml.text.replace(".", "").replace(
-                        ",", "."
-                    )
-                    prezzo: float = float(prezzo_string) / 1000
-
-                    # Per le medie mensili, considera solo i dati fino ad oggi
-                    if dat_date <= today:
-                        # Estrae la fascia oraria
-                        fascia: Fascia = get_fascia_for_xml2(
-                            dat_date, festivo, orario_prezzo.hour
-                        )
-
-                        # Calcola le statistiche
-                        pun_data.pun[Fascia.MONO_MP].append(prezzo)
-                        pun_data.pun[fascia].append(prezzo)
-
-                    # Per il PUN orario, considera solo oggi e domani
-                    if dat_date >= today:
-                        # Salva il prezzo per quell'orario
-                        pun_data.pun_orari[str(orario_prezzo)] = prezzo
-                else:
-                    # PUN non valido
-                    _LOGGER.warning(
-                        "PUN non specificato per %s ad orario: %s.", dat_string, ora_xml
-                    )
-
-                # Per i prezzi zonali, considera solo oggi e domani
-                if dat_date >= today:
-                    # Controlla che la zona del prezzo zonale sia impostata
-                    if pun_data.zona is not None:
-                        # Estrae il prezzo zonale dall'XML in un float
-                        # basandosi sul nome dell'enum
-                        if (
-                            prezzo_zonale_xml := prezzi.find(pun_data.zona.name)
-                        ) is not None:
-                            prezzo_zonale_string: str = prezzo_zonale_xml.text.replace(
-                                ".", ""
-                            ).replace(",", ".")
-                            pun_data.prezzi_zonali[str(orario_prezzo)] = (
-                                float(prezzo_zonale_string) / 1000
-                            )
-                        else:
-                            pun_data.prezzi_zonali[str(orario_prezzo)] = None
-
-    return pun_data
+    # Esamina ogni giorno (ordinandoli prima)
+    for giorno in sorted(giorni, key=lambda g: g.data):
+        dat_date: date = giorno.data
+
+        for (pun_data, date_start, date_end), fasce_mese in zip(
+            destinazioni, fasce_destinazioni
+        ):
+            if date_start <= dat_date <= date_end:
+                _add_giorno(giorno, pun_data, today, fasce_mese)
+
+
+def get_aggregati_giorno(giorno: GmeDay) -> dict[Fascia, PunAggregate]:
+    """Restituisce le statistiche del PUN per fascia di un giorno.
+
+    Le statistiche vengono calcolate alla prima richiesta e memorizzate nel
+    giorno stesso, così da poterle unire a quelle degli altri giorni del mese
+    senza esaminare di nuovo i singoli prezzi.
+    """
+    if giorno.aggregati is None:
+        aggregati: dict[Fascia, PunAggregate] = {
+            fascia: PunAggregate()
+            for fascia in (Fascia.MONO, Fascia.F1, Fascia.F2, Fascia.F3)
+        }
+        for indice, prezzo in enumerate(giorno.pun_orari):
+            if prezzo is None:
+                continue
+            orario_prezzo: datetime = get_datetime_from_ordinal_hour(
+                giorno.data, indice + 1
+            )
+            aggregati[Fascia.MONO].add(prezzo)
+            aggregati[get_fascia_oraria(giorno.data, orario_prezzo.hour)].add(prezzo)
+        giorno.aggregati = aggregati
+    return giorno.aggregati
+
+
+def _add_giorno(
+    giorno: GmeDay,
+    pun_data: PunData | PunDataMP,
+    today: date,
+    fasce_mese: dict[Fascia, Fascia] | None,
+) -> None:
+    """Aggiunge i prezzi di un giorno alla struttura indicata."""
+    dat_date: date = giorno.data
+
+    # Per le medie mensili, considera solo i dati fino ad oggi
+    if dat_date <= today:
+        for fascia, aggregato in get_aggregati_giorno(giorno).items():
+            if fasce_mese is not None:
+                fascia = fasce_mese[fascia]
+            pun_data.pun[fascia].merge(aggregato)
+
+    # Considera solo oggi e domani per i prezzi orari, zonali e ogni 15 minuti
+    if dat_date < today:
+        return
+
+    # Prezzi ogni 15 minuti
+    if giorno.pun_15min:
+        inizio_15min: datetime = get_datetime_from_periodo_15min(dat_date, 1)
+        pun_data.pun_15min.update(inizio_15min, giorno.pun_15min)
+
+        # Salva i prezzi zonali (se la zona è impostata)
+        if pun_data.zona is not None:
+            prezzi_zonali_15min = giorno.prezzi_zonali_15min.get(pun_data.zona.name)
+            pun_data.prezzi_zonali_15min.update(
+                inizio_15min,
+                (
+                    _get_prezzo(prezzi_zonali_15min, indice)
+                    for indice in range(len(giorno.pun_15min))
+                ),
+            )
+
+    # Prezzi orari
+    if giorno.pun_orari:
+        inizio_orario: datetime = get_datetime_from_ordinal_hour(dat_date, 1)
+        pun_data.pun_orari.update(inizio_orario, giorno.pun_orari)
+
+        # Salva i prezzi zonali (se la zona è impostata)
+        if pun_data.zona is not None:
+            prezzi_zonali = giorno.prezzi_zonali.get(pun_data.zona.name)
+            pun_data.prezzi_zonali.update(
+                inizio_orario,
+                (
+                    _get_prezzo(prezzi_zonali, indice)
+                    for indice in range(len(giorno.pun_orari))
+                ),
+            )